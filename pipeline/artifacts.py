@@ -1,18 +1,151 @@
+import argparse
+import hashlib
 import json
+import os
 import shutil
+import tempfile
+import zipfile
 from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
+MANIFEST_NAME = "manifest.json"
+BLOBS_DIR = "blobs"
+# suffix of blobs and exports still being written
+TMP = ".tmp"
+EXPORTS_DIR = "exports"
+# already-compressed formats are stored in export ZIPs, not deflated again
+STORED_SUFFIXES = {".parquet", ".zip", ".gz", ".zst", ".bz2", ".xz", ".npz"}
 
-def archive_artifacts(standardized_dir: Path, checksum: str) -> Path:
-    """Copy standardized artifacts into artifacts/<checksum>/ and update index."""
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def blob_path(artifacts_root: Path, digest: str) -> Path:
+    return artifacts_root / BLOBS_DIR / digest[:2] / digest
+
+
+def _read_manifest(target: Path) -> Dict[str, dict]:
+    path = target / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text()).get("files", {})
+    except ValueError:
+        return {}
+
+
+def _temp_path(dest: Path) -> Path:
+    """A new, unique temp file next to dest, for writing and renaming over it."""
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=dest.name + ".", suffix=TMP)
+    os.close(fd)
+    return Path(tmp)
+
+
+def _store_blob(src: Path, dest: Path) -> None:
+    # copy to a temp file of our own and rename, so a crash never leaves a
+    # partial blob and concurrent stores of the same content do not collide
+    # (the rename is atomic; the last identical copy wins)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(dest)
+    try:
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _link(blob: Path, dest: Path) -> None:
+    """Point dest at blob with a hardlink, falling back to a copy."""
+    if dest.exists():
+        try:
+            if os.path.samefile(blob, dest):
+                return
+        except OSError:
+            pass
+        dest.unlink()
+    try:
+        os.link(blob, dest)
+    except OSError:
+        # e.g. filesystems without hardlink support
+        shutil.copy2(blob, dest)
+
+
+def _stage(p: Path, artifacts_root: Path, prev: Optional[dict] = None) -> dict:
+    """Store p's blob (unless present); returns its manifest entry.
+
+    prev, an earlier entry for the same file, saves rehashing it when its
+    size and mtime still match.
+    """
+    st = p.stat()
+    if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+        digest = prev["sha256"]
+    else:
+        digest = file_sha256(p)
+    blob = blob_path(artifacts_root, digest)
+    if not blob.exists():
+        _store_blob(p, blob)
+    return {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def stage_files(standardized_dir: Path, names: Iterable[str]) -> Dict[str, dict]:
+    """Hash and store the blobs of some finished standardized files.
+
+    Lets a run archive each table's outputs as soon as they are written;
+    pass the returned entries to archive_artifacts(known=...) so they are
+    not hashed again.
+    """
+    artifacts_root = standardized_dir.parent / "artifacts"
+    return {name: _stage(standardized_dir / name, artifacts_root) for name in names}
+
+
+def archive_artifacts(
+    standardized_dir: Path, checksum: str, known: Optional[Dict[str, dict]] = None
+) -> Path:
+    """Archive standardized artifacts into artifacts/<checksum>/ and update index.
+
+    File contents are stored once under artifacts/blobs/<sha256>; the
+    per-checksum directory holds hardlinks to those blobs plus a manifest.
+    Files whose size and mtime match the previous manifest (or the entries
+    in known, from stage_files) are not rehashed, and blobs that already
+    exist are not copied again.
+    """
     artifacts_root = standardized_dir.parent / "artifacts"
     target = artifacts_root / checksum
     target.mkdir(parents=True, exist_ok=True)
 
-    # copy all files from standardized_dir into target
-    for p in standardized_dir.glob("*"):
-        if p.is_file():
-            shutil.copy2(p, target / p.name)
+    previous = _read_manifest(target)
+    known = {**previous, **(known or {})}
+    files: Dict[str, dict] = {}
+    for p in sorted(standardized_dir.rglob("*")):
+        name = p.relative_to(standardized_dir).as_posix()
+        # partitioned datasets are archived file by file; hidden directories
+        # (e.g. .checkpoints) are run state, not artifacts
+        if not p.is_file() or any(d.startswith(".") for d in name.split("/")[:-1]):
+            continue
+        files[name] = _stage(p, artifacts_root, known.get(name))
+        (target / name).parent.mkdir(parents=True, exist_ok=True)
+        _link(blob_path(artifacts_root, files[name]["sha256"]), target / name)
+
+    # drop links for files that are no longer produced
+    for name in set(previous) - set(files):
+        stale = target / name
+        if stale.exists():
+            stale.unlink()
+        # and the dataset directories they leave empty
+        for parent in stale.relative_to(target).parents[:-1]:
+            try:
+                (target / parent).rmdir()
+            except OSError:
+                break
+
+    (target / MANIFEST_NAME).write_text(
+        json.dumps({"checksum": checksum, "files": files}, indent=2)
+    )
 
     # update master index
     master = artifacts_root / "artifacts_index_master.json"
@@ -21,6 +154,89 @@ def archive_artifacts(standardized_dir: Path, checksum: str) -> Path:
     else:
         data = {}
 
-    data[checksum] = [f.name for f in target.iterdir()]
+    data[checksum] = sorted(files)
     master.write_text(json.dumps(data, indent=2))
     return target
+
+
+def export_zip(standardized_dir: Path, checksum: str) -> Optional[Path]:
+    """ZIP of the artifacts archived for checksum, built once per manifest.
+
+    The ZIP is written to artifacts/exports/<checksum>_<digest>.zip, where
+    digest covers the manifest's file names and hashes, and is reused until
+    archive_artifacts records different files. Parquet and other compressed
+    files are stored as is; the rest is deflated. Returns None if nothing
+    has been archived for checksum.
+    """
+    artifacts_root = standardized_dir.parent / "artifacts"
+    files = _read_manifest(artifacts_root / checksum)
+    if not files:
+        return None
+    listing = json.dumps({n: f["sha256"] for n, f in sorted(files.items())})
+    digest = hashlib.sha256(listing.encode("utf-8")).hexdigest()[:12]
+    exports = artifacts_root / EXPORTS_DIR
+    path = exports / f"{checksum}_{digest}.zip"
+    if path.exists():
+        return path
+
+    exports.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(path)
+    with zipfile.ZipFile(tmp, "w") as zf:
+        for name, f in sorted(files.items()):
+            stored = Path(name).suffix.lower() in STORED_SUFFIXES
+            zf.write(
+                blob_path(artifacts_root, f["sha256"]),
+                arcname=name,
+                compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+            )
+    os.replace(tmp, path)
+    # earlier exports of this checksum are out of date
+    for old in exports.glob(f"{checksum}_*.zip"):
+        if old != path:
+            old.unlink()
+    return path
+
+
+def gc_blobs(artifacts_root: Path, dry_run: bool = False) -> List[Path]:
+    """Delete blobs that no per-checksum manifest references any more.
+
+    Returns the removed (or, with dry_run, removable) blob paths.
+    """
+    referenced = set()
+    for manifest in artifacts_root.glob(f"*/{MANIFEST_NAME}"):
+        referenced.update(f["sha256"] for f in _read_manifest(manifest.parent).values())
+
+    removed = []
+    for blob in sorted((artifacts_root / BLOBS_DIR).glob("*/*")):
+        # in-flight temp files belong to a running store, not to gc
+        if blob.is_file() and blob.name not in referenced and blob.suffix != TMP:
+            removed.append(blob)
+            if not dry_run:
+                blob.unlink()
+    return removed
+
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Maintain the artifact archive")
+    sub = p.add_subparsers(dest="command", required=True)
+    gc = sub.add_parser("gc", help="Remove blobs no manifest references")
+    gc.add_argument(
+        "--root",
+        type=str,
+        default=str(Path(__file__).resolve().parent / "artifacts"),
+        help="Artifacts directory (default: pipeline/artifacts)",
+    )
+    gc.add_argument(
+        "--dry-run", action="store_true", help="List blobs without deleting them"
+    )
+    args = p.parse_args(argv)
+
+    removed = gc_blobs(Path(args.root), dry_run=args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"{verb} {len(removed)} unreferenced blob(s)")
+    for b in removed:
+        print(" ", b)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import copy
+import glob
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from pipeline.ingest import load_mapping, load_schema
+
+BASE = Path(__file__).resolve().parent
+FORMATS = {".csv": "csv", ".parquet": "parquet"}
+PROCESSED_MARKER = ".processed"
+FAILED_MARKER = ".failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def expand_inputs(inputs: Sequence[str]) -> List[Path]:
+    """Resolve directories, globs and plain paths to a sorted list of sources."""
+    found = set()
+    for item in inputs:
+        p = Path(item)
+        if p.is_dir():
+            candidates = [c for c in p.iterdir() if c.is_file()]
+        elif p.is_file():
+            candidates = [p]
+        else:
+            candidates = [Path(m) for m in glob.glob(item, recursive=True)]
+        found.update(c.resolve() for c in candidates if c.suffix.lower() in FORMATS)
+    return sorted(found)
+
+
+def output_name(path: Path, root: Optional[Path] = None) -> str:
+    """Name of path's output directory: the file name plus a short hash of
+    its directory, so same-named files from different places stay apart.
+
+    The directory is taken relative to root (default: the current
+    directory), so a checkout at another location gets the same names and
+    finds the same markers.
+    """
+    parent = Path(os.path.relpath(path.parent, root or Path.cwd())).as_posix()
+    digest = hashlib.sha256(parent.encode()).hexdigest()[:8]
+    return f"{path.name}-{digest}"
+
+
+def mapping_for_file(mapping: Dict[str, Any], path: Path) -> Dict[str, Any]:
+    """Copy of mapping with the source pointed at path (format from suffix)."""
+    m = copy.deepcopy(mapping)
+    source = m.setdefault("source", {})
+    source["table"] = str(path)
+    source["format"] = FORMATS[path.suffix.lower()]
+    return m
+
+
+def _process_file(path: Path, mapping, schema, work_dir: Path, options) -> dict:
+    """Run the pipeline for one file inside a worker and write its marker."""
+    from pipeline.run_demo import run_pipeline
+
+    start = time.perf_counter()
+    if options.get("s3_bucket"):
+        # keep each file's artifacts apart under the shared prefix
+        prefix = (options.get("s3_prefix") or "").rstrip("/")
+        options = {**options, "s3_prefix": f"{prefix}/{work_dir.name}".lstrip("/")}
+    work_dir.mkdir(parents=True, exist_ok=True)
+    (work_dir / FAILED_MARKER).unlink(missing_ok=True)
+    try:
+        run_pipeline(mapping_for_file(mapping, path), schema, work_dir, **options)
+    except Exception as e:
+        (work_dir / FAILED_MARKER).write_text(
+            f"failed at {_now()}\n{traceback.format_exc()}"
+        )
+        status, error = "failed", f"{type(e).__name__}: {e}"
+    else:
+        (work_dir / PROCESSED_MARKER).write_text(f"processed at {_now()}\n")
+        status, error = "processed", None
+    return {
+        "input": str(path),
+        "work_dir": str(work_dir),
+        "status": status,
+        "error": error,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch(
+    inputs: Sequence[str],
+    out_root: Path,
+    mapping_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+    **options: Any,
+) -> Dict[str, Any]:
+    """Process many source files in one process tree.
+
+    The mapping and canonical schema are loaded once and each file runs in a
+    worker of a process pool (tables of a file run inline in that worker).
+    Outputs go to out_root/<output_name(file)>/ (the file name plus a hash
+    of its directory relative to the current directory) with a .processed or
+    .failed marker;
+    files that already have a .processed marker are skipped unless force.
+    A single summary is written to out_root/batch_summary.json and returned.
+    Remaining keyword options are passed on to run_pipeline.
+    """
+    mapping = load_mapping(
+        Path(mapping_path)
+        if mapping_path
+        else BASE / "mappings" / "example_source_a.yaml"
+    )
+    schema = load_schema()
+    options = {**options, "workers": 1}
+    out_root.mkdir(parents=True, exist_ok=True)
+
+    files, results = [], []
+    for path in expand_inputs(inputs):
+        work_dir = out_root / output_name(path)
+        if not force and (work_dir / PROCESSED_MARKER).exists():
+            results.append(
+                {"input": str(path), "work_dir": str(work_dir), "status": "skipped"}
+            )
+        else:
+            files.append((path, work_dir))
+
+    if workers is None:
+        workers = min(len(files), os.cpu_count() or 1)
+    if workers <= 1 or len(files) <= 1:
+        results.extend(_process_file(p, mapping, schema, w, options) for p, w in files)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_process_file, p, mapping, schema, w, options)
+                for p, w in files
+            ]
+            results.extend(f.result() for f in futures)
+
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    summary = {"finished_at": _now(), "counts": counts, "files": results}
+    (out_root / "batch_summary.json").write_text(json.dumps(summary, indent=2))
+    return summary
@@ -0,0 +1,434 @@
+"""Per-stage benchmarks on synthetic sources.
+
+`python -m pipeline.bench run --rows 1000000 --out bench.json` generates a
+source for each example mapping (see pipeline.synthetic), times every stage
+of the vitals path separately and writes throughput and peak memory to a
+JSON baseline, together with the cold import time of the entry points
+(`python -m pipeline.bench imports` measures only those). `--baseline
+old.json` (or the `compare` subcommand) checks a run against an earlier
+baseline and exits 1 on a regression.
+
+Timings are the best of `repeat` runs; peak memory is measured in a separate
+traced run with tracemalloc (Python and numpy allocations), so tracing does
+not inflate the timings.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from pipeline.ingest import load_mapping, load_schema
+
+BASE = Path(__file__).resolve().parent
+DEFAULT_MAPPINGS = [
+    BASE / "mappings" / "example_source_a.yaml",
+    BASE / "mappings" / "example_source_b.yaml",
+]
+MB = 1024 * 1024
+# entry points whose cold import time is tracked
+IMPORT_TARGETS = [
+    "pipeline.cli",
+    "pipeline.run_demo",
+    "pipeline.ingest",
+    "pipeline.normalize",
+    "pipeline.validate",
+]
+
+
+def _measure(
+    fn: Callable[[Any], Any],
+    prepare: Callable[[], Any],
+    repeat: int,
+    memory: bool,
+) -> Dict[str, Any]:
+    """Best-of-repeat wall time of fn(prepare()), plus traced peak memory.
+
+    prepare runs outside the timed region (stages mutate their input, so each
+    run gets a fresh copy). Returns the timing and the last result.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        arg = prepare()
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        arg = prepare()
+        tracemalloc.start()
+        try:
+            fn(arg)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": best, "peak": peak, "result": result}
+
+
+def bench_source(
+    mapping: Dict[str, Any],
+    work_dir: Path,
+    repeat: int = 3,
+    memory: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """Time each vitals stage on mapping's source; returns stage -> metrics."""
+    from pipeline.artifacts import archive_artifacts
+    from pipeline.ingest import read_source, save_standardized
+    from pipeline.normalize import (
+        apply_unit_conversions,
+        datetime_specs,
+        fit_transformers,
+        impute_missing,
+        standardize_types,
+        transform_options,
+        transform_with_artifacts,
+    )
+    from pipeline.plan import table_columns
+    from pipeline.run_demo import _table_mapping
+    from pipeline.validate import validate_vitals
+
+    section = load_schema()["vitals"]
+    mapping = _table_mapping(mapping, "vitals")
+    policy = mapping.get("missing_policy", {})
+    options = transform_options(mapping.get("transform"))
+    formats = datetime_specs(mapping["mappings"]["vitals"])
+    out = work_dir / "standardized"
+    out.mkdir(parents=True, exist_ok=True)
+
+    state: Dict[str, Any] = {}
+
+    def fresh(key: str) -> Callable[[], pd.DataFrame]:
+        return lambda: state[key].copy()
+
+    def fit(df: pd.DataFrame):
+        return fit_transformers(
+            df,
+            *state["cols"],
+            out,
+            artifact_prefix="bench_ct",
+            sparse=options["output"] == "sparse",
+            max_categories=options["max_categories"],
+            min_frequency=options["min_frequency"],
+        )
+
+    plan = [
+        ("read_source", lambda _: read_source(mapping, Path("."))["vitals"], None),
+        (
+            "apply_unit_conversions",
+            lambda df: apply_unit_conversions(df, mapping, "vitals", section),
+            "read_source",
+        ),
+        (
+            "standardize_types",
+            lambda df: standardize_types(df, section, formats=formats),
+            "apply_unit_conversions",
+        ),
+        (
+            "impute_missing",
+            lambda df: impute_missing(df, policy),
+            "standardize_types",
+        ),
+        ("fit_transformers", fit, "impute_missing"),
+        (
+            "transform_with_artifacts",
+            lambda df: transform_with_artifacts(
+                df, out / "bench_ct.joblib", options["output"]
+            ),
+            "impute_missing",
+        ),
+        (
+            "validate_vitals",
+            lambda _: validate_vitals(out / "vitals.parquet", out, "bench_validation"),
+            None,
+        ),
+        ("archive_artifacts", lambda _: archive_artifacts(out, "bench"), None),
+    ]
+
+    def cold_archive() -> None:
+        # archiving skips unchanged files, so every run starts from scratch
+        shutil.rmtree(work_dir / "artifacts", ignore_errors=True)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for stage, fn, source in plan:
+        if stage == "archive_artifacts":
+            prepare = cold_archive
+        else:
+            prepare = fresh(source) if source else lambda: None
+        m = _measure(fn, prepare, repeat, memory)
+        state[stage] = m["result"]
+        if stage == "read_source":
+            rows = len(m["result"])
+        elif stage == "impute_missing":
+            df = m["result"]
+            state["cols"] = table_columns(section, df.columns)
+            # validation and archiving work on the saved standardized table
+            save_standardized({"vitals": df}, out)
+        results[stage] = {
+            "seconds": round(m["seconds"], 6),
+            "rows_per_s": round(rows / m["seconds"], 1) if m["seconds"] else None,
+            "peak_mb": None if m["peak"] is None else round(m["peak"] / MB, 3),
+        }
+    return results
+
+
+def run_benchmarks(
+    rows: int,
+    work_dir: Path,
+    mappings: Optional[List[Path]] = None,
+    repeat: int = 3,
+    memory: bool = True,
+    **generate_options: Any,
+) -> Dict[str, Any]:
+    """Generate a source per mapping and benchmark it; returns the baseline.
+
+    generate_options (null_rate, cardinality, extra_columns, seed, ...) are
+    passed to synthetic.generate_source and recorded in the baseline.
+    """
+    from pipeline.synthetic import generate_source
+
+    sources = {}
+    for mapping_path in mappings or DEFAULT_MAPPINGS:
+        mapping = load_mapping(Path(mapping_path))
+        fmt = mapping.get("source", {}).get("format", "csv")
+        name = Path(mapping_path).stem
+        source_dir = work_dir / name
+        path = generate_source(
+            mapping, source_dir / f"source.{fmt}", rows, **generate_options
+        )
+        mapping["source"] = {**mapping["source"], "table": str(path)}
+        sources[name] = {
+            "format": fmt,
+            "bytes": path.stat().st_size,
+            "stages": bench_source(mapping, source_dir, repeat, memory),
+        }
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "rows": rows,
+        "repeat": repeat,
+        "options": generate_options,
+        "environment": _environment(),
+        "sources": sources,
+        "imports": import_times(repeat=repeat),
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _import_seconds(module: str) -> float:
+    """Cumulative import time of module in a fresh interpreter (-X importtime)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=BASE.parent,
+    )
+    for line in reversed(proc.stderr.splitlines()):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f"No import timing reported for {module}")
+
+
+def import_times(
+    modules: Optional[List[str]] = None, repeat: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """Best-of-repeat cold import time per module, plus `pipeline.cli --help`.
+
+    Every measurement starts a new interpreter, so nothing is cached in
+    sys.modules; the --help entry is the wall time of the whole process.
+    """
+    results = {}
+    for module in modules or IMPORT_TARGETS:
+        best = min(_import_seconds(module) for _ in range(max(1, repeat)))
+        results[module] = {"seconds": round(best, 6)}
+    cmd = [sys.executable, "-m", "pipeline.cli", "--help"]
+    walls = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        subprocess.run(cmd, capture_output=True, check=True, cwd=BASE.parent)
+        walls.append(time.perf_counter() - start)
+    results["pipeline.cli --help"] = {"seconds": round(min(walls), 6)}
+    return results
+
+
+def _compare_stages(
+    source: str,
+    base: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float,
+    memory_tolerance: float,
+    min_seconds: float,
+) -> List[str]:
+    problems = []
+    for stage, old in base.items():
+        new = current.get(stage)
+        if new is None:
+            problems.append(f"{source}/{stage}: missing from current run")
+            continue
+        slow = max(old["seconds"], new["seconds"]) >= min_seconds
+        if slow and new["seconds"] > old["seconds"] * (1 + tolerance):
+            problems.append(
+                f"{source}/{stage}: {new['seconds']:.3f}s vs "
+                f"{old['seconds']:.3f}s baseline"
+            )
+        if (
+            old.get("peak_mb") is not None
+            and new.get("peak_mb") is not None
+            and new["peak_mb"] > old["peak_mb"] * (1 + memory_tolerance) + 1
+        ):
+            problems.append(
+                f"{source}/{stage}: peak {new['peak_mb']:.1f} MB vs "
+                f"{old['peak_mb']:.1f} MB baseline"
+            )
+    return problems
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = 0.25,
+    memory_tolerance: float = 0.25,
+    min_seconds: float = 0.05,
+) -> List[str]:
+    """Regressions of current against baseline, as readable messages.
+
+    A stage regresses when its throughput drops by more than tolerance
+    (ignoring stages faster than min_seconds in both runs, which are mostly
+    noise) or its peak memory grows by more than memory_tolerance. Import
+    times regress when they grow by more than tolerance plus 10 ms.
+    """
+    problems = []
+    if "sources" in baseline and baseline.get("rows") != current.get("rows"):
+        problems.append(
+            f"row count differs: baseline {baseline.get('rows')}, "
+            f"current {current.get('rows')}"
+        )
+    for source, base in baseline.get("sources", {}).items():
+        stages = current.get("sources", {}).get(source, {}).get("stages", {})
+        problems += _compare_stages(
+            source,
+            base.get("stages", {}),
+            stages,
+            tolerance,
+            memory_tolerance,
+            min_seconds,
+        )
+    imports = current.get("imports", {})
+    for target, old in baseline.get("imports", {}).items():
+        new = imports.get(target)
+        if new is not None and new["seconds"] > old["seconds"] * (1 + tolerance) + 0.01:
+            problems.append(
+                f"import {target}: {new['seconds'] * 1000:.0f} ms vs "
+                f"{old['seconds'] * 1000:.0f} ms baseline"
+            )
+    return problems
+
+
+def _print_table(result: Dict[str, Any]) -> None:
+    for source, data in result.get("sources", {}).items():
+        print(f"{source} ({data['format']}, {result['rows']} rows)")
+        for stage, m in data["stages"].items():
+            peak = "-" if m["peak_mb"] is None else f"{m['peak_mb']:.1f} MB"
+            print(
+                f"  {stage:<26} {m['seconds']:>9.3f}s "
+                f"{m['rows_per_s'] or 0:>14,.0f} rows/s  {peak}"
+            )
+    if result.get("imports"):
+        print("cold imports")
+        for target, m in result["imports"].items():
+            print(f"  {target:<26} {m['seconds'] * 1000:>8.1f} ms")
+
+
+def _report(problems: List[str]) -> int:
+    for msg in problems:
+        print("REGRESSION", msg)
+    return 1 if problems else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Benchmark pipeline stages")
+    sub = p.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Generate sources and time every stage")
+    run.add_argument("--rows", "-n", type=int, default=100_000)
+    run.add_argument("--out", "-o", default="bench.json", help="Result JSON")
+    run.add_argument("--work-dir", default="bench_work", help="Scratch directory")
+    run.add_argument("--mapping", action="append", help="Mapping YAML (repeatable)")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--no-memory", action="store_true", help="Skip the traced run")
+    run.add_argument("--null-rate", type=float, default=0.02)
+    run.add_argument("--cardinality", type=int, default=100)
+    run.add_argument(
+        "--patients",
+        type=int,
+        default=100,
+        help="Distinct patient ids; every id becomes a one-hot column",
+    )
+    run.add_argument("--extra-columns", type=int, default=0)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--baseline", help="Compare against this result JSON")
+    run.add_argument("--tolerance", type=float, default=0.25)
+    imp = sub.add_parser("imports", help="Time cold imports of the entry points")
+    imp.add_argument("--out", "-o", default="imports.json", help="Result JSON")
+    imp.add_argument("--repeat", type=int, default=5)
+    imp.add_argument("--baseline", help="Compare against this result JSON")
+    imp.add_argument("--tolerance", type=float, default=0.25)
+    cmp_ = sub.add_parser("compare", help="Compare two result JSON files")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--tolerance", type=float, default=0.25)
+    args = p.parse_args(argv)
+
+    if args.command == "compare":
+        baseline = json.loads(Path(args.baseline).read_text())
+        current = json.loads(Path(args.current).read_text())
+        return _report(compare(baseline, current, args.tolerance))
+
+    if args.command == "imports":
+        result = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "environment": _environment(),
+            "imports": import_times(repeat=args.repeat),
+        }
+    else:
+        result = run_benchmarks(
+            args.rows,
+            Path(args.work_dir),
+            mappings=args.mapping,
+            repeat=args.repeat,
+            memory=not args.no_memory,
+            null_rate=args.null_rate,
+            cardinality=args.cardinality,
+            n_patients=args.patients,
+            extra_columns=args.extra_columns,
+            seed=args.seed,
+        )
+    Path(args.out).write_text(json.dumps(result, indent=2))
+    _print_table(result)
+    print(f"Wrote {args.out}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        return _report(compare(baseline, result, args.tolerance))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import argparse
-
-from pipeline.run_demo import run_demo
+import os
+import sys
+from pathlib import Path
 
 
 def main():
@@ -18,15 +19,118 @@ def main():
     p.add_argument(
         "--s3-prefix", type=str, default="", help="S3 prefix (folder) under the bucket"
     )
+    p.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="Stream the source in batches of N rows to bound memory (optional)",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "Processes used to run tables concurrently (default: inline, one"
+            " after another); with --batch, files processed concurrently"
+            " (default: one per file, capped at the CPU count)"
+        ),
+    )
+    p.add_argument(
+        "--validate-workers",
+        type=int,
+        default=None,
+        help=(
+            "Processes used to validate each table's row groups in parallel"
+            " (sets PIPELINE_VALIDATE_WORKERS; default: serial). Applies to"
+            " full runs, chunked or not: in-memory runs then validate the"
+            " saved file instead of the frame. Incremental appends validate"
+            " serially"
+        ),
+    )
+    p.add_argument(
+        "--reuse-artifacts",
+        action="store_true",
+        help="Skip transformer fitting when a fitted artifact for this mapping exists",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process source rows added since the last checkpointed run",
+    )
+    p.add_argument(
+        "--partition-by",
+        type=lambda v: [k for k in v.split(",") if k],
+        default=None,
+        metavar="KEYS",
+        help=(
+            "Also write standardized/<table>_dataset/ partitioned by these"
+            " comma-separated keys: date, patient_bucket"
+        ),
+    )
+    p.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="INPUT",
+        help=(
+            "Process many source files (directories, globs or paths) in one run;"
+            " outputs go to <work-dir>/<file name>-<dir hash>/ with .processed/.failed"
+            " markers"
+        ),
+    )
+    p.add_argument(
+        "--stage-peak-rss",
+        action="store_true",
+        help=(
+            "Record each stage's own peak RSS in the run metrics (resets the"
+            " process's peak mark per stage; sets PIPELINE_STAGE_PEAK_RSS)"
+        ),
+    )
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="With --batch, reprocess files that already have a .processed marker",
+    )
     args = p.parse_args()
+    if args.validate_workers:
+        # read by validate_table, including in table and batch pool workers
+        os.environ["PIPELINE_VALIDATE_WORKERS"] = str(args.validate_workers)
+    if args.stage_peak_rss:
+        os.environ["PIPELINE_STAGE_PEAK_RSS"] = "1"
+
+    if args.batch:
+        from pipeline.batch import run_batch
+
+        summary = run_batch(
+            args.batch,
+            Path(args.work_dir or "standardized"),
+            mapping_path=args.mapping,
+            workers=args.workers,
+            force=args.force,
+            s3_bucket=args.s3_bucket,
+            s3_prefix=args.s3_prefix,
+            chunk_rows=args.chunk_rows,
+            reuse_artifacts=args.reuse_artifacts,
+            incremental=args.incremental,
+            partition_by=args.partition_by,
+        )
+        print("Batch complete:", summary["counts"])
+        return 1 if summary["counts"].get("failed") else 0
+
+    from pipeline.run_demo import run_demo
 
     run_demo(
         mapping_path=args.mapping,
         work_dir=args.work_dir,
         s3_bucket=args.s3_bucket,
         s3_prefix=args.s3_prefix,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        reuse_artifacts=args.reuse_artifacts,
+        incremental=args.incremental,
+        partition_by=args.partition_by,
     )
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Checkpoints for incremental ingest of append-only sources.
+
+A checkpoint records how far a source has been processed for one mapping
+checksum: a row offset, the byte offset for CSV, a fingerprint of the
+processed prefix, and the max timestamp seen per table. Reruns read only
+the rows past the checkpoint when the fingerprint still matches; otherwise
+the source was rewritten and is processed in full again.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pyarrow.parquet as pq
+
+CHECKPOINT_DIR = ".checkpoints"
+# bytes hashed at the start and just before the offset of a CSV source
+FINGERPRINT_BYTES = 64 * 1024
+# rows hashed at the start and the end of a parquet source's processed prefix
+FINGERPRINT_ROWS = 1024
+
+
+def checkpoint_path(out_dir: Path, mapping: Dict[str, Any], checksum: str) -> Path:
+    source = Path(mapping.get("source", {}).get("table", "source"))
+    return out_dir / CHECKPOINT_DIR / f"{source.name}_{checksum}.json"
+
+
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except ValueError:
+        return None
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint = {**checkpoint, "updated_at": datetime.now(timezone.utc).isoformat()}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(checkpoint, indent=2))
+    tmp.replace(path)
+
+
+def _csv_fingerprint(path: Path, end: int) -> Dict[str, Any]:
+    with open(path, "rb") as fh:
+        head = fh.read(min(FINGERPRINT_BYTES, end))
+        fh.seek(max(0, end - FINGERPRINT_BYTES))
+        tail = fh.read(min(FINGERPRINT_BYTES, end))
+    return {
+        "head": hashlib.sha256(head).hexdigest(),
+        "tail": hashlib.sha256(tail).hexdigest(),
+    }
+
+
+def _rows_sha256(path: Path, start: int, end: int) -> str:
+    import pandas as pd
+
+    from pipeline.ingest import read_parquet_rows
+
+    df = read_parquet_rows(path, start, end)
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+def _parquet_fingerprint(path: Path, rows: int) -> Dict[str, Any]:
+    """Fingerprint of the first `rows` rows of a parquet source.
+
+    Hashes the schema, the values of the first and last FINGERPRINT_ROWS
+    rows, and the row counts and column statistics of the row groups that
+    end before the prefix's last group (so a writer that regroups only the
+    growing tail still counts as appending).
+    """
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    groups, pos = hashlib.sha256(), 0
+    for i in range(meta.num_row_groups):
+        rg = meta.row_group(i)
+        pos += rg.num_rows
+        if pos >= rows:
+            break
+        stats = [rg.column(j).statistics for j in range(rg.num_columns)]
+        groups.update(repr([rg.num_rows] + [s and s.to_dict() for s in stats]).encode())
+    return {
+        "schema": pf.schema_arrow.to_string(show_schema_metadata=False),
+        "groups": groups.hexdigest(),
+        "head": _rows_sha256(path, 0, min(FINGERPRINT_ROWS, rows)),
+        "tail": _rows_sha256(path, max(0, rows - FINGERPRINT_ROWS), rows),
+    }
+
+
+def _csv_bounds(path: Path) -> Dict[str, int]:
+    """Byte offsets of the first data line, of the end of the last full line
+    and of the end of the file."""
+    size = path.stat().st_size
+    with open(path, "rb") as fh:
+        data_start = len(fh.readline())
+        # ignore a trailing partial line still being written
+        fh.seek(max(data_start, size - FINGERPRINT_BYTES))
+        tail = fh.read()
+    cut = tail.rfind(b"\n")
+    end = size - len(tail) + cut + 1 if cut >= 0 else data_start
+    return {"data_start": data_start, "end": max(end, data_start), "size": size}
+
+
+def plan_delta(
+    source_path: Path, fmt: str, checkpoint: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Work out which part of the source still needs processing.
+
+    Returns the read range for ingest.read_source_range plus "append": True
+    when the range continues a valid checkpoint, False for a full reprocess.
+    A full reprocess reads a CSV to its end; an append leaves an unterminated
+    last line, which may still be being written, for the next run.
+    """
+    if fmt == "csv":
+        bounds = _csv_bounds(source_path)
+        end = bounds["end"]
+        if checkpoint and checkpoint.get("format") == "csv":
+            offset = checkpoint["byte_offset"]
+            if offset <= end and checkpoint.get("fingerprint") == _csv_fingerprint(
+                source_path, offset
+            ):
+                return {
+                    "byte_start": offset,
+                    "byte_end": end,
+                    "row_start": checkpoint["rows"],
+                    "append": True,
+                }
+        return {
+            "byte_start": bounds["data_start"],
+            "byte_end": bounds["size"],
+            "row_start": 0,
+            "append": False,
+        }
+    if fmt == "parquet":
+        total = pq.ParquetFile(source_path).metadata.num_rows
+        if (
+            checkpoint
+            and checkpoint.get("format") == "parquet"
+            and checkpoint["rows"] <= total
+            and checkpoint.get("fingerprint")
+            == _parquet_fingerprint(source_path, checkpoint["rows"])
+        ):
+            return {"row_start": checkpoint["rows"], "row_end": total, "append": True}
+        return {"row_start": 0, "row_end": total, "append": False}
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def next_checkpoint(
+    source_path: Path,
+    fmt: str,
+    delta: Dict[str, Any],
+    rows: int,
+    max_timestamps: Dict[str, Any],
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Checkpoint describing the source once delta has been processed."""
+    watermarks = (
+        dict((previous or {}).get("max_timestamp", {})) if delta["append"] else {}
+    )
+    for table, ts in max_timestamps.items():
+        if ts is not None and (table not in watermarks or ts > watermarks[table]):
+            watermarks[table] = ts
+    checkpoint = {
+        "source": str(source_path),
+        "format": fmt,
+        "rows": delta["row_start"] + rows,
+        "max_timestamp": watermarks,
+    }
+    if fmt == "csv":
+        checkpoint["byte_offset"] = delta["byte_end"]
+        checkpoint["fingerprint"] = _csv_fingerprint(source_path, delta["byte_end"])
+    else:
+        checkpoint["fingerprint"] = _parquet_fingerprint(
+            source_path, checkpoint["rows"]
+        )
+    return checkpoint
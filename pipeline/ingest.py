@@ -1,33 +1,49 @@
+import copy
+import io
+import json
+import os
+import shutil
+import uuid
+import zlib
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import yaml
 
+SCHEMA_PATH = Path(__file__).resolve().parent / "canonical_schema.yaml"
 
-def load_mapping(path: Path) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
 
+# (resolved path, size, mtime_ns) -> parsed YAML, so warm processes (batch
+# workers, pipeline.worker, the UI) parse each mapping and the schema once
+_yaml_cache: Dict[Tuple[str, int, int], Any] = {}
+YAML_CACHE_SIZE = 64
 
-def read_source(mapping: Dict[str, Any], base_path: Path) -> Dict[str, pd.DataFrame]:
-    """Read source data according to mapping and return raw DataFrames.
 
-    Supports CSV and Parquet.
-    """
-    source = mapping.get("source", {})
-    fmt = source.get("format", "csv")
-    table = source.get("table")
+def load_mapping(path: Path) -> Dict[str, Any]:
+    """Parse a YAML file; callers get their own copy of the cached result."""
+    st = os.stat(path)
+    key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    data = _yaml_cache.get(key)
+    if data is None:
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f)
+        if len(_yaml_cache) >= YAML_CACHE_SIZE:
+            _yaml_cache.clear()
+        _yaml_cache[key] = data
+    return copy.deepcopy(data)
 
-    full_path = base_path / table
-    if fmt == "csv":
-        df = pd.read_csv(full_path)
-    elif fmt == "parquet":
-        df = pd.read_parquet(full_path)
-    else:
-        raise ValueError(f"Unsupported format: {fmt}")
 
-    # split into logical tables based on mapping keys (demographics, vitals, labs)
+def load_schema(path: Path = SCHEMA_PATH) -> Dict[str, Any]:
+    """Load the canonical schema (table -> field -> metadata, plus `storage`)."""
+    return load_mapping(path)
+
+
+def _table_selects(mapping: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """Return table_name -> {canonical_name: source_column} from a mapping."""
     out = {}
     for table_name, cols in mapping.get("mappings", {}).items():
         # build a selection mapping: canonical_name -> source_column or dict
@@ -37,17 +53,642 @@ def read_source(mapping: Dict[str, Any], base_path: Path) -> Dict[str, pd.DataFr
                 select[canon] = src.get("column")
             else:
                 select[canon] = src
+        out[table_name] = select
+    return out
+
+
+def mapping_columns(mapping: Dict[str, Any]) -> List[str]:
+    """Union of source columns referenced by the mapping, in first-seen order."""
+    seen: Dict[str, None] = {}
+    for select in _table_selects(mapping).values():
+        for src in select.values():
+            if src is not None:
+                seen.setdefault(src, None)
+    return list(seen)
+
+
+def read_plan(
+    mapping: Dict[str, Any], plan: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """The parts of a mapping plan the readers use: source columns and selects.
+
+    A compiled plan (pipeline.plan) already has them; otherwise they are
+    derived from the mapping.
+    """
+    if plan is not None:
+        return plan
+    return {
+        "columns": mapping_columns(mapping),
+        "tables": {t: {"select": s} for t, s in _table_selects(mapping).items()},
+    }
+
+
+def _split_tables(df: pd.DataFrame, plan: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    # split into logical tables based on mapping keys (demographics, vitals, labs)
+    out = {}
+    for table_name, table_plan in plan["tables"].items():
+        select = table_plan["select"]
         # filter only columns that exist to avoid KeyError
         available = {k: v for k, v in select.items() if v in df.columns}
         out[table_name] = df[list(available.values())].rename(
             columns={v: k for k, v in available.items()}
         )
-
     return out
 
 
-def save_standardized(dfs: Dict[str, pd.DataFrame], out_dir: Path):
+def _source_path(mapping: Dict[str, Any], base_path: Path) -> Path:
+    return base_path / mapping.get("source", {}).get("table")
+
+
+def _parquet_columns(path: Path, wanted: List[str]) -> List[str]:
+    # project only columns present in the file so a sparse mapping still reads
+    names = set(pq.read_schema(path).names)
+    return [c for c in wanted if c in names]
+
+
+def read_source(
+    mapping: Dict[str, Any], base_path: Path, plan: Optional[Dict[str, Any]] = None
+) -> Dict[str, pd.DataFrame]:
+    """Read source data according to mapping and return raw DataFrames.
+
+    Supports CSV and Parquet. Only the source columns referenced by the
+    mapping are parsed (``usecols`` for CSV, column projection for Parquet).
+    plan is a compiled mapping plan (see read_plan).
+    """
+    source = mapping.get("source", {})
+    fmt = source.get("format", "csv")
+    full_path = _source_path(mapping, base_path)
+    plan = read_plan(mapping, plan)
+    wanted = set(plan["columns"])
+
+    if fmt == "csv":
+        df = pd.read_csv(
+            full_path,
+            usecols=lambda c: c in wanted,
+            encoding=source.get("encoding", "utf-8"),
+        )
+    elif fmt == "parquet":
+        df = pd.read_parquet(
+            full_path, columns=_parquet_columns(full_path, list(wanted))
+        )
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    return _split_tables(df, plan)
+
+
+def read_parquet_rows(
+    path: Path,
+    row_start: int = 0,
+    row_end: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Read rows [row_start, row_end) of a parquet file.
+
+    Only the row groups overlapping the range are decoded. The result is
+    indexed by row position in the file.
+    """
+    pf = pq.ParquetFile(path)
+    if row_end is None:
+        row_end = pf.metadata.num_rows
+    groups, first, pos = [], 0, 0
+    for i in range(pf.num_row_groups):
+        n = pf.metadata.row_group(i).num_rows
+        if pos + n > row_start and pos < row_end:
+            if not groups:
+                first = pos
+            groups.append(i)
+        pos += n
+    if groups:
+        table = pf.read_row_groups(groups, columns=columns)
+        table = table.slice(row_start - first, row_end - row_start)
+    else:
+        table = pf.schema_arrow.empty_table()
+        if columns is not None:
+            table = table.select(columns)
+    df = table.to_pandas()
+    df.index = pd.RangeIndex(row_start, row_start + len(df))
+    return df
+
+
+def read_source_range(
+    mapping: Dict[str, Any],
+    base_path: Path,
+    delta: Dict[str, int],
+    plan: Optional[Dict[str, Any]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Read only part of the source, as planned by pipeline.incremental.
+
+    CSV deltas are byte ranges [byte_start, byte_end) of whole lines after
+    the header; Parquet deltas are row ranges [row_start, row_end). Frames
+    are indexed by source row position starting at row_start.
+    """
+    source = mapping.get("source", {})
+    fmt = source.get("format", "csv")
+    full_path = _source_path(mapping, base_path)
+    plan = read_plan(mapping, plan)
+    wanted = plan["columns"]
+    row_start = delta.get("row_start", 0)
+
+    if fmt == "csv":
+        with open(full_path, "rb") as fh:
+            header = fh.readline()
+            fh.seek(delta["byte_start"])
+            body = fh.read(delta["byte_end"] - delta["byte_start"])
+        allowed = set(wanted)
+        df = pd.read_csv(
+            io.BytesIO(header + body),
+            usecols=lambda c: c in allowed,
+            encoding=source.get("encoding", "utf-8"),
+        )
+    elif fmt == "parquet":
+        columns = _parquet_columns(full_path, wanted)
+        df = read_parquet_rows(full_path, row_start, delta["row_end"], columns)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    df.index = pd.RangeIndex(row_start, row_start + len(df))
+    return _split_tables(df, plan)
+
+
+def iter_parquet(
+    path: Path, batch_size: int, columns: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """Yield a parquet file as DataFrames of at most batch_size rows.
+
+    Each batch is indexed by its row position in the file, as the CSV chunk
+    reader does.
+    """
+    pf = pq.ParquetFile(path)
+    offset = 0
+    for batch in pf.iter_batches(batch_size=batch_size, columns=columns):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def iter_source(
+    mapping: Dict[str, Any],
+    base_path: Path,
+    batch_size: int = 100_000,
+    plan: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, pd.DataFrame]]:
+    """Stream the source in record batches of at most batch_size rows.
+
+    Yields the same table_name -> DataFrame split as read_source, one dict
+    per batch, so downstream stages can process the source incrementally.
+    plan is a compiled mapping plan (see read_plan).
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+    source = mapping.get("source", {})
+    fmt = source.get("format", "csv")
+    full_path = _source_path(mapping, base_path)
+    plan = read_plan(mapping, plan)
+    wanted = plan["columns"]
+
+    if fmt == "csv":
+        allowed = set(wanted)
+        reader = pd.read_csv(
+            full_path,
+            usecols=lambda c: c in allowed,
+            encoding=source.get("encoding", "utf-8"),
+            chunksize=batch_size,
+        )
+        with reader:
+            for chunk in reader:
+                yield _split_tables(chunk, plan)
+    elif fmt == "parquet":
+        columns = _parquet_columns(full_path, wanted)
+        for chunk in iter_parquet(full_path, batch_size, columns=columns):
+            yield _split_tables(chunk, plan)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+# defaults for the `storage` section of canonical_schema.yaml
+STORAGE_DEFAULTS: Dict[str, Any] = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "row_group_size": 256 * 1024,
+    "write_statistics": True,
+    "write_page_index": True,
+    # schema field type -> storage type ("plain" keeps the frame's dtype)
+    "types": {
+        "categorical": "dictionary",
+        "string": "dictionary",
+        # float32 is opted into per field, as it rounds e.g. lab values
+        "numeric": "plain",
+    },
+}
+PARQUET_OPTIONS = (
+    "compression",
+    "compression_level",
+    "row_group_size",
+    "write_statistics",
+    "write_page_index",
+)
+INT_STORAGE = ("int8", "int16", "int32", "int64")
+
+# partition key -> (source column, partition value type)
+PARTITION_KEYS = {
+    "date": ("timestamp", pa.date32()),
+    "patient_bucket": ("patient_id", pa.int32()),
+}
+PATIENT_BUCKETS = 32
+DATASET_META = "_dataset.json"
+SORT_KEYS = ("patient_id", "timestamp")
+
+
+def storage_policy(schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """STORAGE_DEFAULTS overridden by the schema's top-level `storage` section."""
+    schema = load_schema() if schema is None else schema
+    section = schema.get("storage") or {}
+    policy = {**STORAGE_DEFAULTS, **section}
+    policy["types"] = {**STORAGE_DEFAULTS["types"], **(section.get("types") or {})}
+    return policy
+
+
+def parquet_options(policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """pyarrow write options (codec, level, row groups, statistics, page index)."""
+    policy = storage_policy() if policy is None else policy
+    return {k: policy[k] for k in PARQUET_OPTIONS if policy.get(k) is not None}
+
+
+def field_storage(meta: Dict[str, Any], policy: Dict[str, Any]) -> Optional[str]:
+    """Storage type of one schema field, or None to keep the frame's dtype.
+
+    A field's own `storage` wins over the per-type default. `storage: int`
+    picks the smallest signed integer type holding the field's min/max.
+    """
+    spec = meta.get("storage", policy["types"].get(meta.get("type")))
+    if spec == "int":
+        lo, hi = meta.get("min"), meta.get("max")
+        if lo is None or hi is None:
+            return "int64"
+        for name in INT_STORAGE:
+            info = np.iinfo(name)
+            if info.min <= lo and hi <= info.max:
+                return name
+        return "int64"
+    return None if spec in (None, "plain") else spec
+
+
+def apply_storage_dtypes(
+    df: pd.DataFrame,
+    schema_section: Dict[str, Any],
+    policy: Optional[Dict[str, Any]] = None,
+    categories: Optional[Dict[str, List[Any]]] = None,
+) -> pd.DataFrame:
+    """df with its columns cast to the compact dtypes of the storage policy.
+
+    Returns a new frame (sharing the columns that are not cast), so the
+    caller's frame keeps its dtypes. Dictionary fields become pandas
+    categoricals (Arrow dictionary arrays in parquet) with sorted categories;
+    pass `categories` (column -> levels) so batches of one table share the
+    same dictionary. Integer storage uses the nullable pandas types and fails
+    on non-integral values.
+    """
+    policy = storage_policy() if policy is None else policy
+    df = df.copy(deep=False)
+    for col, meta in schema_section.items():
+        if col not in df.columns:
+            continue
+        spec = field_storage(meta or {}, policy)
+        s = df[col]
+        if spec == "dictionary":
+            if categories is not None and col in categories:
+                levels = [v for v in categories[col] if not pd.isna(v)]
+            elif isinstance(s.dtype, pd.CategoricalDtype):
+                continue
+            else:
+                levels = sorted(s.dropna().unique())
+            df[col] = s.astype(pd.CategoricalDtype(levels))
+        elif spec is not None:
+            dtype = spec.capitalize() if spec in INT_STORAGE else spec
+            # leave columns already in storage dtype untouched, so frames
+            # shared with other threads are not written to
+            if s.dtype != dtype:
+                df[col] = s.astype(dtype)
+    return df
+
+
+def save_standardized(
+    dfs: Dict[str, pd.DataFrame],
+    out_dir: Path,
+    schema: Optional[Dict[str, Any]] = None,
+    partition_by: Optional[Sequence[str]] = None,
+    buckets: int = PATIENT_BUCKETS,
+):
+    """Write each frame to out_dir/<name>.parquet with the storage policy.
+
+    Frames named after a schema table are cast to the policy's compact
+    dtypes first; every file gets the policy's parquet options. Sparse
+    frames are stored as CSR rows (see sparse_to_arrow). With
+    partition_by, schema tables that have the partition columns are also
+    written as a Hive-partitioned dataset out_dir/<name>_dataset/ (see
+    write_dataset).
+    """
+    schema = load_schema() if schema is None else schema
+    policy = storage_policy(schema)
+    options = parquet_options(policy)
     out_dir.mkdir(parents=True, exist_ok=True)
     for name, df in dfs.items():
+        table = name != "storage" and isinstance(schema.get(name), dict)
+        if table:
+            df = apply_storage_dtypes(df, schema[name], policy)
         path = out_dir / f"{name}.parquet"
-        df.to_parquet(path, index=False)
+        pq.write_table(to_arrow(df), path, **options)
+        if table and partitionable(df.columns, partition_by):
+            write_dataset(
+                df, out_dir / f"{name}_dataset", partition_by, buckets, options
+            )
+
+
+def partitionable(
+    columns: Iterable[str], partition_by: Optional[Sequence[str]]
+) -> bool:
+    """Whether columns include the source column of every partition key."""
+    return bool(partition_by) and set(_partition_columns(partition_by)) <= set(columns)
+
+
+# parquet schema metadata key holding a sparse file's feature names
+SPARSE_FEATURES_KEY = b"pipeline.sparse_features"
+
+
+def is_sparse_frame(df: pd.DataFrame) -> bool:
+    """Whether every column of df is a pandas sparse column."""
+    return len(df.columns) > 0 and all(isinstance(t, pd.SparseDtype) for t in df.dtypes)
+
+
+def sparse_frame(matrix: Any, columns: Sequence[str]) -> pd.DataFrame:
+    """A scipy sparse matrix as a frame of sparse columns filled with 0.
+
+    (DataFrame.sparse.from_spmatrix fills with NaN in current pandas.)
+    """
+    matrix = matrix.tocsc()
+    return pd.DataFrame(
+        {
+            name: pd.arrays.SparseArray.from_spmatrix(matrix[:, [i]])
+            for i, name in enumerate(columns)
+        },
+        index=pd.RangeIndex(matrix.shape[0]),
+    )
+
+
+def sparse_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """A sparse frame as one parquet row per frame row, in CSR form.
+
+    Columns "indices" (large_list<int32>, the non-zero feature positions)
+    and "values" (large_list<float64>) hold each row's entries; the feature names are
+    kept in the schema metadata, so appending rows keeps the layout.
+    """
+    matrix = df.sparse.to_coo().tocsr()
+    matrix.sort_indices()
+    offsets = pa.array(matrix.indptr.astype("int64"))
+    table = pa.table(
+        {
+            "indices": pa.LargeListArray.from_arrays(
+                offsets, pa.array(matrix.indices.astype("int32"))
+            ),
+            "values": pa.LargeListArray.from_arrays(
+                offsets, pa.array(matrix.data.astype("float64"))
+            ),
+        }
+    )
+    features = json.dumps([str(c) for c in df.columns])
+    return table.replace_schema_metadata({SPARSE_FEATURES_KEY: features})
+
+
+def read_sparse(path: Path) -> pd.DataFrame:
+    """Read a file written from a sparse frame back into a sparse frame."""
+    from scipy import sparse
+
+    table = pq.read_table(path)
+    features = json.loads(table.schema.metadata[SPARSE_FEATURES_KEY])
+    indices = table.column("indices").combine_chunks()
+    values = table.column("values").combine_chunks()
+    indptr = indices.offsets.to_numpy()
+    matrix = sparse.csr_matrix(
+        (
+            values.values.to_numpy()[indptr[0] : indptr[-1]],
+            indices.values.to_numpy()[indptr[0] : indptr[-1]],
+            indptr - indptr[0],
+        ),
+        shape=(table.num_rows, len(features)),
+    )
+    return sparse_frame(matrix, features)
+
+
+def to_arrow(df: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+    """df as an Arrow table (CSR rows for sparse frames), cast to schema."""
+    if is_sparse_frame(df):
+        table = sparse_to_arrow(df)
+        return table if schema is None else table.cast(schema)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _writer_options(options: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int]]:
+    # ParquetWriter takes everything but the row group size, which goes to
+    # write_table
+    writer = {k: v for k, v in options.items() if k != "row_group_size"}
+    return writer, options.get("row_group_size")
+
+
+def write_parquet_batches(
+    batches: Iterable[pd.DataFrame],
+    path: Path,
+    options: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Write DataFrame batches to a single parquet file.
+
+    Each batch becomes one row group (split further if it is larger than the
+    policy's row_group_size). The first batch fixes the schema; later batches
+    are cast to it. options defaults to parquet_options(). Returns the number
+    of rows written.
+    """
+    writer_opts, row_group_size = _writer_options(
+        parquet_options() if options is None else options
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    schema = None
+    rows = 0
+    try:
+        for df in batches:
+            if schema is None:
+                table = to_arrow(df)
+                schema = table.schema
+                writer = pq.ParquetWriter(path, schema, **writer_opts)
+            else:
+                table = to_arrow(df, schema)
+            writer.write_table(table, row_group_size=row_group_size)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def append_parquet(
+    df: pd.DataFrame, path: Path, options: Optional[Dict[str, Any]] = None
+) -> None:
+    """Append df to an existing parquet file (or create it).
+
+    Parquet files cannot be extended in place, so the existing row groups are
+    streamed into a new file followed by df, which then replaces the old one.
+    No stage work is redone for the existing rows.
+    """
+    options = parquet_options() if options is None else options
+    if not path.exists() or pq.ParquetFile(path).metadata.num_rows == 0:
+        # an empty placeholder carries no useful schema; just replace it
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(to_arrow(df), path, **options)
+        return
+    pf = pq.ParquetFile(path)
+    schema = pf.schema_arrow
+    writer_opts, row_group_size = _writer_options(options)
+    tmp = path.with_name(path.name + ".tmp")
+    with pq.ParquetWriter(tmp, schema, **writer_opts) as writer:
+        for i in range(pf.num_row_groups):
+            writer.write_table(pf.read_row_group(i))
+        writer.write_table(to_arrow(df, schema), row_group_size=row_group_size)
+    os.replace(tmp, path)
+
+
+def patient_bucket(ids: Any, buckets: int = PATIENT_BUCKETS) -> np.ndarray:
+    """Stable hash bucket (crc32 % buckets) of each patient id; -1 for nulls.
+
+    Each distinct id is hashed once, so this is cheap on long columns.
+    """
+    codes, uniques = pd.factorize(pd.Series(ids), use_na_sentinel=True)
+    table = [zlib.crc32(str(u).encode("utf-8")) % buckets for u in uniques]
+    # code -1 (null) picks the trailing -1
+    return np.array(table + [-1], dtype="int32")[codes]
+
+
+def _partition_columns(partition_by: Sequence[str]) -> List[str]:
+    """Source columns of the partition keys; fails on unknown keys."""
+    unknown = [k for k in partition_by if k not in PARTITION_KEYS]
+    if unknown or not partition_by:
+        raise ValueError(
+            f"partition_by must use {sorted(PARTITION_KEYS)}, got {list(partition_by)}"
+        )
+    return [PARTITION_KEYS[k][0] for k in partition_by]
+
+
+def _partition_table(
+    df: pd.DataFrame, partition_by: Sequence[str], buckets: int
+) -> pa.Table:
+    sort_keys = [c for c in SORT_KEYS if c in df.columns]
+    if sort_keys:
+        df = df.sort_values(sort_keys, kind="stable")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        # a partition file holds a small slice of the table: carrying the whole
+        # categorical dictionary into every file makes writes and reads many
+        # times slower, and parquet dictionary-encodes each file's values anyway
+        if pa.types.is_dictionary(field.type):
+            column = table.column(i).cast(field.type.value_type)
+            table = table.set_column(i, field.name, column)
+    for key in partition_by:
+        column, _ = PARTITION_KEYS[key]
+        if key == "date":
+            ts = pd.to_datetime(df[column], utc=True).dt.tz_localize(None)
+            values = pa.array(ts.to_numpy().astype("datetime64[D]"), from_pandas=True)
+        else:
+            values = pa.array(patient_bucket(df[column], buckets))
+        table = table.append_column(key, values)
+    return table
+
+
+def write_dataset(
+    df: pd.DataFrame,
+    root: Path,
+    partition_by: Sequence[str] = ("date",),
+    buckets: int = PATIENT_BUCKETS,
+    options: Optional[Dict[str, Any]] = None,
+    append: bool = False,
+    part: Optional[str] = None,
+) -> int:
+    """Write df as a Hive-partitioned parquet dataset under root.
+
+    partition_by holds keys of PARTITION_KEYS: "date" (UTC day of
+    `timestamp`) and/or "patient_bucket" (patient_bucket of
+    `patient_id`). Rows are sorted by patient_id and timestamp inside each
+    file, so row-group statistics narrow lookups further (see
+    pipeline.query). Without append the dataset is replaced; with append
+    new files are added next to the existing ones. part names this call's
+    files (default: "0", or a random token when appending). Returns the
+    number of rows written.
+    """
+    import pyarrow.dataset as ds
+
+    missing = [c for c in _partition_columns(partition_by) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Cannot partition without columns {missing}")
+
+    table = _partition_table(df, partition_by, buckets)
+    writer_opts, row_group_size = _writer_options(
+        parquet_options() if options is None else options
+    )
+    sorting = [
+        pq.SortingColumn(table.schema.get_field_index(c))
+        for c in SORT_KEYS
+        if c in df.columns
+    ]
+    partitions = table.group_by(list(partition_by)).aggregate([]).num_rows
+    if not append and root.exists():
+        shutil.rmtree(root)
+    if part is None:
+        part = uuid.uuid4().hex[:12] if append else "0"
+    partitioning = ds.partitioning(
+        pa.schema([(k, PARTITION_KEYS[k][1]) for k in partition_by]), flavor="hive"
+    )
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=partitioning,
+        basename_template=f"part-{part}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(
+            sorting_columns=sorting or None, **writer_opts
+        ),
+        max_rows_per_group=row_group_size or 1024 * 1024,
+        # one file per partition, written in one go
+        max_partitions=max(partitions, 1024),
+        max_open_files=max(partitions, 1024),
+    )
+    (root / DATASET_META).write_text(
+        json.dumps({"partition_by": list(partition_by), "buckets": buckets})
+    )
+    return table.num_rows
+
+
+def write_dataset_batches(
+    batches: Iterable[pd.DataFrame],
+    root: Path,
+    partition_by: Sequence[str] = ("date",),
+    buckets: int = PATIENT_BUCKETS,
+    options: Optional[Dict[str, Any]] = None,
+    append: bool = False,
+) -> int:
+    """Write DataFrame batches as one dataset at root (see write_dataset).
+
+    Each batch adds its own files, sorted within the batch. Without append
+    the existing dataset is replaced. Returns the number of rows written.
+    """
+    return sum(
+        write_dataset(
+            batch,
+            root,
+            partition_by,
+            buckets,
+            options,
+            append=append or i > 0,
+            part=None if append else str(i),
+        )
+        for i, batch in enumerate(batches)
+    )
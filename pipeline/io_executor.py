@@ -0,0 +1,92 @@
+"""Background I/O for a pipeline run.
+
+An I/O executor is a small thread pool for work that mostly waits on the
+disk or the network: writing parquet files and reports, hashing and storing
+artifact blobs, uploading to S3. It lets that work overlap with the next
+compute stage. submit() blocks while max_pending tasks are queued or
+running, so a producer that outruns the disk is held back instead of piling
+up frames in memory. barrier() waits for everything submitted so far and
+re-raises the first failure:
+
+    with running() as io:
+        submit(io, save_standardized, {"vitals": df}, out)
+        ...compute...
+        barrier(io)  # every file submitted above is written
+
+Tasks run concurrently, so two tasks must not write the same file, and a
+task must not submit to its own executor (it could wait for a slot that
+only it can free).
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+IO_WORKERS = 4
+# tasks queued or running before submit() blocks
+MAX_PENDING = 8
+
+
+def new_executor(
+    workers: int = IO_WORKERS, max_pending: int = MAX_PENDING
+) -> Dict[str, Any]:
+    return {
+        "pool": ThreadPoolExecutor(workers, thread_name_prefix="pipeline-io"),
+        "slots": threading.BoundedSemaphore(max(workers, max_pending)),
+        "futures": [],
+        "lock": threading.Lock(),
+    }
+
+
+def submit(io: Dict[str, Any], fn: Callable, *args: Any, **kwargs: Any) -> Future:
+    """Run fn(*args, **kwargs) on io, first waiting for a free slot."""
+    io["slots"].acquire()
+    try:
+        future = io["pool"].submit(fn, *args, **kwargs)
+    except BaseException:
+        io["slots"].release()
+        raise
+    future.add_done_callback(lambda f: io["slots"].release())
+    with io["lock"]:
+        io["futures"].append(future)
+    return future
+
+
+def submit_or_run(
+    io: Optional[Dict[str, Any]], fn: Callable, *args: Any, **kwargs: Any
+) -> None:
+    """submit fn to io, or call it right away when io is None."""
+    if io is None:
+        fn(*args, **kwargs)
+    else:
+        submit(io, fn, *args, **kwargs)
+
+
+def barrier(io: Dict[str, Any]) -> List[Any]:
+    """Wait for every task submitted so far.
+
+    Returns their results in submission order; raises the first failure
+    (after all of them have finished).
+    """
+    with io["lock"]:
+        futures, io["futures"] = io["futures"], []
+    wait(futures)
+    return [f.result() for f in futures]
+
+
+@contextmanager
+def running(
+    workers: int = IO_WORKERS, max_pending: int = MAX_PENDING
+) -> Iterator[Dict[str, Any]]:
+    """An executor that is drained (barrier) and shut down on exit.
+
+    If the block raises, pending tasks still finish but their failures are
+    not reported over the block's exception.
+    """
+    io = new_executor(workers, max_pending)
+    try:
+        yield io
+        barrier(io)
+    finally:
+        io["pool"].shutdown(wait=True)
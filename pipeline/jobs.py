@@ -0,0 +1,310 @@
+"""Queue of pipeline runs for the UI.
+
+submit_job() queues a run of `python -m pipeline.cli` (or, with warm=True, a
+job for the warm pipeline.worker) on a small thread pool, so several users
+or runs can be submitted at once while at most max_workers execute. A job is
+a dict holding its status (queued, running, done, failed, cancelled), its
+progress (stages finished and the last one, from the PIPELINE_PROGRESS
+lines), the last LOG_LINES output lines in a ring buffer and the path of the
+full log, which is written through a buffered file. cancel_job() stops a
+queued or running job. Jobs that may run at the same time need separate work
+directories (own_dir=True).
+
+Runner threads block on the process output and on its exit; nothing polls.
+Readers such as the UI take snapshots with job_status() and decide how often
+to redraw (see throttled):
+
+    queue = new_queue(max_workers=2)
+    job = submit_job(queue, "pipeline/mappings/example_source_a.yaml", "runs/a")
+    job["done"].wait()
+    job_status(job)["status"]
+"""
+
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from pipeline.metrics import PROGRESS_ENV, PROGRESS_PREFIX
+
+ROOT = Path(__file__).resolve().parent.parent
+MAX_WORKERS = 2
+# output lines kept in memory per job; the log file has all of them
+LOG_LINES = 500
+LOG_BUFFER_BYTES = 64 * 1024
+# finished jobs kept for display, oldest dropped first
+MAX_FINISHED = 50
+# seconds a cancelled process gets to exit before it is killed
+KILL_AFTER = 2.0
+FINAL_STATES = ("done", "failed", "cancelled")
+
+# the warm worker process, shared by warm jobs (which run one at a time)
+warm_worker: Dict[str, Any] = {"proc": None, "lock": threading.Lock()}
+_shared: Dict[str, Any] = {}
+_shared_lock = threading.Lock()
+
+
+def new_queue(max_workers: int = MAX_WORKERS) -> Dict[str, Any]:
+    return {
+        "pool": ThreadPoolExecutor(max_workers, thread_name_prefix="pipeline-job"),
+        "jobs": OrderedDict(),
+        "lock": threading.Lock(),
+        "ids": itertools.count(1),
+    }
+
+
+def shared_queue(max_workers: int = MAX_WORKERS) -> Dict[str, Any]:
+    """The process-wide queue, created on first use (max_workers is fixed then)."""
+    with _shared_lock:
+        if "queue" not in _shared:
+            _shared["queue"] = new_queue(max_workers)
+        return _shared["queue"]
+
+
+def new_job(
+    mapping: Optional[str],
+    work_dir: str,
+    s3_bucket: Optional[str] = None,
+    s3_prefix: str = "",
+    warm: bool = False,
+    job_id: int = 0,
+) -> Dict[str, Any]:
+    return {
+        "id": job_id,
+        "mapping": mapping,
+        "work_dir": str(work_dir),
+        "s3_bucket": s3_bucket,
+        "s3_prefix": s3_prefix,
+        "warm": warm,
+        "status": "queued",
+        "stages": 0,
+        "stage": None,
+        "lines": deque(maxlen=LOG_LINES),
+        "log_file": None,
+        "returncode": None,
+        "error": None,
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "proc": None,
+        "future": None,
+        "cancel": threading.Event(),
+        "done": threading.Event(),
+    }
+
+
+def cli_command(job: Dict[str, Any]) -> List[str]:
+    cmd = [sys.executable, "-u", "-m", "pipeline.cli"]
+    if job["mapping"]:
+        cmd.extend(["--mapping", str(job["mapping"])])
+    if job["work_dir"]:
+        cmd.extend(["--work-dir", job["work_dir"]])
+    if job["s3_bucket"]:
+        cmd.extend(["--s3-bucket", job["s3_bucket"]])
+    if job["s3_prefix"]:
+        cmd.extend(["--s3-prefix", job["s3_prefix"]])
+    return cmd
+
+
+def _record(job: Dict[str, Any], line: str) -> None:
+    line = line.rstrip("\n")
+    job["lines"].append(line)
+    if line.startswith(PROGRESS_PREFIX):
+        table, name = (line[len(PROGRESS_PREFIX) :].split() + ["", ""])[:2]
+        job["stages"] += 1
+        job["stage"] = name if table == "-" else f"{table}/{name}"
+
+
+def _log_path(job: Dict[str, Any]) -> Path:
+    logs_dir = Path(job["work_dir"]) / "logs"
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    return logs_dir / f"run_{int(time.time())}_{job['id']}.log"
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    """Terminate proc, and kill it if it is still running KILL_AFTER later."""
+    if proc.poll() is not None:
+        return
+    proc.terminate()
+
+    def kill():
+        if proc.poll() is None:
+            proc.kill()
+
+    timer = threading.Timer(KILL_AFTER, kill)
+    timer.daemon = True
+    timer.start()
+
+
+def _run_process(job: Dict[str, Any], on_update: Callable) -> int:
+    job["log_file"] = _log_path(job)
+    env = {**os.environ, PROGRESS_ENV: "1"}
+    with open(
+        job["log_file"], "w", encoding="utf-8", buffering=LOG_BUFFER_BYTES
+    ) as log:
+        proc = subprocess.Popen(
+            cli_command(job),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            cwd=ROOT,
+            env=env,
+        )
+        job["proc"] = proc
+        if job["cancel"].is_set():
+            _stop(proc)
+        for line in proc.stdout:
+            log.write(line)
+            _record(job, line)
+            on_update(job)
+        return proc.wait()
+
+
+def _run_warm(job: Dict[str, Any], on_update: Callable) -> int:
+    from pipeline.worker import start_worker, submit
+
+    with warm_worker["lock"]:
+        proc = warm_worker["proc"]
+        if proc is None or proc.poll() is not None:
+            env = {**os.environ, PROGRESS_ENV: "1"}
+            proc = warm_worker["proc"] = start_worker(env=env)
+        job["proc"] = proc
+        if job["cancel"].is_set():
+            _stop(proc)
+        try:
+            response = submit(
+                proc,
+                {
+                    "mapping": job["mapping"],
+                    "work_dir": job["work_dir"],
+                    "s3_bucket": job["s3_bucket"],
+                    "s3_prefix": job["s3_prefix"],
+                },
+            )
+        except Exception:
+            # e.g. the worker was cancelled; a new one is started next time
+            warm_worker["proc"] = None
+            raise
+    text = response.get("log", "")
+    if response["status"] == "ok":
+        text += f"\nPipeline finished in {response['seconds']:.2f}s (warm worker)."
+    else:
+        text += f"\nPipeline failed: {response['error']}"
+    job["log_file"] = _log_path(job)
+    job["log_file"].write_text(text, encoding="utf-8")
+    for line in text.splitlines():
+        _record(job, line)
+    on_update(job)
+    return 0 if response["status"] == "ok" else 1
+
+
+def run_job(job: Dict[str, Any], on_update: Optional[Callable] = None) -> None:
+    """Run job in the calling thread; on_update(job) follows every output line."""
+    on_update = on_update or (lambda job: None)
+    if job["cancel"].is_set():
+        _finish(job, "cancelled", on_update)
+        return
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    on_update(job)
+    try:
+        runner = _run_warm if job["warm"] else _run_process
+        job["returncode"] = runner(job, on_update)
+    except Exception as e:
+        job["error"] = f"{type(e).__name__}: {e}"
+    if job["cancel"].is_set():
+        status = "cancelled"
+    else:
+        status = "done" if job["returncode"] == 0 else "failed"
+    _finish(job, status, on_update)
+
+
+def _finish(job: Dict[str, Any], status: str, on_update: Callable) -> None:
+    job["status"] = status
+    job["finished_at"] = time.time()
+    job["proc"] = None
+    job["done"].set()
+    on_update(job)
+
+
+def submit_job(
+    queue: Dict[str, Any],
+    mapping: Optional[str],
+    work_dir: str,
+    s3_bucket: Optional[str] = None,
+    s3_prefix: str = "",
+    warm: bool = False,
+    own_dir: bool = False,
+) -> Dict[str, Any]:
+    """Queue a pipeline run; it starts when a pool worker is free.
+
+    With own_dir, the run gets a new directory under work_dir (run_<ts>_<id>),
+    so jobs submitted with the same work_dir can run at once without
+    overwriting each other's outputs, index and checkpoints.
+    """
+    with queue["lock"]:
+        job_id = next(queue["ids"])
+        if own_dir:
+            work_dir = str(Path(work_dir) / f"run_{int(time.time())}_{job_id}")
+        job = new_job(mapping, work_dir, s3_bucket, s3_prefix, warm, job_id)
+        queue["jobs"][job["id"]] = job
+        finished = [j for j in queue["jobs"].values() if j["done"].is_set()]
+        for old in finished[: max(0, len(finished) - MAX_FINISHED)]:
+            del queue["jobs"][old["id"]]
+    job["future"] = queue["pool"].submit(run_job, job)
+    return job
+
+
+def cancel_job(job: Dict[str, Any]) -> None:
+    """Cancel a queued job, or stop a running one (terminate, then kill)."""
+    job["cancel"].set()
+    future = job["future"]
+    if future is not None and future.cancel():
+        _finish(job, "cancelled", lambda job: None)
+        return
+    proc = job["proc"]
+    if proc is not None:
+        _stop(proc)
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """A snapshot of job for display (no live objects)."""
+    end = job["finished_at"] or time.time()
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "mapping": job["mapping"],
+        "work_dir": job["work_dir"],
+        "stages": job["stages"],
+        "stage": job["stage"],
+        "seconds": round(end - job["started_at"], 1) if job["started_at"] else None,
+        "returncode": job["returncode"],
+        "error": job["error"],
+        "log_file": str(job["log_file"]) if job["log_file"] else None,
+        "log": "\n".join(list(job["lines"])),
+    }
+
+
+def list_jobs(queue: Dict[str, Any]) -> List[Dict[str, Any]]:
+    with queue["lock"]:
+        return list(queue["jobs"].values())
+
+
+def throttled(fn: Callable, seconds: float) -> Callable:
+    """fn limited to one call per `seconds`; a finished job always gets through."""
+    last = [0.0]
+
+    def call(job: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        if now - last[0] >= seconds or job["done"].is_set():
+            last[0] = now
+            fn(job)
+
+    return call
@@ -0,0 +1,223 @@
+"""Per-stage run metrics.
+
+Pipeline stages run inside `stage(events, name, ...)` blocks, which append
+one event per stage with wall and CPU time, rows in/out, bytes read/written
+and the peak resident memory while the stage ran. run_pipeline gathers the
+events of every table (including those recorded in worker processes), writes
+them to run_metrics_<checksum>.json and passes each event to the registered
+hooks, e.g. to forward them to an external metrics system:
+
+    from pipeline.metrics import register_hook
+    register_hook(lambda event: statsd.timing(event["stage"], event["wall_s"]))
+
+Hooks can also be named as "module:function" in the PIPELINE_METRICS_HOOK
+environment variable (comma separated). A failing hook never fails a run.
+
+peak_rss_mb is the process's peak RSS so far when the stage ends. With
+PIPELINE_STAGE_PEAK_RSS set (pipeline.cli --stage-peak-rss) it is the peak
+while the stage ran instead; on Linux that resets the process's high-water
+mark (VmHWM) at every stage, which other code in the process that reads it
+would see, so it is off by default.
+
+With PIPELINE_PROGRESS set, every finished stage also prints one
+"[stage] <table> <stage> <status> <seconds>s" line to stdout as it
+happens, which pipeline.jobs reads as the progress of a run.
+"""
+
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+METRICS_HOOK_ENV = "PIPELINE_METRICS_HOOK"
+PROGRESS_ENV = "PIPELINE_PROGRESS"
+PEAK_RSS_ENV = "PIPELINE_STAGE_PEAK_RSS"
+PROGRESS_PREFIX = "[stage] "
+MB = 1024 * 1024
+
+Hook = Callable[[Dict[str, Any]], None]
+_hooks: List[Hook] = []
+# peak RSS of each open stage up to the last reset of the process's mark
+_open_peaks: Dict[int, int] = {}
+_peak_lock = threading.Lock()
+
+
+def register_hook(hook: Hook) -> Hook:
+    """Call hook(event) for every stage event of later runs; returns hook."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+    return hook
+
+
+def unregister_hook(hook: Hook) -> None:
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def _env_hooks() -> List[Hook]:
+    hooks = []
+    for spec in filter(None, os.environ.get(METRICS_HOOK_ENV, "").split(",")):
+        module, _, name = spec.strip().partition(":")
+        try:
+            hooks.append(getattr(importlib.import_module(module), name))
+        except (ImportError, AttributeError) as e:
+            print(f"Ignoring metrics hook {spec!r}: {e}", file=sys.stderr)
+    return hooks
+
+
+def emit(events: List[Dict[str, Any]]) -> None:
+    """Pass each event to the registered and environment hooks."""
+    hooks = _hooks + _env_hooks()
+    for event in events:
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"Metrics hook {hook!r} failed: {e}", file=sys.stderr)
+
+
+def _reset_peak_rss() -> None:
+    # Linux lets a process reset its own high-water mark (VmHWM)
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss() -> Optional[int]:
+    """Peak resident set size in bytes (since the last reset on Linux)."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _start_peak(key: int) -> None:
+    """Start a stage's peak RSS from the current RSS (with PEAK_RSS_ENV set).
+
+    The process has one high-water mark, so before resetting it for the new
+    stage the mark so far is folded into every stage still open (enclosing
+    or concurrent ones); each stage's peak thus covers exactly its own run.
+    """
+    if not os.environ.get(PEAK_RSS_ENV):
+        return
+    with _peak_lock:
+        peak = _peak_rss() or 0
+        for k, seen in _open_peaks.items():
+            _open_peaks[k] = max(seen, peak)
+        _open_peaks[key] = 0
+        _reset_peak_rss()
+
+
+def _end_peak(key: int) -> Optional[int]:
+    with _peak_lock:
+        peak = _peak_rss()
+        seen = _open_peaks.pop(key, 0)
+    return None if peak is None else max(peak, seen)
+
+
+def file_bytes(*paths: Path) -> int:
+    """Total size of the given files that exist."""
+    return sum(p.stat().st_size for p in map(Path, paths) if p.is_file())
+
+
+@contextmanager
+def stage(
+    events: List[Dict[str, Any]],
+    name: str,
+    table: Optional[str] = None,
+    **info: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Time the enclosed block and append its event to events.
+
+    Yields the event dict so the block can fill in rows_in, rows_out,
+    bytes_read and bytes_written once they are known. Stages run in a
+    background thread (e.g. the in-memory runner's file writes) are marked
+    "background"; their cpu_s is the thread's own CPU time. See the module
+    docstring for peak_rss_mb.
+    """
+    event: Dict[str, Any] = {
+        "stage": name,
+        "table": table,
+        "rows_in": None,
+        "rows_out": None,
+        "bytes_read": None,
+        "bytes_written": None,
+        **info,
+    }
+    background = threading.current_thread() is not threading.main_thread()
+    clock = time.thread_time if background else time.process_time
+    if background:
+        event["background"] = True
+    _start_peak(id(event))
+    wall, cpu = time.perf_counter(), clock()
+    event["started_at"] = datetime.now(timezone.utc).isoformat()
+    event["status"] = "error"
+    try:
+        yield event
+        event["status"] = "ok"
+    finally:
+        event["wall_s"] = round(time.perf_counter() - wall, 6)
+        event["cpu_s"] = round(clock() - cpu, 6)
+        peak = _end_peak(id(event))
+        event["peak_rss_mb"] = None if peak is None else round(peak / MB, 1)
+        event["pid"] = os.getpid()
+        events.append(event)
+        if os.environ.get(PROGRESS_ENV):
+            print(
+                f"{PROGRESS_PREFIX}{table or '-'} {name} {event['status']}"
+                f" {event['wall_s']:.3f}s",
+                flush=True,
+            )
+
+
+def metrics_name(checksum: str) -> str:
+    return f"run_metrics_{checksum}.json"
+
+
+def write_run_metrics(
+    out_dir: Path,
+    checksum: str,
+    events: List[Dict[str, Any]],
+    started_at: str,
+    wall_s: float,
+) -> Path:
+    """Write run_metrics_<checksum>.json with every event and per-stage totals."""
+    totals: Dict[str, Dict[str, float]] = {}
+    for e in events:
+        t = totals.setdefault(e["stage"], {"wall_s": 0.0, "cpu_s": 0.0})
+        t["wall_s"] = round(t["wall_s"] + e["wall_s"], 6)
+        t["cpu_s"] = round(t["cpu_s"] + e["cpu_s"], 6)
+    path = out_dir / metrics_name(checksum)
+    path.write_text(
+        json.dumps(
+            {
+                "mapping_checksum": checksum,
+                "started_at": started_at,
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "wall_s": round(wall_s, 6),
+                "stages": events,
+                "totals": totals,
+            },
+            indent=2,
+            default=str,
+        )
+    )
+    return path
@@ -31,3 +31,11 @@ class LabRecord(BaseModel):
     value: Optional[float]
     unit: Optional[str]
     reference_range: Optional[str]
+
+
+# canonical table name -> row model, matching the canonical_schema.yaml sections
+TABLE_MODELS = {
+    "demographics": Demographics,
+    "vitals": Vitals,
+    "labs": LabRecord,
+}
@@ -1,13 +1,64 @@
+import hashlib
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
-import joblib
 import numpy as np
 import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from pipeline.ingest import load_schema, sparse_frame
+
+if TYPE_CHECKING:
+    # sklearn and joblib are imported where transformers are fitted or loaded,
+    # so conversion, typing and validation do not pay their import time
+    from sklearn.compose import ColumnTransformer
+
+# (from_unit, to_unit) -> (scale, offset) so that to = from * scale + offset.
+# Keys are lower-cased; lookups normalize the declared units the same way.
+UNIT_CONVERSIONS: Dict[Tuple[str, str], Tuple[float, float]] = {
+    # temperature
+    ("f", "c"): (5.0 / 9.0, -32.0 * 5.0 / 9.0),
+    ("c", "f"): (9.0 / 5.0, 32.0),
+    ("k", "c"): (1.0, -273.15),
+    # mass
+    ("lb", "kg"): (0.45359237, 0.0),
+    ("oz", "kg"): (0.028349523125, 0.0),
+    ("g", "kg"): (0.001, 0.0),
+    ("kg", "g"): (1000.0, 0.0),
+    ("mg", "g"): (0.001, 0.0),
+    # length
+    ("in", "cm"): (2.54, 0.0),
+    ("ft", "cm"): (30.48, 0.0),
+    ("m", "cm"): (100.0, 0.0),
+    ("mm", "cm"): (0.1, 0.0),
+    # volume
+    ("ml", "l"): (0.001, 0.0),
+    ("dl", "l"): (0.1, 0.0),
+    ("l", "ml"): (1000.0, 0.0),
+    ("fl oz", "ml"): (29.5735295625, 0.0),
+    # pressure
+    ("kpa", "mmhg"): (7.50061683, 0.0),
+}
+
+# (test_name, from_unit) -> (canonical_unit, scale) for analyte-specific lab
+# conversions that depend on molar mass. Keys are lower-cased.
+LAB_CONVERSIONS: Dict[Tuple[str, str], Tuple[str, float]] = {
+    ("glucose", "mg/dl"): ("mmol/L", 1.0 / 18.016),
+    ("cholesterol", "mg/dl"): ("mmol/L", 1.0 / 38.67),
+    ("ldl", "mg/dl"): ("mmol/L", 1.0 / 38.67),
+    ("hdl", "mg/dl"): ("mmol/L", 1.0 / 38.67),
+    ("triglycerides", "mg/dl"): ("mmol/L", 1.0 / 88.57),
+    ("creatinine", "mg/dl"): ("umol/L", 88.42),
+    ("urea", "mg/dl"): ("mmol/L", 1.0 / 6.006),
+    ("bun", "mg/dl"): ("mmol/L", 1.0 / 2.801),
+    ("calcium", "mg/dl"): ("mmol/L", 1.0 / 4.008),
+    ("hemoglobin", "g/dl"): ("g/L", 10.0),
+    ("albumin", "g/dl"): ("g/L", 10.0),
+    ("wbc", "10^3/ul"): ("10^9/L", 1.0),
+}
 
 
 def f_to_c(f):
@@ -17,47 +68,679 @@ def f_to_c(f):
         return np.nan
 
 
-def apply_unit_conversions(df: pd.DataFrame, mapping: Dict[str, Any]) -> pd.DataFrame:
-    # example: mapping may include unit info for fields
-    for canon, src in mapping.get("mappings", {}).get("vitals", {}).items():
-        if isinstance(src, dict) and src.get("unit") == "F":
-            col = src.get("column")
-            if col in df.columns:
-                df[canon] = df[col].apply(f_to_c)
+def _norm(value: Any) -> Optional[str]:
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+def conversion_registry(
+    mapping: Dict[str, Any],
+) -> Tuple[Dict[Tuple[str, str], Tuple[float, float]], Dict[Tuple[str, str], Any]]:
+    """Built-in registries extended with the mapping's `unit_conversions` list.
+
+    Entries look like {from: mg/dL, to: mmol/L, factor: 0.0555} with optional
+    `offset`, and an optional `test` to make the entry analyte-specific.
+    """
+    generic = dict(UNIT_CONVERSIONS)
+    lab = dict(LAB_CONVERSIONS)
+    for entry in mapping.get("unit_conversions", []) or []:
+        src, dst = _norm(entry["from"]), entry["to"]
+        if entry.get("test"):
+            lab[(_norm(entry["test"]), src)] = (dst, float(entry["factor"]))
+        else:
+            generic[(src, _norm(dst))] = (
+                float(entry["factor"]),
+                float(entry.get("offset", 0.0)),
+            )
+    return generic, lab
+
+
+def convert_units(
+    values: pd.Series,
+    from_units: Any,
+    to_unit: Optional[str] = None,
+    tests: Optional[pd.Series] = None,
+    mapping: Optional[Dict[str, Any]] = None,
+    registry: Optional[Tuple[Dict, Dict]] = None,
+) -> Tuple[pd.Series, pd.Series]:
+    """Convert a numeric column with whole-column arithmetic.
+
+    from_units is a single unit string or a per-row Series of units. Rows are
+    converted to to_unit through the generic registry, or, when tests is given,
+    to the analyte's canonical unit through the lab registry first. Only the
+    distinct (test, unit) pairs are looked up; rows with unknown units are left
+    unconverted. registry is a precomputed conversion_registry(mapping).
+    Returns (converted values, resulting units).
+    """
+    generic, lab = registry or conversion_registry(mapping or {})
+    if isinstance(from_units, pd.Series):
+        u_codes, u_uniques = pd.factorize(from_units, use_na_sentinel=True)
+    else:
+        u_codes, u_uniques = np.zeros(len(values), dtype=np.intp), [from_units]
+    if tests is not None:
+        t_codes, t_uniques = pd.factorize(tests, use_na_sentinel=True)
+    else:
+        t_codes, t_uniques = np.full(len(values), -1, dtype=np.intp), []
+    # one code per distinct (test, unit) pair; -1 (missing) shifts to 0
+    width = len(u_uniques) + 1
+    codes, pairs = pd.factorize((t_codes + 1) * width + (u_codes + 1))
+
+    scale = np.ones(len(pairs))
+    offset = np.zeros(len(pairs))
+    target = np.empty(len(pairs), dtype=object)
+    for i, pair in enumerate(pairs):
+        t, u = divmod(int(pair), width)
+        test = t_uniques[t - 1] if t else None
+        unit = u_uniques[u - 1] if u else None
+        target[i] = unit
+        src = _norm(unit)
+        if src is None:
+            continue
+        hit = lab.get((_norm(test), src)) if test is not None else None
+        if hit is not None:
+            target[i], scale[i] = hit
+        elif to_unit is not None and src != _norm(to_unit):
+            conv = generic.get((src, _norm(to_unit)))
+            if conv is not None:
+                scale[i], offset[i] = conv
+                target[i] = to_unit
+
+    numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+    converted = numeric * scale[codes] + offset[codes]
+    out_units = target[codes]
+    return (
+        pd.Series(converted, index=values.index, name=values.name),
+        pd.Series(out_units, index=values.index),
+    )
+
+
+def unit_conversion_specs(
+    fields: Dict[str, Any], schema_section: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """The unit conversions declared by one table's mapping fields.
+
+    Each spec has the canonical `field`, its source `column`, the constant
+    `unit` or per-row `unit_column` (plus optional `test_column`) and the
+    target `to_unit` (the field's own or the schema `unit`).
+    """
+    specs = []
+    for canon, src in fields.items():
+        if not isinstance(src, dict):
+            continue
+        if "unit" not in src and "unit_column" not in src:
+            continue
+        specs.append(
+            {
+                "field": canon,
+                "column": src.get("column"),
+                "unit": src.get("unit"),
+                "unit_column": src.get("unit_column"),
+                "test_column": src.get("test_column"),
+                "to_unit": src.get("to_unit")
+                or schema_section.get(canon, {}).get("unit"),
+            }
+        )
+    return specs
+
+
+def apply_unit_conversions(
+    df: pd.DataFrame,
+    mapping: Dict[str, Any],
+    table: str = "vitals",
+    schema_section: Optional[Dict[str, Any]] = None,
+    plan: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """Convert mapped columns of one table to canonical units.
+
+    A mapping field declares its source unit either as a constant
+    (`unit: F`) or per row through `unit_column` (a canonical column of the
+    same table), optionally with `test_column` for analyte-specific lab
+    conversions. The target unit is `to_unit` on the field or the schema
+    `unit`. With a `unit_column` the column is rewritten to the new units.
+    A compiled mapping plan (pipeline.plan) supplies the specs and registry
+    instead of re-walking the mapping.
+    """
+    if plan is not None:
+        specs = plan["tables"][table]["conversions"]
+        registry = plan["registry"]
+    else:
+        if schema_section is None:
+            schema_section = load_schema().get(table, {})
+        fields = mapping.get("mappings", {}).get(table, {})
+        specs = unit_conversion_specs(fields, schema_section)
+        registry = conversion_registry(mapping) if specs else None
+    for spec in specs:
+        canon, unit_col = spec["field"], spec["unit_column"]
+        col = canon if canon in df.columns else spec["column"]
+        if col not in df.columns:
+            continue
+        if unit_col is not None and unit_col not in df.columns:
+            continue
+        from_units = df[unit_col] if unit_col else spec["unit"]
+        test_col = spec["test_column"]
+        tests = df[test_col] if test_col in df.columns else None
+        values, units = convert_units(
+            df[col], from_units, spec["to_unit"], tests, registry=registry
+        )
+        df[canon] = values
+        if unit_col:
+            df[unit_col] = units
     return df
 
 
-def standardize_types(df: pd.DataFrame, schema_section: Dict[str, Any]) -> pd.DataFrame:
-    # basic typing: convert datetimes and numerics
+def type_casts(schema_section: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Schema columns by the cast standardize_types applies to them."""
+    casts: Dict[str, List[str]] = {"datetime": [], "numeric": [], "string": []}
     for col, meta in schema_section.items():
-        t = meta.get("type")
-        if t in ("datetime", "date") and col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-        if t == "numeric" and col in df.columns:
+        t = (meta or {}).get("type")
+        if t in ("datetime", "date"):
+            casts["datetime"].append(col)
+        elif t == "numeric":
+            casts["numeric"].append(col)
+        elif t in ("string", "categorical"):
+            casts["string"].append(col)
+    return casts
+
+
+# unique values looked at when guessing a column's datetime format
+DATETIME_SAMPLE = 100
+
+
+def datetime_specs(fields: Dict[str, Any]) -> Dict[str, Dict[str, Optional[str]]]:
+    """The `format` and `timezone` declared by one table's mapping fields.
+
+    e.g. `timestamp: {column: MeasuredAt, format: "%m/%d/%Y %H:%M",
+    timezone: America/New_York}`; format is a strftime pattern (or "ISO8601"
+    / "mixed") and timezone applies to values without an offset.
+    """
+    return {
+        canon: {"format": src.get("format"), "timezone": src.get("timezone")}
+        for canon, src in fields.items()
+        if isinstance(src, dict) and ("format" in src or "timezone" in src)
+    }
+
+
+def detect_datetime_format(
+    values: pd.Index, sample: int = DATETIME_SAMPLE
+) -> Optional[str]:
+    """A format that parses every string in a sample of values, or None."""
+    from pandas.tseries.api import guess_datetime_format
+
+    step = max(1, len(values) // sample)
+    strings = [v for v in values[::step][:sample] if isinstance(v, str) and v.strip()]
+    if not strings:
+        return None
+    fmt = guess_datetime_format(strings[0])
+    if fmt is None:
+        return None
+    parsed = pd.to_datetime(pd.Index(strings), format=fmt, errors="coerce", utc=True)
+    return None if parsed.isna().any() else fmt
+
+
+def _to_utc(parsed: pd.DatetimeIndex, tz: Optional[str]) -> pd.DatetimeIndex:
+    if parsed.tz is None:
+        parsed = parsed.tz_localize(tz or "UTC", ambiguous="NaT", nonexistent="NaT")
+    return parsed.tz_convert("UTC").as_unit("ns")
+
+
+def _parse_unique(uniques: pd.Index, fmt: Optional[str]) -> pd.DatetimeIndex:
+    if not (
+        pd.api.types.is_object_dtype(uniques) or pd.api.types.is_string_dtype(uniques)
+    ):
+        return pd.DatetimeIndex(pd.to_datetime(uniques, errors="coerce"))
+    if fmt is None and len(uniques):
+        text = pd.Series(uniques)
+        if text.str.endswith("Z").fillna(False).astype(bool).all():
+            # ISO times with a "Z" suffix parse several times faster as naive
+            # times that are then localized to UTC
+            naive = pd.Index(text.str[:-1])
+            fmt = detect_datetime_format(naive) or "mixed"
+            parsed = pd.to_datetime(naive, format=fmt, errors="coerce", utc=True)
+            return pd.DatetimeIndex(parsed)
+    fmt = fmt or detect_datetime_format(uniques) or "mixed"
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(uniques, format=fmt, errors="coerce"))
+    except ValueError:
+        # values with different UTC offsets only parse as UTC
+        return pd.DatetimeIndex(
+            pd.to_datetime(uniques, format=fmt, errors="coerce", utc=True)
+        )
+
+
+def parse_datetimes(
+    values: pd.Series, fmt: Optional[str] = None, tz: Optional[str] = None
+) -> pd.Series:
+    """Parse values to datetime64[ns, UTC]; unparseable values become NaT.
+
+    Each distinct value is parsed once and the result broadcast back through
+    the factorized codes (timestamps repeat heavily). Without fmt the format
+    is detected on a sample of the distinct values, falling back to
+    per-value inference. Values without an offset are taken to be in tz
+    (default UTC).
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = _to_utc(pd.DatetimeIndex(values), tz)
+        return pd.Series(parsed, index=values.index, name=values.name)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    parsed = _to_utc(_parse_unique(pd.Index(uniques), fmt), tz)
+    parsed = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(parsed, index=values.index, name=values.name)
+
+
+def standardize_types(
+    df: pd.DataFrame,
+    schema_section: Dict[str, Any],
+    casts: Optional[Dict[str, List[str]]] = None,
+    formats: Optional[Dict[str, Dict[str, Optional[str]]]] = None,
+) -> pd.DataFrame:
+    """Cast datetime, numeric and string columns; casts is type_casts(section).
+
+    Datetimes become datetime64[ns, UTC] (see parse_datetimes); formats is
+    datetime_specs(fields) of the table's mapping.
+    """
+    casts = type_casts(schema_section) if casts is None else casts
+    formats = formats or {}
+    for col in casts["datetime"]:
+        if col in df.columns:
+            spec = formats.get(col, {})
+            df[col] = parse_datetimes(df[col], spec.get("format"), spec.get("timezone"))
+    for col in casts["numeric"]:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
             df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in casts["string"]:
+        if col in df.columns and not pd.api.types.is_string_dtype(df[col]):
+            # e.g. zip codes parsed as integers; keep missing values missing
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+# missing_policy strategies; "impute" is the historical name of "mean"
+IMPUTE_STRATEGIES = ("flag", "required", "drop", "mean", "median", "constant", "ffill")
+IMPUTER_VERSION = 1
+
+
+def _strategy(spec: Any) -> Dict[str, Any]:
+    if isinstance(spec, dict):
+        if set(spec) != {"constant"}:
+            raise ValueError(f"Unknown missing policy: {spec!r}")
+        return {"strategy": "constant", "value": spec["constant"]}
+    name = "mean" if spec == "impute" else spec
+    if name not in IMPUTE_STRATEGIES or name == "constant":
+        raise ValueError(f"Unknown missing policy: {spec!r}")
+    return {"strategy": name}
+
+
+def imputation_strategies(
+    policy: Dict[str, Any], columns: Iterable[str], numeric_cols: Iterable[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Resolve a mapping's missing_policy for one table's columns.
+
+    Per-column keys win; `default` applies to the numeric columns without
+    one. A strategy is flag (leave missing for validation), required (the
+    same, and never imputed), drop (remove the row), mean, median,
+    `{constant: value}` or ffill (per-patient forward fill in time order).
+    Columns left to flag are omitted.
+    """
+    columns = list(columns)
+    resolved = {c: _strategy(policy[c]) for c in columns if c in policy}
+    default = _strategy(policy.get("default", "flag"))
+    for col in numeric_cols:
+        if col in columns and col not in resolved:
+            resolved[col] = default
+    return {c: r for c, r in resolved.items() if r["strategy"] != "flag"}
+
+
+def _median_from_counts(counts: pd.Series) -> float:
+    # exact median from value -> count, like Series.median on the values
+    counts = counts[counts > 0].sort_index()
+    n = int(counts.sum())
+    if not n:
+        return float("nan")
+    cum = counts.to_numpy().cumsum()
+    values = counts.index.to_numpy(dtype="float64")
+    lo = values[np.searchsorted(cum, (n - 1) // 2, side="right")]
+    hi = values[np.searchsorted(cum, n // 2, side="right")]
+    return float((lo + hi) / 2)
+
+
+def fit_imputer(
+    frames: Iterable[pd.DataFrame], strategies: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Fit the imputation statistics over frames (one frame, or batches).
+
+    Means come from running sums and counts and medians from value counts,
+    so a chunked fit gives the same statistics as fitting the whole table.
+    """
+    sums: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    values: Dict[str, pd.Series] = {}
+    rows = 0
+    for df in frames:
+        rows += len(df)
+        for col, spec in strategies.items():
+            if col not in df.columns:
+                continue
+            if spec["strategy"] == "mean":
+                sums[col] = sums.get(col, 0.0) + float(df[col].sum())
+                counts[col] = counts.get(col, 0) + int(df[col].count())
+            elif spec["strategy"] == "median":
+                vc = df[col].value_counts(sort=False)
+                values[col] = vc.add(values[col], fill_value=0) if col in values else vc
+    statistics: Dict[str, Any] = {
+        c: (sums[c] / counts[c] if counts[c] else float("nan")) for c in sums
+    }
+    statistics.update({c: _median_from_counts(v) for c, v in values.items()})
+    # columns with no values to fit from get null (they stay missing)
+    statistics = {c: None if pd.isna(v) else v for c, v in statistics.items()}
+    statistics.update(
+        {c: s["value"] for c, s in strategies.items() if s["strategy"] == "constant"}
+    )
+    return {
+        "version": IMPUTER_VERSION,
+        "strategies": strategies,
+        "statistics": statistics,
+        "rows": rows,
+    }
+
+
+def save_imputer(imputer: Dict[str, Any], path: Path) -> Dict[str, Any]:
+    """Write a fitted imputer as a JSON artifact; returns what was written."""
+    fitted = {**imputer, "fitted_at": datetime.now(timezone.utc).isoformat()}
+    path.write_text(json.dumps(fitted, indent=2))
+    return fitted
+
+
+def load_imputer(
+    path: Path, strategies: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Optional[Dict[str, Any]]:
+    """A saved imputer, or None if it is missing, unreadable or was fitted
+    for other strategies."""
+    if not path.exists():
+        return None
+    try:
+        imputer = json.loads(path.read_text())
+    except ValueError:
+        return None
+    if imputer.get("version") != IMPUTER_VERSION:
+        return None
+    if strategies is not None and imputer.get("strategies") != strategies:
+        return None
+    return imputer
+
+
+def _ffill_by_patient(
+    df: pd.DataFrame, cols: List[str], state: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """Forward-fill cols within each patient in timestamp order.
+
+    Rows are stably sorted by timestamp and filled with one groupby ffill.
+    With state (chunked runs) each patient's last filled values are carried
+    into the next batch, which assumes batches arrive in time order (see
+    check_time_order).
+    """
+    keys = [k for k in ("patient_id", "timestamp") if k in df.columns]
+    part = df[keys + cols]
+    if "timestamp" in keys:
+        part = part.sort_values("timestamp", kind="stable")
+    carry = None if state is None else state.get("carry")
+    if carry is not None:
+        # carried rows are indexed -n..-1, so they never align with df's rows
+        part = pd.concat([carry, part])
+    if "patient_id" in keys:
+        by_patient = part.groupby("patient_id", sort=False, observed=True)
+        filled = by_patient[cols].ffill()
+    else:
+        filled = part[cols].ffill()
+    if state is not None:
+        last = part[keys].join(filled)
+        if "patient_id" in keys:
+            last = last[last["patient_id"].notna()]
+            last = last.groupby("patient_id", sort=False, observed=True).tail(1)
+        else:
+            last = last.tail(1)
+        state["carry"] = last.set_axis(pd.RangeIndex(-len(last), 0))
+    for col in cols:
+        df[col] = df[col].fillna(filled[col])
     return df
 
 
-def impute_missing(df: pd.DataFrame, policy: Dict[str, Any]) -> pd.DataFrame:
-    default = policy.get("default", "flag")
-    if default == "impute":
-        # simple numeric mean imputation
-        for col in df.select_dtypes(include=["number"]).columns:
-            df[col] = df[col].fillna(df[col].mean())
+def check_time_order(df: pd.DataFrame, state: Dict[str, Any]) -> None:
+    """Raise ValueError if a batch goes back in time from the batches before it.
+
+    A chunked forward fill only matches the in-memory one (a stable sort of
+    all rows by timestamp, missing timestamps last) when no patient's rows in
+    a batch sort before that patient's rows in an earlier batch. Call it on
+    every batch in order with the same state, before filling any of them.
+    """
+    if "timestamp" not in df.columns:
+        return
+    ts = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+    pos = pd.Series(
+        np.where(np.isnat(ts), np.iinfo(np.int64).max, ts.view("i8")), index=df.index
+    )
+    if "patient_id" in df.columns:
+        patient = df["patient_id"]
+        pos, patient = pos[patient.notna()], patient[patient.notna()]
+    else:
+        patient = pd.Series(0, index=df.index)
+    by_patient = pos.groupby(patient, observed=True)
+    first, last = by_patient.min(), by_patient.max()
+    prev = state.get("last")
+    if prev is not None:
+        seen = first.index.intersection(prev.index)
+        if (first[seen] < prev[seen]).any():
+            raise ValueError(
+                "Forward fill over chunks needs the source in timestamp order per"
+                " patient; sort the source or run without chunk_rows"
+            )
+        last = pd.concat([prev, last]).groupby(level=0).max()
+    state["last"] = last
+
+
+def drop_rows(df: pd.DataFrame, strategies: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """df without the rows missing a column whose strategy is drop."""
+    drop = [
+        c for c, s in strategies.items() if s["strategy"] == "drop" and c in df.columns
+    ]
+    return df[df[drop].notna().all(axis=1)] if drop else df
+
+
+def apply_imputer(
+    df: pd.DataFrame, imputer: Dict[str, Any], state: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """Apply a fitted imputer: drop rows, forward-fill, then fill statistics.
+
+    state carries forward-fill values between the batches of a chunked run.
+    """
+    strategies = {c: s for c, s in imputer["strategies"].items() if c in df.columns}
+    df = drop_rows(df, strategies)
+    ffill = [c for c, s in strategies.items() if s["strategy"] == "ffill"]
+    if ffill:
+        df = _ffill_by_patient(df, ffill, state)
+    for col, value in imputer["statistics"].items():
+        if col in strategies and not pd.isna(value):
+            df[col] = df[col].fillna(value)
     return df
 
 
+def impute_missing(
+    df: pd.DataFrame,
+    policy: Dict[str, Any],
+    means: Optional[Dict[str, float]] = None,
+) -> pd.DataFrame:
+    """Fit and apply the missing policy on df alone (see imputation_strategies).
+
+    `means` overrides the fitted column means. Pipeline runs fit the imputer
+    once (fit_imputer) and reuse it instead.
+    """
+    numeric_cols = df.select_dtypes(include=["number"]).columns
+    strategies = imputation_strategies(policy, df.columns, numeric_cols)
+    imputer = fit_imputer([df], strategies)
+    if means is not None:
+        imputer["statistics"].update(
+            {c: v for c, v in means.items() if c in imputer["statistics"]}
+        )
+    return apply_imputer(df, imputer)
+
+
+# mapping `transform` section: how categorical columns are encoded
+TRANSFORM_OUTPUTS = ("dense", "sparse", "codes")
+TRANSFORM_DEFAULTS: Dict[str, Any] = {
+    "output": "dense",
+    "max_categories": None,
+    "min_frequency": None,
+}
+
+
+def transform_options(section: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """TRANSFORM_DEFAULTS overridden by a mapping's `transform` section.
+
+    output is "dense" (one column per one-hot feature), "sparse" (CSR rows
+    with feature names, see ingest.sparse_to_arrow) or "codes" (one
+    categorical column of encoder codes per input column). max_categories
+    and min_frequency (a count, or a fraction of rows when a float below 1)
+    cap the levels each categorical column is encoded with.
+    """
+    section = section or {}
+    unknown = set(section) - set(TRANSFORM_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown transform options: {sorted(unknown)}")
+    options = {**TRANSFORM_DEFAULTS, **section}
+    if options["output"] not in TRANSFORM_OUTPUTS:
+        raise ValueError(
+            f"transform output must be one of {TRANSFORM_OUTPUTS},"
+            f" got {options['output']!r}"
+        )
+    return options
+
+
+def sorted_levels(values: Iterable[Any]) -> List[Any]:
+    """Order levels like OneHotEncoder(categories="auto"): sorted, missing last."""
+    values = set(values)
+    present = sorted(v for v in values if not pd.isna(v))
+    return present + ([np.nan] if len(present) < len(values) else [])
+
+
+def frequent_levels(
+    counts: pd.Series,
+    max_categories: Optional[int] = None,
+    min_frequency: Optional[float] = None,
+) -> List[Any]:
+    """Levels of a value -> count Series kept by the caps, in sorted_levels order.
+
+    Levels rarer than min_frequency are dropped, then only the
+    max_categories most frequent remain (ties broken by level). Dropped
+    levels encode as all zeros (or a missing code), like unknown ones.
+    """
+    counts = counts[counts > 0]
+    if min_frequency is not None:
+        threshold = min_frequency
+        if isinstance(min_frequency, float) and min_frequency < 1:
+            threshold = min_frequency * counts.sum()
+        counts = counts[counts >= threshold]
+    levels = list(counts.index)
+    if max_categories is not None and len(levels) > max_categories:
+        ranked = sorted(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        levels = [level for level, _ in ranked[:max_categories]]
+    return sorted_levels(levels)
+
+
+# in-process LRU of loaded transformers keyed by (resolved path, sha256)
+TRANSFORMER_CACHE_SIZE = 8
+_transformer_cache: "OrderedDict[Tuple[str, str], ColumnTransformer]" = OrderedDict()
+# (resolved path, size, mtime_ns) -> sha256, so unchanged files are hashed once
+_digest_cache: Dict[Tuple[str, int, int], str] = {}
+_cache_lock = threading.Lock()
+
+
+def _file_digest(path: Path) -> str:
+    st = path.stat()
+    key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    with _cache_lock:
+        digest = _digest_cache.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with _cache_lock:
+            _digest_cache[key] = digest
+    return digest
+
+
+def _cache_put(key: Tuple[str, str], ct: "ColumnTransformer") -> None:
+    with _cache_lock:
+        _transformer_cache[key] = ct
+        _transformer_cache.move_to_end(key)
+        while len(_transformer_cache) > TRANSFORMER_CACHE_SIZE:
+            _transformer_cache.popitem(last=False)
+
+
+def load_transformer(transformer_path: Path) -> "ColumnTransformer":
+    """joblib.load with an LRU cache keyed by path and content hash.
+
+    A rewritten artifact hashes differently, so stale entries are never
+    served; they simply age out of the cache.
+    """
+    key = (str(transformer_path.resolve()), _file_digest(transformer_path))
+    with _cache_lock:
+        ct = _transformer_cache.get(key)
+        if ct is not None:
+            _transformer_cache.move_to_end(key)
+            return ct
+    import joblib
+
+    ct = joblib.load(transformer_path)
+    _cache_put(key, ct)
+    return ct
+
+
+def clear_transformer_cache() -> None:
+    with _cache_lock:
+        _transformer_cache.clear()
+        _digest_cache.clear()
+
+
 def fit_transformers(
     df: pd.DataFrame,
     numeric_cols: List[str],
     categorical_cols: List[str],
     out_dir: Path,
     artifact_prefix: str = "column_transformer",
-) -> ColumnTransformer:
+    categories: Optional[Dict[str, List[Any]]] = None,
+    batches: Optional[Iterable[pd.DataFrame]] = None,
+    sparse: bool = False,
+    max_categories: Optional[int] = None,
+    min_frequency: Optional[float] = None,
+) -> "ColumnTransformer":
     """Fit and save a ColumnTransformer and write metadata JSON.
 
-    artifact_prefix names the joblib file and metadata.
+    artifact_prefix names the joblib file and metadata. sparse makes the
+    transformer produce a CSR matrix; max_categories and min_frequency cap
+    the encoded levels (see frequent_levels).
+
+    For chunked runs pass the full per-column `categories` (so the encoder
+    sees every level; already capped) and the remaining `batches`: df is
+    used for the initial fit and the scaler statistics are then accumulated
+    with partial_fit.
     """
+    import joblib
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    if categories is None and (max_categories is not None or min_frequency):
+        categories = {
+            c: frequent_levels(
+                df[c].value_counts(dropna=False), max_categories, min_frequency
+            )
+            for c in categorical_cols
+        }
+    cat_kwargs: Dict[str, Any] = {"handle_unknown": "ignore"}
+    if categories is not None:
+        cat_kwargs["categories"] = [categories[c] for c in categorical_cols]
     transformers = []
     if numeric_cols:
         transformers.append(("num", StandardScaler(), numeric_cols))
@@ -67,7 +750,7 @@ def fit_transformers(
             transformers.append(
                 (
                     "cat",
-                    OneHotEncoder(handle_unknown="ignore", sparse_output=False),
+                    OneHotEncoder(sparse_output=sparse, **cat_kwargs),
                     categorical_cols,
                 )
             )
@@ -75,22 +758,37 @@ def fit_transformers(
             transformers.append(
                 (
                     "cat",
-                    OneHotEncoder(handle_unknown="ignore", sparse=False),
+                    OneHotEncoder(sparse=sparse, **cat_kwargs),
                     categorical_cols,
                 )
             )
 
-    ct = ColumnTransformer(transformers, remainder="drop")
+    # sparse_threshold=1: keep the output sparse whatever its density
+    ct = ColumnTransformer(
+        transformers, remainder="drop", sparse_threshold=1.0 if sparse else 0.0
+    )
     ct.fit(df)
+    if batches is not None and numeric_cols:
+        scaler = ct.named_transformers_["num"]
+        for batch in batches:
+            scaler.partial_fit(batch[numeric_cols])
     out_dir.mkdir(parents=True, exist_ok=True)
     artifact_path = out_dir / f"{artifact_prefix}.joblib"
     joblib.dump(ct, artifact_path)
+    digest = _file_digest(artifact_path)
+    # the fitted object is already in hand; seed the cache so the transform
+    # that follows does not reload it from disk
+    _cache_put((str(artifact_path.resolve()), digest), ct)
 
     # write metadata
     metadata = {
         "artifact": str(artifact_path.name),
+        "artifact_sha256": digest,
         "numeric_columns": numeric_cols,
         "categorical_columns": categorical_cols,
+        "sparse": sparse,
+        "max_categories": max_categories,
+        "min_frequency": min_frequency,
         "fitted_at": datetime.now(timezone.utc).isoformat(),
     }
     (out_dir / f"transformer_metadata_{artifact_prefix}.json").write_text(
@@ -99,10 +797,44 @@ def fit_transformers(
     return ct
 
 
-def transform_with_artifacts(df: pd.DataFrame, transformer_path: Path) -> pd.DataFrame:
-    ct = joblib.load(transformer_path)
-    arr = ct.transform(df)
-    # create column names for transformed output (best-effort)
+def load_fitted_transformer(
+    out_dir: Path,
+    artifact_prefix: str,
+    numeric_cols: List[str],
+    categorical_cols: List[str],
+) -> Optional["ColumnTransformer"]:
+    """Return a previously fitted transformer if it can be reused as-is.
+
+    Reuse requires both the joblib artifact and its metadata JSON, the same
+    numeric/categorical columns, and an artifact whose content hash matches
+    the one recorded at fit time. Returns None when a refit is needed.
+    """
+    artifact_path = out_dir / f"{artifact_prefix}.joblib"
+    meta_path = out_dir / f"transformer_metadata_{artifact_prefix}.json"
+    if not (artifact_path.exists() and meta_path.exists()):
+        return None
+    try:
+        metadata = json.loads(meta_path.read_text())
+    except ValueError:
+        return None
+    if (
+        metadata.get("numeric_columns") != list(numeric_cols)
+        or metadata.get("categorical_columns") != list(categorical_cols)
+        or metadata.get("artifact_sha256") != _file_digest(artifact_path)
+    ):
+        return None
+    return load_transformer(artifact_path)
+
+
+def transform_with_artifacts(
+    df: pd.DataFrame, transformer_path: Path, output: str = "dense"
+) -> pd.DataFrame:
+    ct = load_transformer(transformer_path)
+    return transform_frame(df, ct, output)
+
+
+def feature_names(ct: "ColumnTransformer") -> List[str]:
+    """Output column names of a fitted transformer (best-effort)."""
     out_cols: List[str] = []
     for name, trans, cols in ct.transformers_:
         if name == "num":
@@ -114,4 +846,47 @@ def transform_with_artifacts(df: pd.DataFrame, transformer_path: Path) -> pd.Dat
                 out_cols.extend(list(feat_names))
             except Exception:
                 out_cols.extend([f"{c}_{i}" for i, c in enumerate(cols)])
-    return pd.DataFrame(arr, columns=out_cols)
+    return out_cols
+
+
+def _encoded_codes(df: pd.DataFrame, ct: "ColumnTransformer") -> pd.DataFrame:
+    # scaled numerics plus one categorical column per encoded input column,
+    # whose codes index the encoder's categories; unknown levels are missing
+    out = {}
+    for name, trans, cols in ct.transformers_:
+        if name == "num":
+            scaled = trans.transform(df[cols])
+            out.update({c: scaled[:, i] for i, c in enumerate(cols)})
+        elif name == "cat":
+            for c, levels in zip(cols, trans.categories_, strict=True):
+                levels = [v for v in levels if not pd.isna(v)]
+                values = pd.Series(df[c].to_numpy(dtype=object), dtype=object)
+                values = values.where(values.isin(levels))
+                out[c] = pd.Categorical(values, categories=levels)
+    return pd.DataFrame(out)
+
+
+def transform_frame(
+    df: pd.DataFrame, ct: "ColumnTransformer", output: str = "dense"
+) -> pd.DataFrame:
+    """Transform df with an already loaded ColumnTransformer.
+
+    output "dense" gives one float column per feature; "sparse" a frame of
+    pandas sparse columns over the transformer's CSR matrix (fit with
+    sparse=True to avoid materializing it densely); "codes" the scaled
+    numerics and one categorical column of codes per categorical input.
+    """
+    if output == "codes":
+        return _encoded_codes(df, ct)
+    arr = ct.transform(df)
+    if output == "sparse":
+        from scipy import sparse
+
+        matrix = arr if sparse.issparse(arr) else sparse.csr_matrix(arr)
+        return sparse_frame(matrix, feature_names(ct))
+    if output != "dense":
+        raise ValueError(f"Unknown transform output: {output!r}")
+    if not isinstance(arr, np.ndarray):
+        arr = arr.toarray()
+    # arr is ours; wrap it instead of copying it into the frame
+    return pd.DataFrame(arr, columns=feature_names(ct), copy=False)
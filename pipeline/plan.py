@@ -0,0 +1,169 @@
+"""Compiled mapping plans.
+
+A plan resolves everything the stages need from a mapping and the canonical
+schema once: the source columns to read, each table's source -> canonical
+selects, unit conversion specs and registry, type casts and datetime formats,
+schema section, numeric/categorical column lists and imputation strategies,
+the transform options, plus the mapping checksum that versions the
+artifacts. run_pipeline compiles (or fetches) the plan and every stage runs
+from it, so the mapping dict is not walked again per stage, table or batch:
+
+    plan = get_plan(mapping, schema)
+    plan["tables"]["vitals"]["conversions"]
+
+Plans are memoized per process in an LRU keyed by the mapping and schema
+content, so batch workers, pipeline.worker and the UI compile each mapping
+once. A plan is plain dicts and lists; it pickles cheaply to pool workers.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+import yaml
+
+from pipeline.ingest import _table_selects, mapping_columns
+from pipeline.normalize import (
+    conversion_registry,
+    datetime_specs,
+    imputation_strategies,
+    transform_options,
+    type_casts,
+    unit_conversion_specs,
+)
+
+PLAN_CACHE_SIZE = 32
+_plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# content key -> checksum, so the YAML dump behind it runs once per mapping
+_checksums: Dict[str, str] = {}
+_plan_lock = threading.Lock()
+
+
+def _content_key(*parts: Any) -> str:
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def mapping_checksum(mapping: Dict[str, Any]) -> str:
+    """8-character version of the mapping (sha256 of its YAML dump)."""
+    key = _content_key(mapping)
+    with _plan_lock:
+        checksum = _checksums.get(key)
+    if checksum is None:
+        text = yaml.safe_dump(mapping)
+        checksum = hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+        with _plan_lock:
+            if len(_checksums) >= PLAN_CACHE_SIZE * 4:
+                _checksums.clear()
+            _checksums[key] = checksum
+    return checksum
+
+
+def table_columns(
+    schema_section: Dict[str, Any], columns: Iterable[str]
+) -> Tuple[List[str], List[str]]:
+    """Numeric and categorical schema columns among columns, in schema order."""
+    columns = set(columns)
+    numeric_cols = [
+        c
+        for c, m in schema_section.items()
+        if m.get("type") == "numeric" and c in columns
+    ]
+    categorical_cols = [
+        c
+        for c, m in schema_section.items()
+        if m.get("type") in ("categorical", "string") and c in columns
+    ]
+    return numeric_cols, categorical_cols
+
+
+def _table_plan(
+    fields: Dict[str, Any],
+    select: Dict[str, str],
+    schema_section: Dict[str, Any],
+    missing_policy: Dict[str, Any],
+) -> Dict[str, Any]:
+    numeric_cols, categorical_cols = table_columns(schema_section, select)
+    return {
+        "select": select,
+        "columns": list(dict.fromkeys(c for c in select.values() if c is not None)),
+        "conversions": unit_conversion_specs(fields, schema_section),
+        "casts": type_casts(schema_section),
+        "datetimes": datetime_specs(fields),
+        "schema": schema_section,
+        "numeric": numeric_cols,
+        "categorical": categorical_cols,
+        "imputation": imputation_strategies(missing_policy, select, numeric_cols),
+    }
+
+
+def _compile(mapping: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    # everything but the checksum, which also covers the source section
+    mapped = mapping.get("mappings", {})
+    policy = mapping.get("missing_policy", {})
+    tables = {
+        table: _table_plan(mapped[table], select, schema.get(table) or {}, policy)
+        for table, select in _table_selects(mapping).items()
+    }
+    return {
+        "columns": mapping_columns(mapping),
+        "tables": tables,
+        # tables the canonical schema defines, i.e. the ones that are processed
+        "schema_tables": [t for t in tables if isinstance(schema.get(t), dict)],
+        "registry": conversion_registry(mapping),
+        "missing_policy": policy,
+        "transform": transform_options(mapping.get("transform")),
+    }
+
+
+def compile_plan(mapping: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the plan for mapping and schema (see the module docstring)."""
+    return {**_compile(mapping, schema), "checksum": mapping_checksum(mapping)}
+
+
+def get_plan(mapping: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    """compile_plan memoized on the mapping and schema content.
+
+    The source section is left out of the cache key, so batch runs (one
+    mapping pointed at many files) compile the plan once and only add each
+    file's checksum. The returned plan shares its parts with other callers
+    and must not be modified.
+    """
+    rules = {k: v for k, v in mapping.items() if k != "source"}
+    key = _content_key(rules, schema)
+    with _plan_lock:
+        compiled = _plans.get(key)
+        if compiled is not None:
+            _plans.move_to_end(key)
+    if compiled is None:
+        compiled = _compile(mapping, schema)
+        with _plan_lock:
+            _plans[key] = compiled
+            while len(_plans) > PLAN_CACHE_SIZE:
+                _plans.popitem(last=False)
+    return {**compiled, "checksum": mapping_checksum(mapping)}
+
+
+def plan_columns(
+    tp: Dict[str, Any], columns: Iterable[str]
+) -> Tuple[List[str], List[str]]:
+    """A table plan's numeric and categorical columns present in columns."""
+    columns = set(columns)
+    return (
+        [c for c in tp["numeric"] if c in columns],
+        [c for c in tp["categorical"] if c in columns],
+    )
+
+
+def table_plan(plan: Dict[str, Any], table: str) -> Dict[str, Any]:
+    """A view of plan restricted to one table, so readers project its columns."""
+    tp = plan["tables"][table]
+    return {**plan, "columns": tp["columns"], "tables": {table: tp}}
+
+
+def clear_plan_cache() -> None:
+    with _plan_lock:
+        _plans.clear()
+        _checksums.clear()
@@ -0,0 +1,133 @@
+"""Point and range lookups on partitioned standardized datasets.
+
+run_demo(partition_by=...) (or `pipeline.cli --partition-by date`) writes
+standardized/<table>_dataset/, a Hive-partitioned parquet dataset whose
+files are sorted by patient_id and timestamp. query() turns a patient and
+time range into a filter that skips whole partitions (day directories and
+patient hash buckets) and, through the parquet row-group statistics, row
+groups inside the remaining files:
+
+    from pipeline.query import query
+    df = query("standardized/vitals_dataset", patient_id="p42",
+               start="2024-03-01", end="2024-03-08")
+
+`python -m pipeline.query <dataset> --patient p42 --start ... --end ...`
+prints the matching rows and the lookup time.
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from pipeline.ingest import DATASET_META, PARTITION_KEYS, patient_bucket
+
+TimeLike = Union[str, pd.Timestamp, None]
+
+
+def dataset_info(root: Path) -> Dict[str, Any]:
+    """Partition keys and bucket count recorded by write_dataset."""
+    return json.loads((Path(root) / DATASET_META).read_text())
+
+
+def open_dataset(root: Path) -> ds.Dataset:
+    info = dataset_info(root)
+    partitioning = ds.partitioning(
+        pa.schema([(k, PARTITION_KEYS[k][1]) for k in info["partition_by"]]),
+        flavor="hive",
+    )
+    return ds.dataset(Path(root), format="parquet", partitioning=partitioning)
+
+
+def _utc(value: TimeLike) -> Optional[pd.Timestamp]:
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def build_filter(
+    info: Dict[str, Any],
+    schema: pa.Schema,
+    patient_id: Union[str, Sequence[str], None] = None,
+    start: TimeLike = None,
+    end: TimeLike = None,
+) -> Optional[ds.Expression]:
+    """Dataset filter for patient_id(s) and the time range [start, end)."""
+    keys = info["partition_by"]
+    parts: List[ds.Expression] = []
+    if patient_id is not None:
+        ids = [patient_id] if isinstance(patient_id, str) else list(patient_id)
+        parts.append(ds.field("patient_id").isin(ids))
+        if "patient_bucket" in keys:
+            buckets = sorted(set(patient_bucket(ids, info["buckets"]).tolist()))
+            parts.append(ds.field("patient_bucket").isin(buckets))
+    start, end = _utc(start), _utc(end)
+    ts_type = schema.field("timestamp").type if (start or end) else None
+    if start is not None:
+        parts.append(ds.field("timestamp") >= pa.scalar(start, ts_type))
+        if "date" in keys:
+            parts.append(ds.field("date") >= pa.scalar(start.date(), pa.date32()))
+    if end is not None:
+        parts.append(ds.field("timestamp") < pa.scalar(end, ts_type))
+        if "date" in keys:
+            parts.append(ds.field("date") <= pa.scalar(end.date(), pa.date32()))
+    if not parts:
+        return None
+    expr = parts[0]
+    for part in parts[1:]:
+        expr = expr & part
+    return expr
+
+
+def query(
+    root: Path,
+    patient_id: Union[str, Sequence[str], None] = None,
+    start: TimeLike = None,
+    end: TimeLike = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Rows of the dataset at root for patient_id(s) with start <= timestamp < end.
+
+    Naive times are taken as UTC. columns defaults to the standardized
+    columns (partition keys are left out).
+    """
+    info = dataset_info(root)
+    dataset = open_dataset(root)
+    if columns is None:
+        columns = [n for n in dataset.schema.names if n not in info["partition_by"]]
+    expr = build_filter(info, dataset.schema, patient_id, start, end)
+    return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Query a partitioned standardized dataset")
+    p.add_argument(
+        "dataset", help="Dataset directory, e.g. standardized/vitals_dataset"
+    )
+    p.add_argument("--patient", action="append", help="patient_id (repeatable)")
+    p.add_argument("--start", help="Inclusive start time (UTC unless given)")
+    p.add_argument("--end", help="Exclusive end time")
+    p.add_argument("--columns", help="Comma-separated columns")
+    args = p.parse_args(argv)
+
+    start = time.perf_counter()
+    df = query(
+        Path(args.dataset),
+        patient_id=args.patient,
+        start=args.start,
+        end=args.end,
+        columns=args.columns.split(",") if args.columns else None,
+    )
+    seconds = time.perf_counter() - start
+    print(df.to_string(index=False))
+    print(f"{len(df)} rows in {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
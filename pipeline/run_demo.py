@@ -1,9 +1,16 @@
+import shutil
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
 import pandas as pd
+import pyarrow.parquet as pq
 
-from pipeline.ingest import load_mapping, read_source, save_standardized
-from pipeline.normalize import apply_unit_conversions, impute_missing, standardize_types
+from pipeline.ingest import load_mapping, load_schema, read_source, save_standardized
+from pipeline.io_executor import barrier, running, submit
+from pipeline.metrics import emit, file_bytes, metrics_name, stage, write_run_metrics
+from pipeline.normalize import apply_unit_conversions, standardize_types
+from pipeline.plan import get_plan, plan_columns, table_plan
 
 BASE = Path(__file__).resolve().parent
 
@@ -28,103 +35,764 @@ def make_synthetic_csv(path: Path):
     df.to_csv(path, index=False)
 
 
-def run_demo(
-    mapping_path: str = None,
-    work_dir: str = None,
-    s3_bucket: str = None,
-    s3_prefix: str = "",
+def _table_artifacts(table: str, checksum: str) -> dict:
+    """Artifact file names for one table; vitals keeps the historical names."""
+    tag = checksum if table == "vitals" else f"{table}_{checksum}"
+    artifact_prefix = f"column_transformer_{tag}"
+    report_prefix = f"validation_{tag}"
+    return {
+        "standardized": f"{table}.parquet",
+        "transformed": f"{table}_transformed.parquet",
+        "transformer_artifact": f"{artifact_prefix}.joblib",
+        "transformer_metadata": f"transformer_metadata_{artifact_prefix}.json",
+        "imputer": f"imputer_{tag}.json",
+        "validation_report": f"{report_prefix}.json",
+        "validation_cleaned": f"{report_prefix}_valid.parquet",
+        "validation_errors": f"{report_prefix}_errors.parquet",
+        "dataset": f"{table}_dataset",
+    }
+
+
+def _table_mapping(mapping, table):
+    # restrict the mapping to one table so the reader projects only its columns
+    return {**mapping, "mappings": {table: mapping["mappings"][table]}}
+
+
+def _scan(frames, tp):
+    """Pass 1 of a chunked run over frames: columns, row count, categorical
+    level counts (of the rows the policy keeps) and the fitted imputer.
+
+    With forward-fill strategies it also checks that the batches are in time
+    order, before pass 2 writes anything."""
+    from pipeline.normalize import check_time_order, drop_rows, fit_imputer
+
+    strategies = tp["imputation"]
+    seen = {"columns": None, "rows": 0, "levels": {}}
+    levels = seen["levels"]
+    ffill = any(s["strategy"] == "ffill" for s in strategies.values())
+    order = {}
+
+    def counted():
+        for df in frames:
+            if seen["columns"] is None:
+                seen["columns"] = list(df.columns)
+            seen["rows"] += len(df)
+            kept = drop_rows(df, strategies)
+            if ffill:
+                check_time_order(kept, order)
+            for col in plan_columns(tp, df.columns)[1]:
+                vc = kept[col].value_counts(dropna=False, sort=False)
+                levels[col] = vc.add(levels[col], fill_value=0) if col in levels else vc
+            yield df
+
+    seen["imputer"] = fit_imputer(counted(), strategies)
+    # a constant fill turns the missing values of a column into its level
+    for col, spec in strategies.items():
+        vc = levels.get(col)
+        if spec["strategy"] == "constant" and vc is not None and vc.index.hasnans:
+            missing = vc[vc.index.isna()].sum()
+            vc = vc[vc.index.notna()]
+            vc.loc[spec["value"]] = vc.get(spec["value"], 0) + missing
+            levels[col] = vc
+    return seen
+
+
+def _run_table_chunked(
+    table,
+    mapping,
+    plan,
+    out,
+    names,
+    chunk_rows,
+    reuse_artifacts=False,
+    events=None,
+    partition_by=None,
 ):
-    mappings_dir = BASE / "mappings"
-    if mapping_path:
-        mapping = load_mapping(Path(mapping_path))
-    else:
-        mapping = load_mapping(mappings_dir / "example_source_a.yaml")
+    """Run one table's stages over record batches of at most chunk_rows rows.
 
-    if work_dir:
-        base_dir = Path(work_dir)
-    else:
-        base_dir = BASE
+    Pass 1 fits the imputer and counts categorical levels, pass 2 imputes
+    and writes the standardized parquet, then the transformer is
+    fitted incrementally and applied batch by batch over the written file,
+    and validation streams over it as well. Reading, conversion and typing
+    are interleaved per batch, so metrics are recorded per pass ("scan",
+    "save_standardized") rather than per function. The partitioned dataset
+    is written batch by batch, so its files are sorted within each batch.
+    plan is the table's compiled mapping plan (pipeline.plan.table_plan).
+    """
+    from pipeline.ingest import (
+        apply_storage_dtypes,
+        iter_parquet,
+        iter_source,
+        parquet_options,
+        storage_policy,
+        write_parquet_batches,
+    )
+    from pipeline.normalize import (
+        apply_imputer,
+        fit_transformers,
+        frequent_levels,
+        load_fitted_transformer,
+        load_imputer,
+        save_imputer,
+        sorted_levels,
+        transform_frame,
+    )
+    from pipeline.validate import validate_table
 
-    # create synthetic source file
-    source_table = Path(mapping["source"]["table"])
-    if not source_table.exists():
-        make_synthetic_csv(source_table)
+    tp = plan["tables"][table]
+    schema_section = tp["schema"]
 
-    raw = read_source(mapping, Path("."))
-    vitals = raw.get("vitals", pd.DataFrame())
+    def prepared():
+        batches = iter_source(mapping, Path("."), batch_size=chunk_rows, plan=plan)
+        for tables in batches:
+            df = tables.get(table, pd.DataFrame())
+            df = apply_unit_conversions(df, mapping, table=table, plan=plan)
+            yield standardize_types(df, schema_section, tp["casts"], tp["datetimes"])
 
-    vitals = apply_unit_conversions(vitals, mapping)
-    # load canonical schema for typing
-    import yaml
+    events = [] if events is None else events
+    imputer_path = out / names["imputer"]
+    with stage(events, "scan", table, chunk_rows=chunk_rows) as ev:
+        seen = _scan(prepared(), tp)
+        rows, columns, levels = seen["rows"], seen["columns"], seen["levels"]
+        imputer = reuse_artifacts and load_imputer(imputer_path, tp["imputation"])
+        ev["reused"] = bool(imputer)
+        if not imputer:
+            imputer = save_imputer(seen["imputer"], imputer_path)
+        ev.update(bytes_read=_source_bytes(mapping), rows_out=rows)
+    if columns is None:
+        raise ValueError(f"Source produced no {table} rows")
+    numeric_cols, categorical_cols = plan_columns(tp, columns)
+    categories = {c: sorted_levels(v.index[v > 0]) for c, v in levels.items()}
+    options = plan["transform"]
 
-    schema = yaml.safe_load((BASE / "canonical_schema.yaml").read_text())
-    vitals = standardize_types(vitals, schema.get("vitals", {}))
-    vitals = impute_missing(vitals, mapping.get("missing_policy", {}))
+    table_path = out / names["standardized"]
+    storage = storage_policy()
+    ffill = {}
+    with stage(events, "save_standardized", table, rows_in=rows) as ev:
+        written = write_parquet_batches(
+            (
+                apply_storage_dtypes(
+                    apply_imputer(df, imputer, ffill),
+                    schema_section,
+                    storage,
+                    categories,
+                )
+                for df in prepared()
+            ),
+            table_path,
+            parquet_options(storage),
+        )
+        ev.update(
+            bytes_read=_source_bytes(mapping),
+            rows_out=written,
+            bytes_written=file_bytes(table_path),
+        )
+    _save_dataset(
+        events,
+        table,
+        columns,
+        iter_parquet(table_path, chunk_rows),
+        out / names["dataset"],
+        partition_by,
+        written,
+    )
 
-    out = base_dir / "standardized"
-    out.mkdir(parents=True, exist_ok=True)
+    if numeric_cols or categorical_cols:
+        artifact_prefix = Path(names["transformer_artifact"]).stem
+        with stage(events, "fit_transformers", table, rows_in=rows) as ev:
+            ct = reuse_artifacts and load_fitted_transformer(
+                out, artifact_prefix, numeric_cols, categorical_cols
+            )
+            ev["reused"] = bool(ct)
+            if not ct:
+                batches = iter_parquet(table_path, chunk_rows)
+                ct = fit_transformers(
+                    next(batches),
+                    numeric_cols,
+                    categorical_cols,
+                    out,
+                    artifact_prefix=artifact_prefix,
+                    categories={
+                        c: frequent_levels(
+                            levels[c],
+                            options["max_categories"],
+                            options["min_frequency"],
+                        )
+                        for c in categorical_cols
+                    },
+                    batches=batches,
+                    sparse=options["output"] == "sparse",
+                    max_categories=options["max_categories"],
+                    min_frequency=options["min_frequency"],
+                )
+        with stage(events, "transform", table, rows_in=rows) as ev:
+            transformed = out / names["transformed"]
+            ev["rows_out"] = write_parquet_batches(
+                (
+                    transform_frame(b, ct, options["output"])
+                    for b in iter_parquet(table_path, chunk_rows)
+                ),
+                transformed,
+            )
+            ev["bytes_written"] = file_bytes(transformed)
+
+    with stage(events, "validate", table, rows_in=rows) as ev:
+        report = validate_table(
+            table_path,
+            out,
+            table,
+            report_prefix=Path(names["validation_report"]).stem,
+            chunk_rows=chunk_rows,
+        )
+        ev.update(
+            rows_out=report["valid"],
+            bytes_written=file_bytes(
+                out / names["validation_report"],
+                out / names["validation_cleaned"],
+                out / names["validation_errors"],
+            ),
+        )
+
+
+def _save_dataset(
+    events, table, columns, batches, root, partition_by, rows, append=False
+):
+    """Write the partitioned dataset of one table, if partition_by applies."""
+    from pipeline.ingest import partitionable, write_dataset_batches
+
+    if not partitionable(columns, partition_by):
+        return
+    with stage(events, "write_dataset", table, rows_in=rows) as ev:
+        ev["rows_out"] = write_dataset_batches(
+            batches, root, partition_by, append=append
+        )
+        ev["bytes_written"] = file_bytes(*root.rglob("*"))
 
-    # fit transformers on vitals numeric and categorical columns
-    numeric_cols = [
-        c
-        for c, m in schema.get("vitals", {}).items()
-        if m.get("type") == "numeric" and c in vitals.columns
-    ]
-    categorical_cols = [
-        c
-        for c, m in schema.get("vitals", {}).items()
-        if m.get("type") in ("categorical", "string") and c in vitals.columns
-    ]
-    # compute a simple checksum of the mapping to version the transformer artifact
-    import hashlib
 
-    import yaml
+def _max_timestamp(df):
+    if "timestamp" not in df.columns or not df["timestamp"].notna().any():
+        return None
+    ts = pd.to_datetime(df["timestamp"], utc=True).max()
+    return ts.isoformat()
 
-    from pipeline.normalize import fit_transformers, transform_with_artifacts
 
-    mapping_text = yaml.safe_dump(mapping)
-    checksum = hashlib.sha256(mapping_text.encode("utf-8")).hexdigest()[:8]
-    artifact_prefix = f"column_transformer_{checksum}"
-    fit_transformers(
-        vitals, numeric_cols, categorical_cols, out, artifact_prefix=artifact_prefix
+def _source_bytes(mapping, delta=None):
+    if delta is not None and "byte_end" in delta:
+        return delta["byte_end"] - delta["byte_start"]
+    return file_bytes(Path(mapping["source"]["table"]))
+
+
+def _persist(events, table, name, df, out, append=False):
+    """Write (or append) one frame as out/<name>.parquet, as a stage."""
+    from pipeline.ingest import append_parquet
+
+    path = out / f"{name}.parquet"
+    with stage(events, "save_standardized", table, rows_in=len(df)) as ev:
+        # a shallow copy: the caller's frame is never written to
+        df = df.copy(deep=False)
+        if append:
+            append_parquet(df, path)
+        else:
+            save_standardized({name: df}, out)
+        ev.update(rows_out=len(df), bytes_written=file_bytes(path), file=path.name)
+
+
+def _fit_transform(events, table, df, plan, out, names, reuse):
+    """Fit (or reuse) the table's transformer and transform df; None if the
+    table has no numeric or categorical columns."""
+    from pipeline.normalize import (
+        fit_transformers,
+        load_fitted_transformer,
+        transform_with_artifacts,
     )
 
+    numeric_cols, categorical_cols = plan_columns(plan["tables"][table], df.columns)
+    if not (numeric_cols or categorical_cols):
+        return None
+    options = plan["transform"]
+    artifact_prefix = Path(names["transformer_artifact"]).stem
+    with stage(events, "fit_transformers", table, rows_in=len(df)) as ev:
+        reused = reuse and load_fitted_transformer(
+            out, artifact_prefix, numeric_cols, categorical_cols
+        )
+        if not reused:
+            fit_transformers(
+                df,
+                numeric_cols,
+                categorical_cols,
+                out,
+                artifact_prefix=artifact_prefix,
+                sparse=options["output"] == "sparse",
+                max_categories=options["max_categories"],
+                min_frequency=options["min_frequency"],
+            )
+        ev["reused"] = bool(reused)
+        ev["bytes_written"] = (
+            0
+            if reused
+            else file_bytes(
+                out / names["transformer_artifact"],
+                out / names["transformer_metadata"],
+            )
+        )
     # transform using the saved artifact path (checksumed filename)
-    transformed = transform_with_artifacts(vitals, out / f"{artifact_prefix}.joblib")
+    with stage(events, "transform", table, rows_in=len(df)) as ev:
+        transformed = transform_with_artifacts(
+            df, out / names["transformer_artifact"], options["output"]
+        )
+        ev["rows_out"] = len(transformed)
+    return transformed
 
-    save_standardized({"vitals": vitals, "vitals_transformed": transformed}, out)
-    # run validation and write report prefixed by checksum
-    from pipeline.validate import validate_vitals
 
-    report_prefix = f"validation_{checksum}"
-    validate_vitals(out / "vitals.parquet", out, report_prefix=report_prefix)
+def _run_table(
+    table,
+    mapping,
+    plan,
+    out,
+    names,
+    reuse_artifacts=False,
+    delta=None,
+    events=None,
+    partition_by=None,
+):
+    """Normalize, transform, save and validate one table in memory.
+
+    With an incremental `delta` only that part of the source is read; when
+    delta["append"] is set the results are appended to the existing outputs
+    and the transformer fitted on earlier runs is reused. Per-stage metrics
+    are appended to `events`. partition_by also writes the table as a
+    partitioned dataset (see ingest.write_dataset). plan is the table's
+    compiled mapping plan (pipeline.plan.table_plan).
+
+    The standardized, transformed and dataset files and the validation
+    outputs are written on an I/O executor (pipeline.io_executor) while the
+    transformer is fitted and the frame is validated in memory; all writes
+    finish before this returns. With validation workers (validate_workers())
+    a full run validates the standardized file in a process pool instead,
+    once it is written.
+    """
+    from pipeline.ingest import apply_storage_dtypes, read_source_range
+    from pipeline.normalize import (
+        apply_imputer,
+        fit_imputer,
+        load_imputer,
+        save_imputer,
+    )
+    from pipeline.validate import validate_table, validate_workers
+
+    events = [] if events is None else events
+    tp = plan["tables"][table]
+    schema_section = tp["schema"]
+    with stage(events, "read_source", table) as ev:
+        if delta is not None:
+            raw = read_source_range(mapping, Path("."), delta, plan)
+        else:
+            raw = read_source(mapping, Path("."), plan)
+        df = raw.get(table, pd.DataFrame())
+        ev.update(bytes_read=_source_bytes(mapping, delta), rows_out=len(df))
+    append = bool(delta and delta["append"])
+    rows = len(df)
+
+    with stage(events, "apply_unit_conversions", table, rows_in=rows) as ev:
+        df = apply_unit_conversions(df, mapping, table=table, plan=plan)
+        ev["rows_out"] = len(df)
+    with stage(events, "standardize_types", table, rows_in=rows) as ev:
+        df = standardize_types(df, schema_section, tp["casts"], tp["datetimes"])
+        ev["rows_out"] = len(df)
+    # imputation statistics are fitted once per mapping checksum and reused
+    # by appends (like the transformer)
+    imputer_path = out / names["imputer"]
+    with stage(events, "fit_imputer", table, rows_in=rows) as ev:
+        imputer = (reuse_artifacts or append) and load_imputer(
+            imputer_path, tp["imputation"]
+        )
+        ev["reused"] = bool(imputer)
+        if not imputer:
+            imputer = save_imputer(fit_imputer([df], tp["imputation"]), imputer_path)
+            ev["bytes_written"] = file_bytes(imputer_path)
+    with stage(events, "impute_missing", table, rows_in=rows) as ev:
+        df = apply_imputer(df, imputer)
+        ev["rows_out"] = len(df)
+    # compact storage dtypes before fitting, so the transformer sees exactly
+    # the values that are saved (and that chunked runs read back)
+    with stage(events, "apply_storage_dtypes", table, rows_in=len(df)) as ev:
+        df = apply_storage_dtypes(df, schema_section)
+        ev["rows_out"] = len(df)
+
+    table_path = out / names["standardized"]
+    append_to = append and table_path.exists()
+    from_row = pq.ParquetFile(table_path).metadata.num_rows if append_to else 0
+    # the files are written on an I/O executor while the later stages keep
+    # working on the same frames in memory
+    # with validation workers (and a full run) the saved file is validated in
+    # a process pool instead of the frame in memory
+    parallel = validate_workers() > 1 and not from_row
+    with running() as io:
+        persisted = submit(io, _persist, events, table, table, df, out, append_to)
+        submit(
+            io,
+            _save_dataset,
+            events,
+            table,
+            df.columns,
+            [df],
+            out / names["dataset"],
+            partition_by,
+            len(df),
+            append=bool(from_row),
+        )
+        transformed = _fit_transform(
+            events, table, df, plan, out, names, reuse_artifacts or append
+        )
+        if transformed is not None:
+            name = f"{table}_transformed"
+            submit(io, _persist, events, table, name, transformed, out, append_to)
+        # validate the frame just saved, rather than reading the file back
+        if parallel:
+            persisted.result()
+        with stage(events, "validate", table, rows_in=len(df)) as ev:
+            report = validate_table(
+                table_path,
+                out,
+                table,
+                report_prefix=Path(names["validation_report"]).stem,
+                from_row=from_row,
+                append=bool(from_row),
+                frame=None if parallel else df,
+                executor=io,
+            )
+            ev["rows_out"] = report["valid"]
+            # validation outputs are written in the background too; wait for
+            # them so the stage can report their size
+            barrier(io)
+            ev["bytes_written"] = file_bytes(
+                out / names["validation_report"],
+                out / names["validation_cleaned"],
+                out / names["validation_errors"],
+            )
+    return {"rows": rows, "max_timestamp": _max_timestamp(df)}
+
+
+def process_table(
+    table,
+    mapping,
+    plan,
+    out,
+    chunk_rows=None,
+    reuse_artifacts=False,
+    delta=None,
+    partition_by=None,
+):
+    """Run every stage for one mapped table.
+
+    Top-level so it can run in a worker process: it reads its own table from
+    the source rather than receiving a pickled frame; plan is the compiled
+    mapping plan (pipeline.plan.get_plan). With reuse_artifacts a
+    transformer already fitted for this mapping checksum is loaded instead of
+    refitted; delta restricts the run to new source rows (incremental mode);
+    partition_by adds the partitioned <table>_dataset/ output.
+
+    Returns {"artifacts": names, "rows": rows read, "max_timestamp": ...,
+    "metrics": per-stage events}.
+    """
+    names = _table_artifacts(table, plan["checksum"])
+    plan = table_plan(plan, table)
+    summary = {"rows": None, "max_timestamp": None}
+    events = []
+    if not partition_by:
+        # a dataset left by an earlier run would no longer match the table
+        shutil.rmtree(out / names["dataset"], ignore_errors=True)
+    if chunk_rows:
+        _run_table_chunked(
+            table,
+            mapping,
+            plan,
+            out,
+            names,
+            chunk_rows,
+            reuse_artifacts,
+            events,
+            partition_by,
+        )
+    else:
+        summary = _run_table(
+            table,
+            mapping,
+            plan,
+            out,
+            names,
+            reuse_artifacts,
+            delta,
+            events,
+            partition_by,
+        )
+    summary["artifacts"] = {k: v for k, v in names.items() if (out / v).exists()}
+    summary["metrics"] = events
+    return summary
+
+
+def _process_tables(
+    mapping,
+    plan,
+    out,
+    chunk_rows,
+    workers,
+    reuse_artifacts=False,
+    delta=None,
+    partition_by=None,
+    on_done=None,
+):
+    """Run process_table for every mapped table, concurrently if workers > 1.
+
+    workers=None runs them inline: starting a pool costs more than it saves
+    on small sources, so a process per table is opt-in (capped at the number
+    of tables). on_done(table, result) is called in this process as each
+    table finishes.
+    """
+    on_done = on_done or (lambda table, result: None)
+    tables = plan["schema_tables"]
+    workers = min(workers or 1, len(tables))
+    args = [
+        (
+            t,
+            mapping,
+            plan,
+            out,
+            chunk_rows,
+            reuse_artifacts,
+            delta,
+            partition_by,
+        )
+        for t in tables
+    ]
+    if workers <= 1 or len(tables) <= 1:
+        results = {}
+        for t, a in zip(tables, args, strict=True):
+            results[t] = process_table(*a)
+            on_done(t, results[t])
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_table, *a): t for t, a in zip(tables, args, strict=True)
+        }
+        for f in as_completed(futures):
+            on_done(futures[f], f.result())
+        return {t: f.result() for f, t in futures.items()}
 
-    # write an artifacts index mapping checksum -> artifacts
+
+def _write_artifacts_index(out, checksum, tables):
+    """Write artifacts_index.json mapping the checksum to every table's files."""
     import json
 
-    artifacts = {
-        "mapping_checksum": checksum,
-        "transformer_artifact": f"{artifact_prefix}.joblib",
-        "transformer_metadata": f"transformer_metadata_{artifact_prefix}.json",
-        "validation_report": f"{report_prefix}.json",
-        "validation_cleaned": f"{report_prefix}_valid.parquet",
-    }
+    # top-level keys keep pointing at the vitals artifacts for existing readers
+    artifacts = {"mapping_checksum": checksum}
+    vitals = tables.get("vitals", {})
+    for key in (
+        "transformer_artifact",
+        "transformer_metadata",
+        "validation_report",
+        "validation_cleaned",
+        "validation_errors",
+    ):
+        if key in vitals:
+            artifacts[key] = vitals[key]
+    artifacts["run_metrics"] = metrics_name(checksum)
+    artifacts["tables"] = tables
     (out / "artifacts_index.json").write_text(json.dumps(artifacts, indent=2))
 
+
+def _sync_to_s3(archive_target, s3_bucket, s3_prefix, names=None):
+    """Sync the archive (or just names in it) to S3; returns the bytes
+    uploaded (None on failure)."""
+    from pipeline.storage import sync_dir_to_s3
+
+    try:
+        s3_results = sync_dir_to_s3(archive_target, s3_bucket, s3_prefix, names=names)
+        uploaded = [r for r in s3_results.values() if r["status"] == "uploaded"]
+        sent = sum(r["bytes"] for r in uploaded)
+        print(
+            f"Synced artifacts to S3: {len(uploaded)} uploaded,"
+            f" {len(s3_results) - len(uploaded)} unchanged,"
+            f" {sent} bytes"
+        )
+        return sent
+    except Exception as e:
+        print("S3 upload failed:", e)
+        return None
+
+
+def _table_files(out, artifacts):
+    """Relative paths of the files behind a table's artifact names."""
+    files = []
+    for name in artifacts.values():
+        path = out / name
+        if path.is_dir():
+            files.extend(p.relative_to(out).as_posix() for p in path.rglob("*"))
+        elif path.is_file():
+            files.append(name)
+    return sorted(f for f in files if (out / f).is_file())
+
+
+def _ship_table(events, out, table, files, s3_bucket, s3_prefix):
+    """Archive blobs for a finished table's files and upload them to S3.
+
+    Runs on the I/O executor while later tables compute. Returns the
+    manifest entries and the files uploaded.
+    """
+    from pipeline.artifacts import stage_files
+
+    with stage(events, "stage_artifacts", table, rows_in=len(files)) as ev:
+        entries = stage_files(out, files)
+        ev["bytes_read"] = sum(e["size"] for e in entries.values())
+    uploaded = []
+    if s3_bucket:
+        # keys relative to standardized/ match the archive's relative names
+        with stage(events, "upload_to_s3", table) as ev:
+            sent = _sync_to_s3(out, s3_bucket, s3_prefix, names=files)
+            ev["bytes_written"] = sent
+            uploaded = files if sent is not None else []
+    return {"entries": entries, "uploaded": uploaded}
+
+
+def _plan_incremental(out, mapping, checksum, source_table):
+    """Plan the delta for an incremental run; None when there is nothing new."""
+    from pipeline.incremental import checkpoint_path, load_checkpoint, plan_delta
+
+    checkpoint = load_checkpoint(checkpoint_path(out, mapping, checksum))
+    if not (out / "artifacts_index.json").exists():
+        # outputs are gone; the checkpoint cannot be appended to
+        checkpoint = None
+    delta = plan_delta(source_table, mapping["source"].get("format", "csv"), checkpoint)
+    if delta["append"] and (
+        delta.get("byte_start") == delta.get("byte_end")
+        and delta["row_start"] == delta.get("row_end", delta["row_start"])
+    ):
+        return None
+    delta["checkpoint"] = checkpoint
+    return delta
+
+
+def _save_incremental(out, mapping, checksum, source_table, delta, results):
+    from pipeline.incremental import checkpoint_path, next_checkpoint, save_checkpoint
+
+    rows = max((r["rows"] or 0) for r in results.values()) if results else 0
+    checkpoint = next_checkpoint(
+        source_table,
+        mapping["source"].get("format", "csv"),
+        delta,
+        rows,
+        {t: r["max_timestamp"] for t, r in results.items()},
+        delta["checkpoint"],
+    )
+    save_checkpoint(checkpoint_path(out, mapping, checksum), checkpoint)
+
+
+def run_pipeline(
+    mapping,
+    schema,
+    base_dir: Path,
+    s3_bucket: str = None,
+    s3_prefix: str = "",
+    chunk_rows: int = None,
+    workers: int = None,
+    reuse_artifacts: bool = False,
+    incremental: bool = False,
+    partition_by=None,
+):
+    """Run every stage for an already loaded mapping and canonical schema.
+
+    Outputs go to base_dir/standardized and are archived under
+    base_dir/artifacts/<checksum>/. Per-stage metrics are written to
+    run_metrics_<checksum>.json and passed to the pipeline.metrics hooks.
+    Returns the archive directory, or None when an incremental run found
+    nothing new. See run_demo for the options.
+    """
+    if incremental and chunk_rows:
+        raise ValueError("incremental mode does not support chunk_rows")
+    source_table = Path(mapping["source"]["table"])
+
+    out = base_dir / "standardized"
+    out.mkdir(parents=True, exist_ok=True)
+
+    # the compiled plan carries the mapping checksum that versions the artifacts
+    plan = get_plan(mapping, schema)
+    checksum = plan["checksum"]
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    t0 = time.perf_counter()
+    events = []
+    delta = None
+    if incremental:
+        with stage(events, "plan_incremental"):
+            delta = _plan_incremental(out, mapping, checksum, source_table)
+        if delta is None:
+            print("No new source rows since checkpoint; nothing to do.")
+            return None
+
+    # each table's files are archived (and uploaded) on the I/O executor as
+    # soon as the table is done, while the remaining tables compute
+    with running() as io:
+
+        def ship(table, result):
+            files = _table_files(out, result["artifacts"])
+            submit(io, _ship_table, events, out, table, files, s3_bucket, s3_prefix)
+
+        with stage(events, "process_tables", workers=workers):
+            results = _process_tables(
+                mapping,
+                plan,
+                out,
+                chunk_rows,
+                workers,
+                reuse_artifacts,
+                delta,
+                partition_by,
+                on_done=ship,
+            )
+        # the barrier: the indexes below are only written once every table's
+        # files are written, archived and uploaded
+        with stage(events, "io_barrier"):
+            shipped = barrier(io)
+    for r in results.values():
+        events.extend(r["metrics"])
+    known = {k: v for r in shipped for k, v in r["entries"].items()}
+    uploaded = {f for r in shipped for f in r["uploaded"]}
+    tables = {t: r["artifacts"] for t, r in results.items()}
+    _write_artifacts_index(out, checksum, tables)
+
+    if incremental:
+        _save_incremental(out, mapping, checksum, source_table, delta, results)
+
     # archive into artifacts/<checksum>/ and update master index
     from pipeline.artifacts import archive_artifacts
 
-    archive_target = archive_artifacts(out, checksum)
+    with stage(events, "archive_artifacts"):
+        archive_target = archive_artifacts(out, checksum, known)
+    write_run_metrics(out, checksum, events, started_at, time.perf_counter() - t0)
+    # archive again so the metrics file is indexed too (unchanged files are
+    # neither rehashed nor copied)
+    archive_artifacts(out, checksum)
 
-    # optionally upload archived artifacts to S3 if requested
+    # optionally upload the rest of the archive (index, metrics, manifest and
+    # files of earlier runs) to S3; this runs after the metrics file is
+    # written, so its event only reaches the hooks
     if s3_bucket:
-        from pipeline.storage import upload_dir_to_s3
-
-        try:
-            s3_results = upload_dir_to_s3(archive_target, s3_bucket, s3_prefix)
-            print("Uploaded artifacts to S3:", s3_results)
-        except Exception as e:
-            print("S3 upload failed:", e)
+        rest = [
+            p.relative_to(archive_target).as_posix()
+            for p in archive_target.rglob("*")
+            if p.is_file()
+        ]
+        with stage(events, "sync_to_s3") as ev:
+            ev["bytes_written"] = _sync_to_s3(
+                archive_target,
+                s3_bucket,
+                s3_prefix,
+                names=[f for f in rest if f not in uploaded],
+            )
+    emit(events)
 
     print(
         "Demo complete. Standardized files, validation report, artifacts index, and"
@@ -133,6 +801,74 @@ def run_demo(
         "->",
         archive_target,
     )
+    return archive_target
+
+
+def resolve_mapping(mapping_path: str = None):
+    """Load mapping_path (default: example_source_a.yaml) for a run.
+
+    A synthetic source file is created when the mapped source is missing.
+    """
+    mappings_dir = BASE / "mappings"
+    if mapping_path:
+        mapping = load_mapping(Path(mapping_path))
+    else:
+        mapping = load_mapping(mappings_dir / "example_source_a.yaml")
+
+    # create synthetic source file
+    source_table = Path(mapping["source"]["table"])
+    if not source_table.exists():
+        make_synthetic_csv(source_table)
+    return mapping
+
+
+def run_demo(
+    mapping_path: str = None,
+    work_dir: str = None,
+    s3_bucket: str = None,
+    s3_prefix: str = "",
+    chunk_rows: int = None,
+    workers: int = None,
+    reuse_artifacts: bool = False,
+    incremental: bool = False,
+    partition_by=None,
+):
+    """Run the demo pipeline for every table in the mapping.
+
+    chunk_rows switches to bounded-memory execution: the source is streamed
+    in batches of at most that many rows and no stage holds the full frame.
+    Tables are independent and can run in a process pool of `workers`
+    processes (default: inline, one after another).
+    reuse_artifacts skips transformer fitting when an artifact and metadata
+    for the same mapping checksum already exist in the work directory.
+    incremental processes only source rows past the checkpoint stored for
+    this source and mapping checksum and appends them to the outputs.
+    partition_by (e.g. ["date"] or ["patient_bucket"]) also writes each
+    table with a timestamp and patient_id as a Hive-partitioned dataset
+    standardized/<table>_dataset/ for pipeline.query lookups.
+    """
+    mapping = resolve_mapping(mapping_path)
+
+    if work_dir:
+        base_dir = Path(work_dir)
+    else:
+        base_dir = BASE
+
+    # load canonical schema for typing (parsed once per process)
+    schema = load_schema(BASE / "canonical_schema.yaml")
+
+    return run_pipeline(
+        mapping,
+        schema,
+        base_dir,
+        s3_bucket=s3_bucket,
+        s3_prefix=s3_prefix,
+        chunk_rows=chunk_rows,
+        workers=workers,
+        reuse_artifacts=reuse_artifacts,
+        incremental=incremental,
+        partition_by=partition_by,
+    )
 
 
 if __name__ == "__main__":
@@ -1,24 +1,149 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
 
+MB = 1024 * 1024
 
-def upload_dir_to_s3(local_dir: Path, bucket: str, prefix: str = "") -> dict:
-    """Upload all files in local_dir into s3://{bucket}/{prefix}/.
 
-    Returns a mapping of local->s3 keys. Requires boto3 and AWS credentials
-    available via environment or IAM role.
-    """
+def _boto3():
     try:
         import boto3
     except Exception:
         raise RuntimeError(
             "boto3 is required for S3 uploads. Install with pip install boto3"
         ) from None
+    return boto3
+
+
+def _key(prefix: str, name: str) -> str:
+    return f"{prefix.rstrip('/')}/{name}" if prefix else name
+
+
+def local_etag(path: Path, chunk_size: int, threshold: int) -> str:
+    """ETag S3 assigns to path when uploaded with this multipart config.
+
+    Single-part uploads get the MD5 of the body; multipart uploads get the MD5
+    of the concatenated part MD5s suffixed with the part count.
+    """
+    size = path.stat().st_size
+    with open(path, "rb") as fh:
+        if size < threshold:
+            h = hashlib.md5(usedforsecurity=False)
+            for block in iter(lambda: fh.read(MB), b""):
+                h.update(block)
+            return h.hexdigest()
+        parts = [
+            hashlib.md5(block, usedforsecurity=False).digest()
+            for block in iter(lambda: fh.read(chunk_size), b"")
+        ]
+    combined = hashlib.md5(b"".join(parts), usedforsecurity=False).hexdigest()
+    return f"{combined}-{len(parts)}"
+
+
+def _remote_objects(s3, bucket: str, prefix: str) -> Dict[str, Dict[str, Any]]:
+    remote = {}
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix.rstrip("/")):
+        for obj in page.get("Contents", []):
+            remote[obj["Key"]] = {
+                "size": obj["Size"],
+                "etag": obj["ETag"].strip('"'),
+            }
+    return remote
+
+
+def _remote_object(s3, bucket: str, key: str) -> Optional[Dict[str, Any]]:
+    from botocore.exceptions import ClientError
+
+    try:
+        obj = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+            return None
+        raise
+    return {"size": obj["ContentLength"], "etag": obj["ETag"].strip('"')}
+
+
+def sync_dir_to_s3(
+    local_dir: Path,
+    bucket: str,
+    prefix: str = "",
+    max_workers: int = 8,
+    multipart_chunksize: int = 8 * MB,
+    multipart_threshold: int = 8 * MB,
+    max_concurrency: int = 4,
+    skip_unchanged: bool = True,
+    client: Optional[Any] = None,
+    names: Optional[Iterable[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Upload files in local_dir to s3://{bucket}/{prefix}/ concurrently.
+
+    Files are uploaded by a pool of max_workers threads sharing one client;
+    each upload uses the given multipart chunk size/threshold and up to
+    max_concurrency part uploads. Files in subdirectories (partitioned
+    datasets) keep their relative path in the key. With skip_unchanged,
+    files whose size and ETag already match the remote object are skipped.
+    names (paths relative to local_dir) limits the sync to those files;
+    their objects are then checked one by one (HEAD) instead of listing the
+    whole prefix, so syncing a few files into a large prefix stays cheap.
+
+    Returns local path -> {"uri", "status" ("uploaded"/"skipped"), "bytes",
+    "seconds"}.
+    """
+    boto3 = _boto3()
+    from boto3.s3.transfer import TransferConfig
+
+    s3 = client or boto3.client("s3")
+    config = TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=multipart_chunksize,
+        max_concurrency=max_concurrency,
+    )
+    listed = skip_unchanged and names is None
+    remote = _remote_objects(s3, bucket, prefix) if listed else {}
+
+    def _one(p: Path) -> Dict[str, Any]:
+        key = _key(prefix, p.relative_to(local_dir).as_posix())
+        size = p.stat().st_size
+        start = time.perf_counter()
+        if skip_unchanged and not listed:
+            existing = _remote_object(s3, bucket, key)
+        else:
+            existing = remote.get(key)
+        if (
+            existing is not None
+            and existing["size"] == size
+            and existing["etag"]
+            == local_etag(p, multipart_chunksize, multipart_threshold)
+        ):
+            status, sent = "skipped", 0
+        else:
+            s3.upload_file(str(p), bucket, key, Config=config)
+            status, sent = "uploaded", size
+        return {
+            "uri": "s3://" + bucket + "/" + key,
+            "status": status,
+            "bytes": sent,
+            "seconds": round(time.perf_counter() - start, 6),
+        }
 
-    s3 = boto3.client("s3")
-    results = {}
-    for p in local_dir.glob("*"):
-        if p.is_file():
-            key = f"{prefix.rstrip('/')}/{p.name}" if prefix else p.name
-            s3.upload_file(str(p), bucket, key)
-            results[str(p)] = "s3://" + bucket + "/" + key
-    return results
+    if names is None:
+        files = sorted(p for p in local_dir.rglob("*") if p.is_file())
+    else:
+        files = sorted(local_dir / n for n in names)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        results = list(pool.map(_one, files))
+    return {str(p): r for p, r in zip(files, results, strict=True)}
+
+
+def upload_dir_to_s3(local_dir: Path, bucket: str, prefix: str = "") -> dict:
+    """Upload all files in local_dir into s3://{bucket}/{prefix}/.
+
+    Returns a mapping of local->s3 keys. Requires boto3 and AWS credentials
+    available via environment or IAM role. Uploads run concurrently; use
+    sync_dir_to_s3 to skip unchanged objects and get per-file timings.
+    """
+    results = sync_dir_to_s3(local_dir, bucket, prefix, skip_unchanged=False)
+    return {local: r["uri"] for local, r in results.items()}
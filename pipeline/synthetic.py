@@ -0,0 +1,248 @@
+"""Synthetic source data at production-like scale.
+
+generate_source writes a CSV or Parquet file whose columns are the source
+columns of a mapping (e.g. mappings/example_source_a.yaml), so the file can
+be fed straight to run_demo / run_pipeline. Rows are generated and written in
+blocks, so tens of millions of rows never have to fit in memory at once.
+"""
+
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.ingest import load_mapping
+
+# lab test -> (canonical unit, alternative source unit, scale from canonical to
+# the alternative, typical canonical mean, sd); alternatives match
+# normalize.LAB_CONVERSIONS so the per-row conversions are exercised
+LAB_TESTS = {
+    "Glucose": ("mmol/L", "mg/dL", 18.016, 5.5, 1.2),
+    "Cholesterol": ("mmol/L", "mg/dL", 38.67, 5.0, 0.9),
+    "Creatinine": ("umol/L", "mg/dL", 1.0 / 88.42, 80.0, 20.0),
+    "Hemoglobin": ("g/L", "g/dL", 0.1, 140.0, 15.0),
+    "WBC": ("10^9/L", "10^3/uL", 1.0, 7.0, 2.0),
+}
+SEXES = ["M", "F", "Other", "Unknown"]
+START = np.datetime64("2023-01-01T00:00:00", "s")
+
+
+def _source_columns(mapping: Dict[str, Any]) -> Dict[str, tuple]:
+    """Source column -> (table, canonical field, field spec) for a mapping."""
+    out: Dict[str, tuple] = {}
+    for table, fields in mapping.get("mappings", {}).items():
+        for canon, src in fields.items():
+            col = src.get("column") if isinstance(src, dict) else src
+            if col is not None and col not in out:
+                out[col] = (table, canon, src if isinstance(src, dict) else {})
+    return out
+
+
+def _patients(ids: np.ndarray) -> np.ndarray:
+    return np.char.add("p", ids.astype(str))
+
+
+def _block(
+    mapping: Dict[str, Any],
+    start: int,
+    n: int,
+    rng: np.random.Generator,
+    n_patients: int,
+    cardinality: int,
+    extra_columns: int,
+    timestamps_as_text: bool,
+) -> pd.DataFrame:
+    """Rows start..start+n of the synthetic source (before nulls are applied)."""
+    patient = rng.integers(0, n_patients, n)
+    # one measurement a minute on average, in row order like an append-only feed
+    seconds = (np.arange(start, start + n) * 60 + rng.integers(0, 60, n)).astype(
+        "timedelta64[s]"
+    )
+    ts = START + seconds
+    names = list(LAB_TESTS)
+    spec = list(LAB_TESTS.values())
+    test_idx = rng.integers(0, len(names), n)
+    tests = np.array(names)[test_idx]
+    alt_unit = rng.random(n) < 0.5
+    canonical = rng.normal(
+        np.array([s[3] for s in spec])[test_idx],
+        np.array([s[4] for s in spec])[test_idx],
+    )
+    scale = np.array([s[2] for s in spec])[test_idx]
+    units = np.where(
+        alt_unit,
+        np.array([s[1] for s in spec])[test_idx],
+        np.array([s[0] for s in spec])[test_idx],
+    )
+
+    def timestamp(offset_minutes: int = 0):
+        values = ts + np.timedelta64(offset_minutes, "m")
+        if timestamps_as_text:
+            return np.char.add(np.datetime_as_string(values, unit="s"), "Z")
+        return pd.DatetimeIndex(values).tz_localize("UTC")
+
+    def temperature(unit: Optional[str]):
+        c = rng.normal(36.9, 0.5, n)
+        if unit and unit.lower() == "f":
+            return np.round(c * 9 / 5 + 32, 1)
+        if unit and unit.lower() == "k":
+            return np.round(c + 273.15, 2)
+        return np.round(c, 1)
+
+    generators: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+        "patient_id": lambda s: _patients(patient),
+        "birth_date": lambda s: np.datetime_as_string(
+            np.datetime64("1930-01-01")
+            + (patient * 7919 % 27000).astype("timedelta64[D]"),
+            unit="D",
+        ),
+        "sex": lambda s: np.array(SEXES)[patient % len(SEXES)],
+        "zip_code": lambda s: np.char.zfill((patient % cardinality).astype(str), 5),
+        "race": lambda s: np.char.add("race_", (patient % cardinality).astype(str)),
+        "ethnicity": lambda s: np.char.add("eth_", (patient % 5).astype(str)),
+        "timestamp": lambda s: timestamp(),
+        "heart_rate": lambda s: np.round(rng.normal(75, 12, n)),
+        "systolic_bp": lambda s: np.round(rng.normal(122, 15, n)),
+        "diastolic_bp": lambda s: np.round(rng.normal(79, 9, n)),
+        "respiratory_rate": lambda s: np.round(rng.normal(16, 3, n)),
+        "temperature": lambda s: temperature(s.get("unit")),
+        "test_name": lambda s: tests,
+        "value": lambda s: np.round(
+            np.where(alt_unit, canonical * scale, canonical), 2
+        ),
+        "unit": lambda s: units,
+        "loinc_code": lambda s: np.char.add("LOINC-", test_idx.astype(str)),
+        "reference_range": lambda s: np.full(n, "see lab"),
+    }
+
+    data: Dict[str, Any] = {}
+    for col, (table, canon, field) in _source_columns(mapping).items():
+        if table == "labs" and canon == "timestamp":
+            data[col] = timestamp(offset_minutes=30)
+            continue
+        make = generators.get(canon)
+        data[col] = (
+            make(field)
+            if make is not None
+            else np.char.add(f"{canon}_", rng.integers(0, cardinality, n).astype(str))
+        )
+    for i in range(extra_columns):
+        # unmapped payload columns widen the file without being read
+        if i % 2:
+            data[f"extra_{i}"] = np.char.add(
+                "c", rng.integers(0, cardinality, n).astype(str)
+            )
+        else:
+            data[f"extra_{i}"] = rng.normal(0, 1, n)
+    return pd.DataFrame(data)
+
+
+def _apply_nulls(
+    df: pd.DataFrame, null_rate: float, keep: List[str], rng: np.random.Generator
+) -> pd.DataFrame:
+    if null_rate <= 0:
+        return df
+    for col in df.columns:
+        if col in keep:
+            continue
+        df[col] = df[col].mask(rng.random(len(df)) < null_rate)
+    return df
+
+
+def generate_source(
+    mapping: Dict[str, Any],
+    path: Path,
+    rows: int,
+    fmt: Optional[str] = None,
+    null_rate: float = 0.02,
+    n_patients: Optional[int] = None,
+    cardinality: int = 100,
+    extra_columns: int = 0,
+    seed: int = 0,
+    block_rows: int = 500_000,
+) -> Path:
+    """Write `rows` synthetic source rows for mapping to path.
+
+    fmt defaults to the mapping's source format. null_rate applies to every
+    column except the patient id; cardinality bounds zip codes, race and the
+    unmapped categorical extras; extra_columns adds unmapped payload columns
+    to make the source wider. n_patients defaults to one per 50 rows.
+    """
+    fmt = fmt or mapping.get("source", {}).get("format", "csv")
+    if fmt not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported format: {fmt}")
+    if rows < 1:
+        raise ValueError("rows must be at least 1")
+    n_patients = n_patients or max(1, rows // 50)
+    keep = [
+        col
+        for col, (_, canon, _) in _source_columns(mapping).items()
+        if canon == "patient_id"
+    ]
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    writer = None
+    try:
+        for start in range(0, rows, block_rows):
+            n = min(block_rows, rows - start)
+            df = _block(
+                mapping,
+                start,
+                n,
+                rng,
+                n_patients,
+                cardinality,
+                extra_columns,
+                timestamps_as_text=fmt == "csv",
+            )
+            df = _apply_nulls(df, null_rate, keep, rng)
+            if fmt == "csv":
+                df.to_csv(
+                    tmp, mode="w" if start == 0 else "a", header=start == 0, index=False
+                )
+                continue
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    tmp.replace(path)
+    return path
+
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Write a synthetic source for a mapping")
+    p.add_argument("--mapping", "-m", required=True, help="Mapping YAML")
+    p.add_argument("--out", "-o", required=True, help="Output file")
+    p.add_argument("--rows", "-n", type=int, default=100_000)
+    p.add_argument("--format", choices=["csv", "parquet"], default=None)
+    p.add_argument("--null-rate", type=float, default=0.02)
+    p.add_argument("--patients", type=int, default=None)
+    p.add_argument("--cardinality", type=int, default=100)
+    p.add_argument("--extra-columns", type=int, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args(argv)
+
+    path = generate_source(
+        load_mapping(Path(args.mapping)),
+        Path(args.out),
+        args.rows,
+        fmt=args.format,
+        null_rate=args.null_rate,
+        n_patients=args.patients,
+        cardinality=args.cardinality,
+        extra_columns=args.extra_columns,
+        seed=args.seed,
+    )
+    print(f"Wrote {args.rows} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,16 @@
-import io
+import json
 import os
-import shlex
-import subprocess
-
-# ...existing code...
-import threading
-import time
-import zipfile
 from pathlib import Path
 
 import streamlit as st
 import yaml
 
-# ...existing code...
+from pipeline import jobs
+
+# runs executing at once; more are queued
+MAX_RUNS = jobs.MAX_WORKERS
+# seconds between redraws of a running job's log
+REFRESH_SECONDS = 1.0
 
 
 def list_mappings():
@@ -77,92 +75,145 @@ def prepare_mapping_for_uploaded_file(
     return out_path
 
 
+def stage_timings(std_dir):
+    """Per-stage rows from the run metrics named in artifacts_index.json."""
+    index_path = Path(std_dir) / "artifacts_index.json"
+    if not index_path.exists():
+        return []
+    index = yaml.safe_load(index_path.read_text(encoding="utf-8")) or {}
+    metrics_path = Path(std_dir) / index.get("run_metrics", "")
+    if not index.get("run_metrics") or not metrics_path.exists():
+        return []
+    metrics = json.loads(metrics_path.read_text(encoding="utf-8"))
+    keys = ("stage", "table", "wall_s", "cpu_s", "rows_in", "rows_out", "peak_rss_mb")
+    return [{k: e.get(k) for k in keys} for e in metrics.get("stages", [])]
+
+
+def _show_job(placeholder, job):
+    status = jobs.job_status(job)
+    text = status["log"]
+    if status["status"] == "done":
+        text += "\nPipeline finished. Check the work directory for outputs."
+    elif status["status"] == "cancelled":
+        text += "\n[Run cancelled by user]"
+    elif status["error"]:
+        text += f"\nPipeline failed: {status['error']}"
+    try:
+        placeholder.text_area("Logs", value=text, height=300)
+    except Exception:
+        placeholder.text(text)
+
+
+def _run_blocking(job, status_placeholder, control):
+    control["proc"] = job
+    status_placeholder.text_area("Logs", value="Starting pipeline...\n", height=300)
+    update = jobs.throttled(lambda j: _show_job(status_placeholder, j), REFRESH_SECONDS)
+    jobs.run_job(job, update)
+    control["proc"] = None
+    return job
+
+
 def run_pipeline_subprocess(
     mapping_path, work_dir, s3_bucket, s3_prefix, status_placeholder, control
 ):
-    # Use a scrollable text area for logs via the placeholder
-    status_placeholder.text_area(
-        "Logs", value="Starting pipeline subprocess...\n", height=300
+    """Run the pipeline CLI in a subprocess, streaming its log to the placeholder.
+
+    The log keeps the last jobs.LOG_LINES lines and is redrawn at most every
+    REFRESH_SECONDS; the full log is written to work_dir/logs.
+    """
+    job = jobs.new_job(mapping_path, work_dir, s3_bucket, s3_prefix)
+    return _run_blocking(job, status_placeholder, control)
+
+
+# worker process kept between UI runs when "warm worker" is enabled
+_warm_worker = jobs.warm_worker
+
+
+def run_pipeline_warm(
+    mapping_path, work_dir, s3_bucket, s3_prefix, status_placeholder, control
+):
+    """Like run_pipeline_subprocess, but runs the job in a long-lived worker.
+
+    The worker (pipeline.worker) is started on first use and reused, so later
+    runs skip interpreter start-up and library imports.
+    """
+    job = jobs.new_job(mapping_path, work_dir, s3_bucket, s3_prefix, warm=True)
+    return _run_blocking(job, status_placeholder, control)
+
+
+def show_artifacts(work_dir):
+    std_dir = Path(work_dir) / "standardized"
+    art_path = std_dir / "artifacts_index.json"
+    if art_path.exists():
+        data = yaml.safe_load(art_path.read_text(encoding="utf-8"))
+        st.markdown("**Artifacts index**")
+        # per-table artifacts live under "tables"; list them flat
+        items = [(k, v) for k, v in data.items() if k != "tables"]
+        for table, names in (data.get("tables") or {}).items():
+            items.extend((f"{table}.{k}", v) for k, v in names.items())
+        for k, v in items:
+            p = (std_dir / v).absolute()
+            st.markdown(f"- **{k}**: [{v}]({p.as_uri()})")
+    timings = stage_timings(std_dir)
+    if timings:
+        st.markdown("**Stage timings**")
+        st.table(timings)
+
+
+def download_button(work_dir, key):
+    """A button to download a ZIP of the run's archived artifacts.
+
+    The ZIP is built on disk once per artifact manifest (export_zip) and
+    read only when the button is clicked.
+    """
+    from pipeline.artifacts import export_zip
+
+    std_dir = Path(work_dir) / "standardized"
+    index_path = std_dir / "artifacts_index.json"
+    if not index_path.exists():
+        return
+    checksum = json.loads(index_path.read_text(encoding="utf-8"))["mapping_checksum"]
+    path = export_zip(std_dir, checksum)
+    if path is None:
+        return
+    st.download_button(
+        "Download standardized artifacts (ZIP)",
+        data=path.read_bytes,
+        file_name="standardized_artifacts.zip",
+        mime="application/zip",
+        key=key,
     )
-    cmd = [
-        shlex.quote("python"),
-        "-u",
-        "-m",
-        "pipeline.cli",
-    ]
-    if mapping_path:
-        cmd.extend(["--mapping", shlex.quote(str(mapping_path))])
-    if work_dir:
-        cmd.extend(["--work-dir", shlex.quote(str(work_dir))])
-    if s3_bucket:
-        cmd.extend(["--s3-bucket", shlex.quote(str(s3_bucket))])
-    if s3_prefix:
-        cmd.extend(["--s3-prefix", shlex.quote(str(s3_prefix))])
-
-    # join to a single shell command for Windows Powershell compatibility in Streamlit
-    shell_cmd = " ".join(cmd)
 
-    try:
-        # Start subprocess
-        proc = subprocess.Popen(
-            shell_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True
+
+def show_job(job):
+    status = jobs.job_status(job)
+    label = f"Run {status['id']}: {status['status']}"
+    if status["stage"]:
+        label += f" ({status['stages']} stages, last {status['stage']})"
+    if status["seconds"] is not None:
+        label += f" - {status['seconds']}s"
+    with st.expander(label, expanded=not job["done"].is_set()):
+        st.caption(
+            f"mapping: {status['mapping'] or '(synthetic)'}; "
+            f"outputs: {status['work_dir']}"
         )
-        control["proc"] = proc
-        # read lines and append to a buffer
-        buf = []
-        # prepare log file
-        logs_dir = Path(work_dir) / "logs"
-        logs_dir.mkdir(parents=True, exist_ok=True)
-        log_file = logs_dir / f"run_{int(time.time())}.log"
-        lf = open(log_file, "w", encoding="utf-8")
-        for raw in proc.stdout:
-            if control.get("cancel"):
-                proc.terminate()
-                buf.append("\n[Run cancelled by user]\n")
-                break
-            line = raw.decode("utf-8")
-            # write to log file
-            try:
-                lf.write(line)
-                lf.flush()
-            except Exception:
-                pass
-            buf.append(line)
-            # show last ~1000 chars to keep UI responsive
-            text = "".join(buf[-200:])
-            try:
-                # replace the text area contents
-                status_placeholder.text_area("Logs", value=text, height=300)
-            except Exception:
-                status_placeholder.text(line)
-        proc.wait()
-        try:
-            lf.close()
-        except Exception:
-            pass
-        if not control.get("cancel"):
-            # append finished message
-            try:
-                current = "".join(buf[-200:])
-                status_placeholder.text_area(
-                    "Logs",
-                    value=current
-                    + "\nPipeline finished. Check the work directory for outputs.",
-                    height=300,
-                )
-                # surface latest log file link in the UI
-                try:
-                    st.markdown("**Latest run log**")
-                    st.markdown(f"- [{log_file.name}]({log_file.absolute().as_uri()})")
-                except Exception:
-                    pass
-            except Exception:
-                status_placeholder.text(
-                    "Pipeline finished. Check the work directory for outputs."
-                )
-        control["proc"] = None
-    except Exception as e:
-        status_placeholder.text(f"Pipeline failed to start: {e}")
+        st.code(status["log"] or "(waiting)", language=None)
+        if status["error"]:
+            st.error(status["error"])
+        if not job["done"].is_set():
+            if st.button("Cancel run", key=f"cancel_{status['id']}"):
+                jobs.cancel_job(job)
+        elif status["status"] == "done":
+            if status["log_file"]:
+                uri = Path(status["log_file"]).absolute().as_uri()
+                st.markdown(f"Run log: [{Path(status['log_file']).name}]({uri})")
+            show_artifacts(status["work_dir"])
+            download_button(status["work_dir"], key=f"zip_{status['id']}")
+
+
+def show_jobs(queue):
+    for job in reversed(jobs.list_jobs(queue)):
+        show_job(job)
 
 
 def main():
@@ -172,6 +223,9 @@ def main():
     default_work = os.path.join(os.getcwd(), "pipeline_ui_runs")
     work_dir = st.sidebar.text_input("Work directory", value=default_work)
     os.makedirs(work_dir, exist_ok=True)
+    use_warm = st.sidebar.checkbox(
+        "Keep a warm worker between runs (faster repeated runs)", value=False
+    )
 
     st.sidebar.markdown("---")
     uploaded = st.file_uploader(
@@ -188,14 +242,12 @@ def main():
     )
 
     status = st.empty()
+    s3_bucket = st.sidebar.text_input("S3 bucket (optional)")
+    s3_prefix = st.sidebar.text_input("S3 prefix (optional)")
+    # lives in pipeline.jobs, so it outlives the script reruns of every session
+    queue = jobs.shared_queue(MAX_RUNS)
 
-    # use session state to prevent concurrent runs
-    if "running" not in st.session_state:
-        st.session_state["running"] = False
-
-    run_btn = st.button("Run pipeline", disabled=st.session_state["running"])
-    if run_btn:
-        st.session_state["running"] = True
+    if st.button("Run pipeline"):
         # Save upload
         uploaded_path = None
         if uploaded is not None:
@@ -221,103 +273,27 @@ def main():
             mapping_to_use = None
             status.text("No mapping selected; the demo will create synthetic input.")
 
-        s3_bucket = st.sidebar.text_input("S3 bucket (optional)")
-        s3_prefix = st.sidebar.text_input("S3 prefix (optional)")
-
-        # control dict shared between main thread and worker
-        control = {"proc": None, "cancel": False}
-
-        # Run the pipeline as a subprocess and stream stdout to the UI
-        thread = threading.Thread(
-            target=run_pipeline_subprocess,
-            args=(
-                mapping_to_use,
-                work_dir,
-                s3_bucket or None,
-                s3_prefix or "",
-                status,
-                control,
-            ),
+        # queued; runs when one of the MAX_RUNS pool workers is free, in its
+        # own run_<ts>_<id> directory under work_dir (shown with the run)
+        jobs.submit_job(
+            queue,
+            mapping_to_use,
+            work_dir,
+            s3_bucket or None,
+            s3_prefix or "",
+            warm=use_warm,
+            own_dir=True,
         )
-        thread.start()
-
-        # Add a cancel button
-        if st.button("Cancel run"):
-            control["cancel"] = True
-            # attempt graceful terminate then force kill
-            p = control.get("proc")
-            if p is not None:
-                try:
-                    p.terminate()
-
-                    # wait a short time for process to exit
-                    def _killer(proc):
-                        try:
-                            proc.wait(timeout=2)
-                        except Exception:
-                            try:
-                                proc.kill()
-                            except Exception:
-                                pass
-
-                    threading.Thread(target=_killer, args=(p,), daemon=True).start()
-                except Exception:
-                    try:
-                        p.kill()
-                    except Exception:
-                        pass
-
-        # After the run finishes (not cancelled) try to show artifacts index
-        def show_artifacts():
-            try:
-                art_path = Path(work_dir) / "standardized" / "artifacts_index.json"
-                if art_path.exists():
-                    data = yaml.safe_load(art_path.read_text(encoding="utf-8"))
-                    st.markdown("**Artifacts index**")
-                    for k, v in data.items():
-                        p = (Path(work_dir) / "standardized" / v).absolute()
-                        try:
-                            uri = p.as_uri()
-                            st.markdown(f"- **{k}**: [{v}]({uri})")
-                        except Exception:
-                            st.markdown(f"- **{k}**: {p}")
-            except Exception:
-                pass
-
-        # run a lightweight waiter thread that calls show_artifacts when the
-        # subprocess clears
-        def waiter():
-            while control.get("proc") is not None:
-                time.sleep(0.5)
-            if not control.get("cancel"):
-                show_artifacts()
-
-        def waiter_clear():
-            while control.get("proc") is not None:
-                time.sleep(0.5)
-            st.session_state["running"] = False
-            if not control.get("cancel"):
-                show_artifacts()
-
-        threading.Thread(target=waiter_clear, daemon=True).start()
-
-        # Provide a button to create and download a ZIP of the standardized outputs
-        try:
-            std_dir = Path(work_dir) / "standardized"
-            if std_dir.exists():
-                zip_buf = io.BytesIO()
-                with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-                    for p in std_dir.rglob("*"):
-                        if p.is_file():
-                            zf.write(p, arcname=p.relative_to(std_dir))
-                zip_buf.seek(0)
-                st.download_button(
-                    "Download standardized artifacts (ZIP)",
-                    data=zip_buf,
-                    file_name="standardized_artifacts.zip",
-                )
-        except Exception:
-            pass
+
+    st.markdown("---")
+    st.subheader("Runs")
+    # redraw only the runs list, every REFRESH_SECONDS, while the page is open
+    fragment = getattr(st, "fragment", None)
+    if fragment is not None:
+        fragment(run_every=REFRESH_SECONDS)(show_jobs)(queue)
+    else:
+        st.button("Refresh")
+        show_jobs(queue)
 
 
 if __name__ == "__main__":
@@ -1,29 +1,420 @@
 import json
+import os
+import tempfile
+import typing
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
-from pipeline.models import Vitals
+from pipeline.ingest import (
+    _writer_options,
+    append_parquet,
+    iter_parquet,
+    load_schema,
+    parquet_options,
+    read_parquet_rows,
+    write_parquet_batches,
+)
+from pipeline.io_executor import submit_or_run
+from pipeline.models import TABLE_MODELS
 
+ENGINES = ("columnar", "pydantic")
+# default for validate_table(workers=...); pipeline.cli --validate-workers
+VALIDATE_WORKERS_ENV = "PIPELINE_VALIDATE_WORKERS"
 
-def validate_vitals(
-    parquet_path: Path, out_dir: Path, report_prefix: str = "validation_report"
-) -> None:
-    df = pd.read_parquet(parquet_path)
+# invalid rows kept (with their data) in the JSON report; every failing cell
+# is written to the <report_prefix>_errors.parquet error file instead
+ERROR_SAMPLE = 100
+ERROR_SCHEMA = pa.schema(
+    [("index", pa.int64()), ("field", pa.string()), ("code", pa.string())]
+)
+# input rows whose error cells are built and written at a time
+CELL_SLICE_ROWS = 64 * 1024
+
+# messages mirror the pydantic error types so both engines read the same
+ERROR_MESSAGES = {
+    "missing": "Field required",
+    "string_type": "Input should be a valid string",
+    "float_parsing": "Input should be a valid number",
+    "datetime_parsing": "Input should be a valid datetime",
+    "date_parsing": "Input should be a valid date",
+    "enum": "Input should be one of the allowed values",
+    "greater_than_equal": "Input should be greater than or equal to the minimum",
+    "less_than_equal": "Input should be less than or equal to the maximum",
+}
+
+
+def _field_kind(annotation: Any) -> Tuple[str, bool]:
+    """Return (kind, nullable) for a pydantic field annotation."""
+    nullable = False
+    if typing.get_origin(annotation) is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        nullable = len(args) < len(typing.get_args(annotation))
+        annotation = args[0] if len(args) == 1 else Any
+    if annotation is str:
+        return "string", nullable
+    if annotation in (int, float):
+        return "numeric", nullable
+    if annotation is datetime:
+        return "datetime", nullable
+    if annotation is date:
+        return "date", nullable
+    return "any", nullable
+
+
+def build_rules(
+    model: Type[BaseModel], schema_section: Optional[Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Derive per-field validation rules from a model and its schema section.
+
+    Required/nullable flags and types come from the pydantic model; numeric
+    bounds come from Field(ge=/le=) metadata or schema `min`/`max` keys, and
+    allowed values from the schema `allowed` key.
+    """
+    schema_section = schema_section or {}
+    rules: Dict[str, Dict[str, Any]] = {}
+    for name, field in model.model_fields.items():
+        kind, nullable = _field_kind(field.annotation)
+        meta = schema_section.get(name) or {}
+        rule = {
+            "kind": kind,
+            "required": field.is_required(),
+            "nullable": nullable,
+            "allowed": meta.get("allowed"),
+            "min": meta.get("min"),
+            "max": meta.get("max"),
+        }
+        for m in field.metadata:
+            if getattr(m, "ge", None) is not None:
+                rule["min"] = m.ge
+            if getattr(m, "le", None) is not None:
+                rule["max"] = m.le
+        rules[name] = rule
+    return rules
+
+
+def _is_null(value: Any) -> bool:
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _format_error(field: str, code: str) -> str:
+    return f"{field}\n  {ERROR_MESSAGES.get(code, code)} [type={code}]"
+
+
+def _schema_errors(value: Any, rule: Dict[str, Any]) -> Optional[str]:
+    """Row-wise check of the schema-only rules (allowed values, ranges)."""
+    if _is_null(value):
+        return None
+    if rule["allowed"] is not None and value not in rule["allowed"]:
+        return "enum"
+    if rule["min"] is not None and value < rule["min"]:
+        return "greater_than_equal"
+    if rule["max"] is not None and value > rule["max"]:
+        return "less_than_equal"
+    return None
+
+
+def _column_errors(
+    s: pd.Series, rule: Dict[str, Any]
+) -> Tuple[pd.Series, str, pd.Series]:
+    """Check one column at once.
+
+    Returns (error_mask, error_code, coerced_values).
+    """
+    null = s.isna()
+    allow_null = null if rule["nullable"] else pd.Series(False, index=s.index)
+    kind = rule["kind"]
+    if kind == "string":
+        # pydantic does not coerce numbers to str; only real strings pass
+        if isinstance(s.dtype, pd.StringDtype) or pd.api.types.infer_dtype(
+            s, skipna=True
+        ) in ("string", "empty"):
+            is_str = ~null
+        else:
+            is_str = s.map(lambda x: isinstance(x, str)).astype(bool)
+        return ~is_str & ~allow_null, "string_type", s
+    if kind == "numeric":
+        if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(
+            s.dtype
+        ):
+            # already numeric: keep compact storage dtypes (float32, Int16)
+            coerced = s
+        else:
+            coerced = pd.to_numeric(s, errors="coerce").astype("float64")
+        bad = coerced.isna() & ~allow_null
+        return bad, "float_parsing", coerced
+    if kind in ("datetime", "date"):
+        if pd.api.types.is_datetime64_any_dtype(s.dtype):
+            coerced = s
+        else:
+            coerced = pd.to_datetime(s, errors="coerce", format="ISO8601", utc=True)
+        bad = coerced.isna() & ~allow_null
+        if kind == "date":
+            bad |= coerced.notna() & (coerced != coerced.dt.normalize())
+        return bad, f"{kind}_parsing", coerced
+    return pd.Series(False, index=s.index), "", s
+
+
+def _field_masks(
+    s: pd.Series, rule: Dict[str, Any]
+) -> Tuple[np.ndarray, np.ndarray, pd.Series]:
+    """Return (error mask, per-row error codes, coerced values) for a column."""
+    bad, code, coerced = _column_errors(s, rule)
+    masks = [(bad.to_numpy(dtype=bool), code)]
+    if rule["allowed"] is not None:
+        out = coerced.notna() & ~coerced.isin(rule["allowed"])
+        masks.append((out.to_numpy(dtype=bool), "enum"))
+    if rule["min"] is not None:
+        out = coerced.notna() & (coerced < rule["min"])
+        masks.append((out.to_numpy(dtype=bool), "greater_than_equal"))
+    if rule["max"] is not None:
+        out = coerced.notna() & (coerced > rule["max"])
+        masks.append((out.to_numpy(dtype=bool), "less_than_equal"))
+    mask = np.logical_or.reduce([m for m, _ in masks])
+    # report the first failing check per cell
+    codes = np.select([m for m, _ in masks], [c for _, c in masks], "")
+    return mask, codes, coerced
+
+
+def _error_records(
+    df: pd.DataFrame,
+    field_errors: Dict[str, Tuple[np.ndarray, np.ndarray]],
+    invalid: np.ndarray,
+    model_name: str,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    errors: List[dict] = []
+    positions = np.flatnonzero(invalid)[:limit]
+    rows = df.iloc[positions].to_dict("records")
+    for pos, data in zip(positions, rows, strict=True):
+        msgs = [
+            _format_error(name, codes[pos])
+            for name, (mask, codes) in field_errors.items()
+            if mask[pos]
+        ]
+        header = f"{len(msgs)} validation error{'s' if len(msgs) > 1 else ''}"
+        errors.append(
+            {
+                "index": int(df.index[pos]),
+                "error": f"{header} for {model_name}\n" + "\n".join(msgs),
+                "row": data,
+            }
+        )
+    return errors
+
+
+def _error_cells(index: Any, fields: Any, codes: Any) -> pa.Table:
+    return pa.table(
+        {
+            "index": pa.array(index, pa.int64()),
+            "field": pa.array(fields, pa.string()),
+            "code": pa.array(codes, pa.string()),
+        },
+        schema=ERROR_SCHEMA,
+    )
+
+
+def _mask_cells(
+    index: np.ndarray, field_errors: Dict[str, Tuple[np.ndarray, np.ndarray]]
+) -> Iterator[pa.Table]:
+    """One (index, field, code) row per failing cell, in row order.
+
+    Built as Arrow tables CELL_SLICE_ROWS input rows at a time, so however
+    many cells fail only one slice of them is in memory while it is written.
+    """
+    for start in range(0, len(index), CELL_SLICE_ROWS):
+        stop = start + CELL_SLICE_ROWS
+        parts = []
+        for name, (mask, codes) in field_errors.items():
+            pos = start + np.flatnonzero(mask[start:stop])
+            if len(pos):
+                field = pa.repeat(pa.scalar(name, pa.string()), len(pos))
+                parts.append(_error_cells(index[pos], field, codes[pos]))
+        if parts:
+            # a stable sort keeps the fields of one row in rule order
+            yield pa.concat_tables(parts).sort_by("index")
+
+
+def _cell_counts(
+    field_errors: Dict[str, Tuple[np.ndarray, np.ndarray]],
+) -> Dict[str, Dict[str, int]]:
+    """Failing cells per field and code."""
+    counts: Dict[str, Dict[str, int]] = {}
+    for name, (mask, codes) in field_errors.items():
+        found, n = np.unique(codes[mask], return_counts=True)
+        counts[name] = {str(c): int(k) for c, k in zip(found, n, strict=True)}
+    return counts
+
+
+def _columnar_validate(
+    df: pd.DataFrame,
+    rules: Dict[str, Dict[str, Any]],
+    model_name: str,
+    limit: Optional[int] = None,
+) -> Tuple[pd.DataFrame, List[dict], Dict[str, Any], int]:
+    """Validate a whole frame with boolean masks, one column at a time.
+
+    Returns (valid rows, records of the first `limit` invalid rows, error
+    cells, number of invalid rows); see _validate for the error cells.
+    """
+    n = len(df)
+    field_errors: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    valid_cols: Dict[str, pd.Series] = {}
+
+    for name, rule in rules.items():
+        if name in df.columns:
+            mask, codes, valid_cols[name] = _field_masks(df[name], rule)
+            if mask.any():
+                field_errors[name] = (mask, codes)
+        elif rule["required"]:
+            field_errors[name] = (np.ones(n, dtype=bool), np.full(n, "missing"))
+        else:
+            valid_cols[name] = pd.Series([None] * n, index=df.index, dtype=object)
+
+    invalid = np.zeros(n, dtype=bool)
+    for mask, _ in field_errors.values():
+        invalid |= mask
+
+    errors = _error_records(df, field_errors, invalid, model_name, limit)
+    valid = pd.DataFrame(
+        {name: col[~invalid] for name, col in valid_cols.items()}
+    ).reset_index(drop=True)
+    cells = {
+        "counts": _cell_counts(field_errors),
+        "tables": _mask_cells(df.index.to_numpy(), field_errors),
+    }
+    return valid, errors, cells, int(invalid.sum())
+
+
+@lru_cache(maxsize=None)
+def _field_adapter(model: Type[BaseModel], name: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[name].annotation)
+
+
+def _field_value(model: Type[BaseModel], name: str, value: Any) -> Any:
+    # one field validated on its own, for a row whose model failed elsewhere
+    if name not in model.model_fields:
+        return None
+    try:
+        return _field_adapter(model, name).validate_python(value)
+    except ValidationError:
+        return None
+
+
+def _row_failures(
+    model: Type[BaseModel], data: Dict[str, Any], rules: Dict[str, Dict[str, Any]]
+) -> Tuple[Optional[dict], List[Tuple[str, str]], Optional[ValidationError]]:
+    """(validated row or None, failing (field, code) pairs, model error).
+
+    Fields the model accepts are checked against the schema rules too, also
+    when other fields fail the model, so every failing field is reported.
+    """
+    try:
+        values, model_error, failed = model(**data).model_dump(), None, []
+    except ValidationError as e:
+        model_error = e
+        failed = [(".".join(map(str, err["loc"])), err["type"]) for err in e.errors()]
+        bad = {name for name, _ in failed}
+        values = {
+            name: _field_value(model, name, data.get(name))
+            for name in rules
+            if name not in bad
+        }
+    failed += [
+        (name, code)
+        for name, rule in rules.items()
+        if name in values
+        for code in [_schema_errors(values[name], rule)]
+        if code
+    ]
+    return (None if failed else values), failed, model_error
+
+
+def _pydantic_validate(
+    df: pd.DataFrame, model: Type[BaseModel], rules: Dict[str, Dict[str, Any]]
+) -> Tuple[pd.DataFrame, List[dict]]:
+    """Reference implementation: build one model instance per row.
+
+    Each error record also lists its failing (field, code) pairs: every
+    field that fails the model or a schema rule, as the columnar engine
+    reports them.
+    """
     errors: List[dict] = []
     valid_rows = []
 
     for i, row in df.iterrows():
         data = row.to_dict()
-        try:
-            v = Vitals(**data)
-            valid_rows.append(v.dict())
-        except Exception as e:
-            errors.append({"index": int(i), "error": str(e), "row": data})
+        # pandas fills gaps with NaN/NaT; hand them to the model as None so
+        # Optional fields accept them and required ones reject them
+        clean = {k: (None if _is_null(x) else x) for k, x in data.items()}
+        values, failed, model_error = _row_failures(model, clean, rules)
+        if not failed:
+            valid_rows.append(values)
+            continue
+        if model_error is not None and len(failed) == model_error.error_count():
+            message = str(model_error)
+        else:
+            header = f"{len(failed)} validation error{'s' if len(failed) > 1 else ''}"
+            message = f"{header} for {model.__name__}\n" + "\n".join(
+                _format_error(name, code) for name, code in failed
+            )
+        errors.append(
+            {"index": int(i), "error": message, "row": data, "fields": failed}
+        )
+    return pd.DataFrame(valid_rows), errors
 
-    out_dir.mkdir(parents=True, exist_ok=True)
 
+def _validate(
+    df: pd.DataFrame,
+    model: Type[BaseModel],
+    schema_section: Optional[Dict[str, Any]],
+    engine: str,
+    limit: Optional[int] = None,
+) -> Tuple[pd.DataFrame, List[dict], Dict[str, Any], int]:
+    """(valid rows, first `limit` error records, error cells, invalid count).
+
+    The error cells are {"counts": {field: {code: n}}, "tables": an iterator
+    of ERROR_SCHEMA tables in row order}; the tables are built as they are
+    consumed, and can be consumed once.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported validation engine: {engine}")
+    rules = build_rules(model, schema_section)
+    if engine == "columnar":
+        return _columnar_validate(df, rules, model.__name__, limit)
+    valid, errors = _pydantic_validate(df, model, rules)
+    pairs = [(e["index"], f, c) for e in errors for f, c in e.pop("fields")]
+    index, fields, codes = zip(*pairs, strict=True) if pairs else ((), (), ())
+    counts: Dict[str, Dict[str, int]] = {}
+    for field, code in zip(fields, codes, strict=True):
+        _merge_counts(counts, {field: {code: 1}})
+    cells = {"counts": counts, "tables": iter([_error_cells(index, fields, codes)])}
+    return valid, errors[:limit], cells, len(errors)
+
+
+def validate_frame(
+    df: pd.DataFrame,
+    model: Type[BaseModel],
+    schema_section: Optional[Dict[str, Any]] = None,
+    engine: str = "columnar",
+) -> Tuple[pd.DataFrame, List[dict]]:
+    """Split df into (valid rows, error records) using the chosen engine."""
+    valid, errors, _, _ = _validate(df, model, schema_section, engine)
+    return valid, errors
+
+
+def _serialize_errors(errors: List[dict]) -> None:
     # convert any pandas timestamps in errors to ISO strings
     def _serialize(obj):
         try:
@@ -37,26 +428,438 @@ def validate_vitals(
                 if hasattr(v, "isoformat"):
                     e["row"][k] = _serialize(v)
 
+
+def _merge_counts(
+    into: Dict[str, Dict[str, int]], counts: Dict[str, Dict[str, int]]
+) -> None:
+    for field, by_code in counts.items():
+        merged = into.setdefault(field, {})
+        for code, n in by_code.items():
+            merged[code] = merged.get(code, 0) + n
+
+
+def _add_errors(
+    summary: Dict[str, Any],
+    errors: List[dict],
+    counts: Dict[str, Dict[str, int]],
+    n_invalid: int,
+    sample_errors: int,
+) -> None:
+    """Fold one batch's errors and cell counts into the running report summary."""
+    summary["invalid"] += n_invalid
+    _merge_counts(summary["errors_by_field"], counts)
+    sample = errors[: max(0, sample_errors - len(summary["errors"]))]
+    _serialize_errors(sample)
+    summary["errors"].extend(sample)
+
+
+def _merge_summary(summary: Dict[str, Any], previous: Dict[str, Any], cap: int):
+    # an appended run's summary goes after the existing report's
+    summary["invalid"] += previous["invalid"]
+    merged = previous.get("errors_by_field", {})
+    _merge_counts(merged, summary["errors_by_field"])
+    summary["errors_by_field"] = merged
+    summary["errors"] = (previous["errors"] + summary["errors"])[:cap]
+
+
+def _validate_chunks(
+    parquet_path: Path,
+    valid_path: Path,
+    errors_path: Path,
+    model: Type[BaseModel],
+    schema_section: Dict[str, Any],
+    engine: str,
+    chunk_rows: int,
+    summary: Dict[str, Any],
+    sample_errors: int,
+) -> Tuple[int, int]:
+    """Validate batch by batch; returns (total rows, valid rows).
+
+    Error cells are written to errors_path as each batch is validated and
+    only the summary is kept, so memory does not grow with the errors.
+    """
+    total_rows = 0
+    writer_opts, _ = _writer_options(parquet_options())
+
+    with pq.ParquetWriter(errors_path, ERROR_SCHEMA, **writer_opts) as writer:
+
+        def _valid_batches():
+            nonlocal total_rows
+            for df in iter_parquet(parquet_path, chunk_rows):
+                limit = max(0, sample_errors - len(summary["errors"]))
+                valid, errs, cells, n_invalid = _validate(
+                    df, model, schema_section, engine, limit
+                )
+                for cell_slice in cells["tables"]:
+                    writer.write_table(cell_slice)
+                _add_errors(summary, errs, cells["counts"], n_invalid, sample_errors)
+                total_rows += len(df)
+                if len(valid):
+                    yield valid
+
+        n_valid = write_parquet_batches(_valid_batches(), valid_path)
+    return total_rows, n_valid
+
+
+def _row_group_parts(path: Path, parts: int) -> List[Tuple[List[int], int]]:
+    """Split a file's row groups into at most `parts` contiguous runs of
+    similar row counts; returns (row groups, first row) per run."""
+    meta = pq.ParquetFile(path).metadata
+    sizes = [meta.row_group(i).num_rows for i in range(meta.num_row_groups)]
+    target = sum(sizes) / max(1, parts)
+    runs: List[Tuple[List[int], int]] = []
+    pos = 0
+    for i, n in enumerate(sizes):
+        if not runs or sum(sizes[g] for g in runs[-1][0]) >= target:
+            runs.append(([], pos))
+        runs[-1][0].append(i)
+        pos += n
+    return runs
+
+
+def _validate_part(
+    path: Path,
+    groups: List[int],
+    offset: int,
+    table: str,
+    schema_section: Dict[str, Any],
+    engine: str,
+    chunk_rows: Optional[int],
+    limit: int,
+    part: Path,
+) -> Dict[str, Any]:
+    """Validate some row groups of path in a pool worker.
+
+    The worker memory-maps the file and reads only its row groups. Valid
+    rows and error cells go to <part>_valid.parquet and <part>_errors.parquet
+    so no frame is pickled back; the counts (rows, invalid rows, failing
+    cells per field and code) and first `limit` error records are returned.
+    """
+    model = TABLE_MODELS[table]
+    pf = pq.ParquetFile(path, memory_map=True)
+    batch_size = chunk_rows or sum(pf.metadata.row_group(g).num_rows for g in groups)
+    result: Dict[str, Any] = {"rows": 0, "invalid": 0, "errors": [], "counts": {}}
+    writer_opts, _ = _writer_options(parquet_options())
+    errors_path = part.with_name(part.name + "_errors.parquet")
+
+    with pq.ParquetWriter(errors_path, ERROR_SCHEMA, **writer_opts) as writer:
+
+        def _valid_batches():
+            for batch in pf.iter_batches(batch_size=batch_size, row_groups=groups):
+                df = batch.to_pandas()
+                start = offset + result["rows"]
+                df.index = pd.RangeIndex(start, start + len(df))
+                valid, errs, cells, n_invalid = _validate(
+                    df, model, schema_section, engine, limit - len(result["errors"])
+                )
+                for cell_slice in cells["tables"]:
+                    writer.write_table(cell_slice)
+                _merge_counts(result["counts"], cells["counts"])
+                result["errors"].extend(errs)
+                result["invalid"] += n_invalid
+                result["rows"] += len(df)
+                if len(valid):
+                    yield valid
+
+        valid_path = part.with_name(part.name + "_valid.parquet")
+        result["valid"] = write_parquet_batches(_valid_batches(), valid_path)
+    return result
+
+
+def _validate_parallel(
+    parquet_path: Path,
+    valid_path: Path,
+    errors_path: Path,
+    table: str,
+    schema_section: Dict[str, Any],
+    engine: str,
+    chunk_rows: Optional[int],
+    workers: int,
+    summary: Dict[str, Any],
+    sample_errors: int,
+) -> Tuple[int, int]:
+    """Validate row-group ranges in a process pool; returns (total, valid rows).
+
+    The per-range outputs are merged in file order, so the report, the
+    valid rows and the error cells match the serial path.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    runs = _row_group_parts(parquet_path, workers)
+    writer_opts, _ = _writer_options(parquet_options())
+    with tempfile.TemporaryDirectory(dir=valid_path.parent) as tmp:
+        parts = [Path(tmp) / f"part{i}" for i in range(len(runs))]
+        with ProcessPoolExecutor(max_workers=min(workers, len(runs))) as pool:
+            futures = [
+                pool.submit(
+                    _validate_part,
+                    parquet_path,
+                    groups,
+                    offset,
+                    table,
+                    schema_section,
+                    engine,
+                    chunk_rows,
+                    sample_errors,
+                    part,
+                )
+                for (groups, offset), part in zip(runs, parts, strict=True)
+            ]
+            results = [f.result() for f in futures]
+
+        # the workers counted their cells; the files are copied a slice at a
+        # time, in Arrow
+        with pq.ParquetWriter(errors_path, ERROR_SCHEMA, **writer_opts) as writer:
+            for part, result in zip(parts, results, strict=True):
+                cells = pq.ParquetFile(part.with_name(part.name + "_errors.parquet"))
+                for batch in cells.iter_batches(batch_size=CELL_SLICE_ROWS):
+                    writer.write_batch(batch)
+                _add_errors(
+                    summary,
+                    result["errors"],
+                    result["counts"],
+                    result["invalid"],
+                    sample_errors,
+                )
+
+        def _valid_parts():
+            for part, result in zip(parts, results, strict=True):
+                if result["valid"]:
+                    path = part.with_name(part.name + "_valid.parquet")
+                    yield from iter_parquet(path, chunk_rows or result["valid"])
+
+        n_valid = write_parquet_batches(_valid_parts(), valid_path)
+    return sum(r["rows"] for r in results), n_valid
+
+
+def validate_workers(workers: Optional[int] = None) -> int:
+    """workers, else PIPELINE_VALIDATE_WORKERS, else 1 (serial)."""
+    if workers is None:
+        workers = int(os.environ.get(VALIDATE_WORKERS_ENV) or 1)
+    return max(1, workers)
+
+
+def _pool_size(parquet_path: Path, workers: Optional[int], serial: bool) -> int:
+    # a range can't be smaller than a row group
+    if serial:
+        return 1
+    workers = validate_workers(workers)
+    if workers > 1:
+        workers = min(workers, pq.ParquetFile(parquet_path).num_row_groups)
+    return workers
+
+
+def _write_cells(cells: Iterable[pa.Table], errors_path: Path, append: bool) -> None:
+    """Write error cell slices to errors_path, after its rows with append.
+
+    Like append_parquet, the existing row groups are streamed into a new
+    file, which then replaces the old one.
+    """
+    writer_opts, _ = _writer_options(parquet_options())
+    previous = pq.ParquetFile(errors_path) if append and errors_path.exists() else None
+    tmp = errors_path.with_name(errors_path.name + ".tmp")
+    with pq.ParquetWriter(tmp, ERROR_SCHEMA, **writer_opts) as writer:
+        for i in range(previous.num_row_groups if previous else 0):
+            writer.write_table(previous.read_row_group(i).cast(ERROR_SCHEMA))
+        for cell_slice in cells:
+            writer.write_table(cell_slice)
+    os.replace(tmp, errors_path)
+
+
+def _save_outputs(
+    valid: pd.DataFrame,
+    cells: Iterable[pa.Table],
+    valid_path: Path,
+    errors_path: Path,
+    append: bool,
+) -> None:
+    _write_cells(cells, errors_path, append)
+    if len(valid) and append:
+        append_parquet(valid, valid_path)
+    elif len(valid):
+        valid.to_parquet(valid_path, index=False, **parquet_options())
+
+
+def _write_empty(
+    valid_path: Path, parquet_path: Path, frame: Union[pd.DataFrame, pa.Table, None]
+) -> None:
+    # an empty frame with the same columns as the input
+    if isinstance(frame, pd.DataFrame):
+        columns = list(frame.columns)
+    elif isinstance(frame, pa.Table):
+        columns = frame.column_names
+    else:
+        columns = pq.read_schema(parquet_path).names
+    pd.DataFrame(columns=columns).to_parquet(
+        valid_path, index=False, **parquet_options()
+    )
+
+
+def _input_rows(
+    parquet_path: Path, frame: Union[pd.DataFrame, pa.Table, None], from_row: int
+) -> pd.DataFrame:
+    """The rows to validate, indexed by their row position in the file."""
+    if frame is None:
+        return read_parquet_rows(parquet_path, from_row)
+    if isinstance(frame, pa.Table):
+        frame = frame.to_pandas()
+    # set_axis does not copy the data (copy-on-write)
+    return frame.set_axis(pd.RangeIndex(from_row, from_row + len(frame)))
+
+
+def validate_table(
+    parquet_path: Path,
+    out_dir: Path,
+    table: str,
+    report_prefix: str = "validation_report",
+    engine: str = "columnar",
+    schema_section: Optional[Dict[str, Any]] = None,
+    chunk_rows: Optional[int] = None,
+    from_row: int = 0,
+    append: bool = False,
+    sample_errors: int = ERROR_SAMPLE,
+    workers: Optional[int] = None,
+    frame: Union[pd.DataFrame, pa.Table, None] = None,
+    executor: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Validate a standardized table against its model and schema section.
+
+    Writes `<report_prefix>.json`, `<report_prefix>_valid.parquet` and
+    `<report_prefix>_errors.parquet` (one index/field/code row per failing
+    cell) and returns the report counts (input, total_rows, valid, invalid,
+    errors_by_field). The JSON report holds the error counts per field and
+    code plus the first sample_errors invalid rows, so its size is bounded
+    however many rows fail. With chunk_rows set the file is read and
+    validated one batch at a time; valid rows and error cells are written
+    batch by batch.
+
+    workers > 1 (default: the PIPELINE_VALIDATE_WORKERS environment variable)
+    validates ranges of row groups in a process pool. Each worker memory-maps
+    the file and reads only its range, and the outputs are merged in file
+    order, so they are the same as a serial run's. Incremental runs and files
+    with a single row group are validated serially.
+
+    frame (a DataFrame or Arrow table) holds the rows of parquet_path from
+    from_row on, already in memory: they are validated without reading the
+    file back, which may still be being written. chunk_rows and workers do
+    not apply then; to validate in parallel, pass no frame once the file is
+    written.
+
+    For incremental runs, from_row skips rows validated previously and
+    append merges the counts and sample into the existing report and appends
+    to the existing cleaned and error files.
+    """
+    if chunk_rows and (from_row or append):
+        raise ValueError("Incremental validation does not support chunk_rows")
+    if table not in TABLE_MODELS:
+        raise ValueError(f"No model registered for table: {table}")
+    model = TABLE_MODELS[table]
+    if schema_section is None:
+        schema_section = load_schema().get(table, {})
+    out_dir.mkdir(parents=True, exist_ok=True)
+    valid_path = out_dir / f"{report_prefix}_valid.parquet"
+    errors_path = out_dir / f"{report_prefix}_errors.parquet"
+    report_path = out_dir / f"{report_prefix}.json"
+    append = append and report_path.exists()
+    summary: Dict[str, Any] = {"invalid": 0, "errors_by_field": {}, "errors": []}
+    serial = bool(from_row or append) or frame is not None
+    workers = _pool_size(parquet_path, workers, serial)
+
+    if workers > 1:
+        total_rows, n_valid = _validate_parallel(
+            parquet_path,
+            valid_path,
+            errors_path,
+            table,
+            schema_section,
+            engine,
+            chunk_rows,
+            workers,
+            summary,
+            sample_errors,
+        )
+    elif chunk_rows and frame is None:
+        total_rows, n_valid = _validate_chunks(
+            parquet_path,
+            valid_path,
+            errors_path,
+            model,
+            schema_section,
+            engine,
+            chunk_rows,
+            summary,
+            sample_errors,
+        )
+    else:
+        df = _input_rows(parquet_path, frame, from_row)
+        total_rows = len(df)
+        valid, errors, cells, n_invalid = _validate(
+            df, model, schema_section, engine, sample_errors
+        )
+        _add_errors(summary, errors, cells["counts"], n_invalid, sample_errors)
+        n_valid = len(valid)
+        submit_or_run(
+            executor,
+            _save_outputs,
+            valid,
+            cells["tables"],
+            valid_path,
+            errors_path,
+            append,
+        )
+
+    if append:
+        previous = json.loads(report_path.read_text())
+        total_rows += previous["total_rows"]
+        n_valid += previous["valid"]
+        _merge_summary(summary, previous, sample_errors)
+
+    by_code: Dict[str, int] = {}
+    for code, n in chain.from_iterable(
+        c.items() for c in summary["errors_by_field"].values()
+    ):
+        by_code[code] = by_code.get(code, 0) + n
     report = {
         "input": str(parquet_path),
-        "total_rows": len(df),
-        "valid": len(valid_rows),
-        "invalid": len(errors),
-        "errors": errors,
+        "total_rows": total_rows,
+        "valid": n_valid,
+        "invalid": summary["invalid"],
+        "errors_by_field": summary["errors_by_field"],
+        "errors_by_code": by_code,
+        "errors_file": errors_path.name,
+        "errors_truncated": len(summary["errors"]) < summary["invalid"],
+        "errors": summary["errors"],
     }
 
-    report_path = out_dir / f"{report_prefix}.json"
-    report_path.write_text(json.dumps(report, indent=2))
+    submit_or_run(executor, report_path.write_text, json.dumps(report, indent=2))
 
-    # write cleaned parquet of valid rows. If none valid, write an empty file to
-    # keep outputs stable
-    valid_path = out_dir / f"{report_prefix}_valid.parquet"
-    if valid_rows:
-        pd.DataFrame(valid_rows).to_parquet(valid_path, index=False)
-    else:
-        # create empty dataframe with same columns as original canonical model fields
-        empty = pd.DataFrame(columns=df.columns)
-        empty.to_parquet(valid_path, index=False)
+    # If none valid, write an empty file to keep outputs stable
+    if not n_valid and not (append and valid_path.exists()):
+        submit_or_run(executor, _write_empty, valid_path, parquet_path, frame)
+    return {k: v for k, v in report.items() if k != "errors"}
+
+
+def validate_vitals(
+    parquet_path: Path,
+    out_dir: Path,
+    report_prefix: str = "validation_report",
+    engine: str = "columnar",
+    schema_section: Optional[Dict[str, Any]] = None,
+    chunk_rows: Optional[int] = None,
+    workers: Optional[int] = None,
+    frame: Union[pd.DataFrame, pa.Table, None] = None,
+) -> None:
+    validate_table(
+        parquet_path,
+        out_dir,
+        "vitals",
+        report_prefix=report_prefix,
+        engine=engine,
+        schema_section=schema_section,
+        chunk_rows=chunk_rows,
+        workers=workers,
+        frame=frame,
+    )
 
 
 if __name__ == "__main__":
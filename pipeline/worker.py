@@ -0,0 +1,199 @@
+"""Long-lived worker that keeps the pipeline warm between jobs.
+
+`python -m pipeline.worker` reads one JSON job per line on stdin and writes
+one JSON response per line on stdout; with `--port N` it serves the same
+protocol on 127.0.0.1:N. Libraries, the canonical schema and transformers
+loaded by earlier jobs (normalize's LRU cache) stay in memory, so only the
+first job pays the import and load cost.
+
+A job is {"id": ..., "mapping": "<mapping.yaml>", "work_dir": "<dir>"} plus
+any of the run_pipeline options in JOB_OPTIONS; tables run inline unless the
+job sets "workers". The response is {"id", "status": "ok" or "error",
+"archive", "seconds", "log", "error"}, where "log" is what the run printed.
+{"cmd": "ping"} reports the worker's pid and job count; {"cmd": "shutdown"}
+stops it.
+"""
+
+import argparse
+import io
+import json
+import os
+import socketserver
+import subprocess
+import sys
+import time
+import traceback
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+JOB_OPTIONS = (
+    "s3_bucket",
+    "s3_prefix",
+    "chunk_rows",
+    "workers",
+    "reuse_artifacts",
+    "incremental",
+    "partition_by",
+)
+
+
+def warm_up() -> Dict[str, Any]:
+    """Import every stage's libraries and return the parsed canonical schema."""
+    import joblib  # noqa: F401
+    import sklearn.compose  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+
+    import pipeline.artifacts  # noqa: F401
+    import pipeline.run_demo  # noqa: F401
+    import pipeline.validate  # noqa: F401
+    from pipeline.ingest import load_schema
+
+    return load_schema()
+
+
+def run_job(job: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one job; failures are reported in the response, never raised."""
+    from pipeline.run_demo import BASE, resolve_mapping, run_pipeline
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    response: Dict[str, Any] = {"id": job.get("id"), "archive": None, "error": None}
+    try:
+        with redirect_stdout(log):
+            mapping = resolve_mapping(job.get("mapping"))
+            options = {k: job[k] for k in JOB_OPTIONS if job.get(k) is not None}
+            options.setdefault("workers", 1)
+            work_dir = Path(job["work_dir"]) if job.get("work_dir") else BASE
+            archive = run_pipeline(mapping, schema, work_dir, **options)
+        response["status"] = "ok"
+        response["archive"] = None if archive is None else str(archive)
+    except Exception as e:
+        response["status"] = "error"
+        response["error"] = f"{type(e).__name__}: {e}"
+        log.write(traceback.format_exc())
+    response["seconds"] = round(time.perf_counter() - start, 6)
+    response["log"] = log.getvalue()
+    return response
+
+
+def serve(
+    lines: Iterable[str],
+    write: Callable[[str], None],
+    schema: Dict[str, Any],
+    state: Dict[str, Any],
+) -> None:
+    """Answer each JSON request line until EOF or a shutdown command."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            write(json.dumps({"status": "error", "error": f"bad request: {e}"}))
+            continue
+        cmd = request.get("cmd", "run")
+        if cmd == "shutdown":
+            state["stop"] = True
+            write(json.dumps({"id": request.get("id"), "status": "ok"}))
+            return
+        if cmd == "ping":
+            response = {"status": "ok", "pid": os.getpid(), "jobs": state["jobs"]}
+        else:
+            state["jobs"] += 1
+            response = run_job(request, schema)
+        response["id"] = request.get("id")
+        write(json.dumps(response))
+
+
+def _serve_stdio(schema: Dict[str, Any]) -> None:
+    # keep fd 1 for responses only: anything else written to stdout (including
+    # by libraries or child processes) goes to stderr instead
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def write(text: str) -> None:
+        protocol.write(text + "\n")
+        protocol.flush()
+
+    serve(sys.stdin, write, schema, {"jobs": 0, "stop": False})
+
+
+def _serve_socket(schema: Dict[str, Any], port: int, host: str) -> None:
+    state = {"jobs": 0, "stop": False}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (raw.decode("utf-8") for raw in self.rfile)
+
+            def write(text: str) -> None:
+                self.wfile.write((text + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+            serve(lines, write, schema, state)
+
+    # one connection at a time: jobs share the warm caches and run serially
+    with socketserver.TCPServer((host, port), Handler) as server:
+        print(f"pipeline worker listening on {host}:{server.server_address[1]}")
+        sys.stdout.flush()
+        while not state["stop"]:
+            server.handle_request()
+
+
+def start_worker(
+    python: Optional[str] = None, env: Optional[Dict[str, str]] = None
+) -> subprocess.Popen:
+    """Start a stdin/stdout worker process (see submit)."""
+    return subprocess.Popen(
+        [python or sys.executable, "-m", "pipeline.worker"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env,
+    )
+
+
+def submit(proc: subprocess.Popen, job: Dict[str, Any]) -> Dict[str, Any]:
+    """Send job to a worker started with start_worker and wait for its reply."""
+    proc.stdin.write(json.dumps(job) + "\n")
+    proc.stdin.flush()
+    line = proc.stdout.readline()
+    if not line:
+        raise RuntimeError("pipeline worker exited")
+    return json.loads(line)
+
+
+def submit_socket(
+    job: Dict[str, Any], port: int, host: str = "127.0.0.1"
+) -> Dict[str, Any]:
+    """Send one job to a worker started with --port and wait for its reply."""
+    import socket
+
+    with socket.create_connection((host, port)) as sock:
+        sock.sendall((json.dumps(job) + "\n").encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("r", encoding="utf-8") as fh:
+            line = fh.readline()
+    if not line:
+        raise RuntimeError("pipeline worker closed the connection")
+    return json.loads(line)
+
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Run pipeline jobs in a warm process")
+    p.add_argument("--port", type=int, help="Serve on 127.0.0.1:PORT (0 = any)")
+    p.add_argument("--host", default="127.0.0.1")
+    args = p.parse_args(argv)
+
+    schema = warm_up()
+    if args.port is None:
+        _serve_stdio(schema)
+    else:
+        _serve_socket(schema, args.port, args.host)
+
+
+if __name__ == "__main__":
+    main()
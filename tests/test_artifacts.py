@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import zipfile
+
+from pipeline.artifacts import archive_artifacts, export_zip, gc_blobs
+
+
+def test_archive_deduplicates_and_gc(tmp_path):
+    std = tmp_path / "standardized"
+    std.mkdir()
+    (std / "vitals.parquet").write_bytes(b"x" * 1000)
+    (std / "report.json").write_text("{}")
+
+    first = archive_artifacts(std, "aaaa")
+    second = archive_artifacts(std, "bbbb")
+    blobs = list((tmp_path / "artifacts" / "blobs").glob("*/*"))
+    assert len(blobs) == 2
+    assert os.path.samefile(first / "vitals.parquet", second / "vitals.parquet")
+
+    manifest = json.loads((second / "manifest.json").read_text())
+    assert set(manifest["files"]) == {"vitals.parquet", "report.json"}
+    master = json.loads(
+        (tmp_path / "artifacts" / "artifacts_index_master.json").read_text()
+    )
+    assert master["aaaa"] == ["report.json", "vitals.parquet"]
+
+    # a changed file adds one blob; nothing is unreferenced while both exist
+    (std / "report.json").write_text('{"v": 2}')
+    archive_artifacts(std, "bbbb")
+    assert len(list((tmp_path / "artifacts" / "blobs").glob("*/*"))) == 3
+    assert gc_blobs(tmp_path / "artifacts") == []
+
+    shutil.rmtree(first)
+    removed = gc_blobs(tmp_path / "artifacts")
+    assert len(removed) == 1
+    assert (second / "report.json").read_text() == '{"v": 2}'
+
+
+def test_export_zip_is_cached_per_manifest(tmp_path):
+    std = tmp_path / "standardized"
+    (std / "vitals_dataset" / "date=2024-01-01").mkdir(parents=True)
+    (std / "vitals.parquet").write_bytes(b"x" * 1000)
+    (std / "vitals_dataset" / "date=2024-01-01" / "part-0.parquet").write_bytes(b"y")
+    (std / "report.json").write_text("{}" * 500)
+    assert export_zip(std, "aaaa") is None
+
+    archive_artifacts(std, "aaaa")
+    path = export_zip(std, "aaaa")
+    with zipfile.ZipFile(path) as zf:
+        info = {i.filename: i.compress_type for i in zf.infolist()}
+        assert zf.read("vitals.parquet") == b"x" * 1000
+    assert info["vitals.parquet"] == zipfile.ZIP_STORED
+    assert info["report.json"] == zipfile.ZIP_DEFLATED
+    assert "vitals_dataset/date=2024-01-01/part-0.parquet" in info
+
+    # reused until the manifest changes, then replaced
+    mtime = path.stat().st_mtime_ns
+    archive_artifacts(std, "aaaa")
+    assert export_zip(std, "aaaa") == path and path.stat().st_mtime_ns == mtime
+    (std / "report.json").write_text("{}")
+    archive_artifacts(std, "aaaa")
+    new = export_zip(std, "aaaa")
+    assert new != path and not path.exists()
+    assert zipfile.ZipFile(new).read("report.json") == b"{}"
+
+
+def test_concurrent_stores_of_the_same_blob(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from pipeline.artifacts import stage_files
+
+    std = tmp_path / "standardized"
+    std.mkdir()
+    names = [f"t{i}_errors.parquet" for i in range(16)]
+    for name in names:
+        (std / name).write_bytes(b"same bytes")
+    with ThreadPoolExecutor(8) as pool:
+        staged = list(pool.map(lambda n: stage_files(std, [n]), names))
+    digests = {e["sha256"] for entry in staged for e in entry.values()}
+    assert len(digests) == 1
+    blobs = [p for p in (tmp_path / "artifacts" / "blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 1 and blobs[0].read_bytes() == b"same bytes"
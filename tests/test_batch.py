@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+import yaml
+
+from pipeline.batch import output_name, run_batch
+
+
+def test_batch_processes_each_file_once(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    for name, n in (("a.csv", 10), ("b.csv", 15)):
+        pd.DataFrame(
+            {
+                "PAT_ID": [f"p{i}" for i in range(n)],
+                "MeasuredAt": [f"2023-01-01T00:{i:02d}:00Z" for i in range(n)],
+                "HR": [70 + i for i in range(n)],
+                "Temp_F": [98.6] * n,
+            }
+        ).to_csv(uploads / name, index=False)
+    (uploads / "broken.parquet").write_bytes(b"not parquet")
+    (uploads / "notes.txt").write_text("ignored")
+    mapping = {
+        "source": {"format": "csv", "table": "unused.csv"},
+        "mappings": {
+            "vitals": {
+                "patient_id": "PAT_ID",
+                "timestamp": "MeasuredAt",
+                "heart_rate": "HR",
+                "temperature": {"column": "Temp_F", "unit": "F"},
+            }
+        },
+    }
+    mapping_path = tmp_path / "mapping.yaml"
+    mapping_path.write_text(yaml.safe_dump(mapping))
+    out = tmp_path / "standardized"
+
+    summary = run_batch([str(uploads)], out, mapping_path=str(mapping_path), workers=2)
+    assert summary["counts"] == {"processed": 2, "failed": 1}
+    assert (out / output_name(uploads / "a.csv") / ".processed").exists()
+    assert (out / output_name(uploads / "broken.parquet") / ".failed").exists()
+    b_dir = out / output_name(uploads / "b.csv")
+    vitals = pd.read_parquet(b_dir / "standardized" / "vitals.parquet")
+    assert len(vitals) == 15
+
+    summary = run_batch([str(uploads / "*")], out, mapping_path=str(mapping_path))
+    assert summary["counts"] == {"skipped": 2, "failed": 1}
+    saved = json.loads((out / "batch_summary.json").read_text())
+    assert saved["counts"] == summary["counts"]
+
+    # a same-named file from another directory gets its own outputs
+    other = tmp_path / "other"
+    other.mkdir()
+    (uploads / "a.csv").rename(other / "a.csv")
+    summary = run_batch([str(other)], out, mapping_path=str(mapping_path))
+    assert summary["counts"] == {"processed": 1}
+    assert summary["files"][0]["work_dir"] == str(out / output_name(other / "a.csv"))
+    assert output_name(other / "a.csv") != output_name(uploads / "a.csv")
+    # names do not depend on where the tree is checked out
+    moved = tmp_path / "elsewhere"
+    assert output_name(uploads / "a.csv", tmp_path) == output_name(
+        moved / "uploads" / "a.csv", moved
+    )
@@ -0,0 +1,38 @@
+import copy
+from pathlib import Path
+
+from pipeline.bench import compare, run_benchmarks
+from pipeline.ingest import load_mapping, read_source
+from pipeline.synthetic import generate_source
+
+
+def test_generated_sources_match_mappings(tmp_path):
+    for name, fmt in (("example_source_a", "csv"), ("example_source_b", "parquet")):
+        mapping = load_mapping(Path("pipeline/mappings") / f"{name}.yaml")
+        path = generate_source(
+            mapping, tmp_path / f"{name}.{fmt}", 1_000, null_rate=0.1, block_rows=300
+        )
+        mapping["source"]["table"] = str(path)
+        tables = read_source(mapping, tmp_path)
+        assert set(tables) == {"demographics", "vitals", "labs"}
+        assert all(len(df) == 1_000 for df in tables.values())
+        vitals = tables["vitals"]
+        assert vitals["patient_id"].notna().all()
+        assert 0.05 < vitals["heart_rate"].isna().mean() < 0.15
+
+
+def test_benchmark_records_every_stage_and_flags_regressions(tmp_path):
+    result = run_benchmarks(300, tmp_path, repeat=1, n_patients=5)
+    stages = result["sources"]["example_source_a"]["stages"]
+    assert list(stages)[0] == "read_source"
+    assert list(stages)[-1] == "archive_artifacts"
+    assert all(m["peak_mb"] is not None for m in stages.values())
+    assert "pipeline.cli --help" in result["imports"]
+    assert compare(result, result) == []
+
+    slower = copy.deepcopy(result)
+    stage = slower["sources"]["example_source_b"]["stages"]["validate_vitals"]
+    stage["seconds"] = max(stage["seconds"], 0.1) * 2
+    problems = compare(result, slower)
+    assert len(problems) == 1
+    assert problems[0].startswith("example_source_b/validate_vitals")
@@ -0,0 +1,174 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.ingest import (
+    field_storage,
+    iter_source,
+    load_schema,
+    mapping_columns,
+    read_source,
+    save_standardized,
+    storage_policy,
+)
+
+MAPPING = {
+    "source": {"format": "csv", "table": "wide.csv"},
+    "mappings": {
+        "demographics": {"patient_id": "PAT_ID", "sex": "Gender"},
+        "vitals": {
+            "patient_id": "PAT_ID",
+            "heart_rate": "HR",
+            "temperature": {"column": "Temp_F", "unit": "F"},
+        },
+    },
+}
+
+
+def write_wide(tmp_path, n=25):
+    df = pd.DataFrame(
+        {
+            "PAT_ID": [f"p{i}" for i in range(n)],
+            "Gender": ["M", "F"] * (n // 2) + ["M"] * (n % 2),
+            "HR": range(n),
+            "Temp_F": [98.6] * n,
+        }
+    )
+    for i in range(20):
+        df[f"unused_{i}"] = i
+    df.to_csv(tmp_path / "wide.csv", index=False)
+    df.to_parquet(tmp_path / "wide.parquet", index=False)
+    return df
+
+
+def test_mapping_columns_union():
+    assert mapping_columns(MAPPING) == ["PAT_ID", "Gender", "HR", "Temp_F"]
+
+
+def test_read_source_projects_columns(tmp_path):
+    write_wide(tmp_path)
+    for fmt in ("csv", "parquet"):
+        mapping = {**MAPPING, "source": {"format": fmt, "table": f"wide.{fmt}"}}
+        out = read_source(mapping, tmp_path)
+        assert list(out["vitals"].columns) == [
+            "patient_id",
+            "heart_rate",
+            "temperature",
+        ]
+        assert list(out["demographics"].columns) == ["patient_id", "sex"]
+
+
+def test_iter_source_batches_match_full_read(tmp_path):
+    write_wide(tmp_path)
+    for fmt in ("csv", "parquet"):
+        mapping = {**MAPPING, "source": {"format": fmt, "table": f"wide.{fmt}"}}
+        batches = list(iter_source(mapping, tmp_path, batch_size=10))
+        assert [len(b["vitals"]) for b in batches] == [10, 10, 5]
+        streamed = pd.concat([b["vitals"] for b in batches])
+        pd.testing.assert_frame_equal(
+            streamed, read_source(mapping, tmp_path)["vitals"]
+        )
+
+
+def test_plan_delta_detects_append_and_rewrite(tmp_path):
+    from pipeline.incremental import next_checkpoint, plan_delta
+
+    path = tmp_path / "src.csv"
+    path.write_text("a,b\n1,2\n3,4\n")
+    delta = plan_delta(path, "csv", None)
+    assert not delta["append"]
+    checkpoint = next_checkpoint(path, "csv", delta, 2, {})
+
+    with open(path, "a") as fh:
+        fh.write("5,6\n7,")  # trailing partial line is left for the next run
+    delta = plan_delta(path, "csv", checkpoint)
+    assert delta["append"] and delta["row_start"] == 2
+    mapping = {"source": {"table": "src.csv"}, "mappings": {"t": {"x": "a"}}}
+    from pipeline.ingest import read_source_range
+
+    out = read_source_range(mapping, tmp_path, delta)["t"]
+    assert list(out["x"]) == [5] and list(out.index) == [2]
+
+    path.write_text("a,b\n9,9\n3,4\n5,6\n")
+    assert not plan_delta(path, "csv", checkpoint)["append"]
+
+
+def test_full_csv_delta_reads_an_unterminated_last_line(tmp_path):
+    from pipeline.run_demo import run_demo
+
+    source = tmp_path / "source.csv"
+    source.write_text(
+        "PAT_ID,MeasuredAt,HR\n"
+        "p1,2023-01-01T12:00:00Z,80\n"
+        "p2,2023-01-02T13:00:00Z,72"
+    )
+    mapping = tmp_path / "mapping.yaml"
+    mapping.write_text(
+        f"source: {{format: csv, table: {source}}}\n"
+        "mappings: {vitals: {patient_id: PAT_ID, timestamp: MeasuredAt,"
+        " heart_rate: HR}}\n"
+    )
+    for name, incremental in (("full", False), ("incremental", True)):
+        run_demo(str(mapping), str(tmp_path / name), incremental=incremental)
+        std = tmp_path / name / "standardized"
+        assert len(pd.read_parquet(std / "vitals.parquet")) == 2
+
+
+def test_parquet_delta_detects_rewritten_prefix(tmp_path):
+    from pipeline.incremental import next_checkpoint, plan_delta
+
+    path = tmp_path / "src.parquet"
+    pd.DataFrame({"a": [1, 2, 3]}).to_parquet(path, index=False)
+    checkpoint = next_checkpoint(
+        path, "parquet", plan_delta(path, "parquet", None), 3, {}
+    )
+
+    # rewritten with the old rows first: an append
+    pd.DataFrame({"a": [1, 2, 3, 4]}).to_parquet(path, index=False)
+    delta = plan_delta(path, "parquet", checkpoint)
+    assert delta["append"] and delta["row_start"] == 3 and delta["row_end"] == 4
+
+    # same schema and more rows, but an earlier row changed: a full reprocess
+    pd.DataFrame({"a": [1, 9, 3, 4]}).to_parquet(path, index=False)
+    delta = plan_delta(path, "parquet", checkpoint)
+    assert not delta["append"] and delta["row_start"] == 0
+
+
+def test_save_standardized_uses_storage_policy(tmp_path):
+    schema = load_schema()
+    vitals = pd.DataFrame(
+        {
+            "patient_id": ["p2", "p1", None, "p1"],
+            "timestamp": pd.to_datetime(["2024-01-01"] * 4, utc=True),
+            "heart_rate": [70.0, 80.5, None, 65.0],
+        }
+    )
+    before = vitals.copy()
+    save_standardized({"vitals": vitals}, tmp_path, schema)
+    # the caller's frame keeps its dtypes and values
+    pd.testing.assert_frame_equal(vitals, before)
+
+    pf = pq.ParquetFile(tmp_path / "vitals.parquet")
+    fields = pf.schema_arrow
+    assert pa.types.is_dictionary(fields.field("patient_id").type)
+    assert fields.field("heart_rate").type == pa.float32()
+    assert pf.metadata.row_group(0).column(0).compression == "ZSTD"
+    back = pd.read_parquet(tmp_path / "vitals.parquet")
+    assert list(back["patient_id"].cat.categories) == ["p1", "p2"]
+    assert back["heart_rate"].isna().sum() == 1
+
+    # numerics without a per-field storage type keep their precision
+    labs = pd.DataFrame({"patient_id": ["p1"], "value": [5.6]})
+    save_standardized({"labs": labs}, tmp_path, schema)
+    assert pd.read_parquet(tmp_path / "labs.parquet")["value"].tolist() == [5.6]
+
+
+def test_field_storage_sizes_integers():
+    policy = storage_policy({})
+    assert field_storage({"type": "numeric"}, policy) is None
+    assert field_storage({"type": "numeric", "storage": "float32"}, policy) == (
+        "float32"
+    )
+    assert field_storage({"storage": "int", "min": 0, "max": 300}, policy) == "int16"
+    assert field_storage({"storage": "int", "min": 0, "max": 100}, policy) == "int8"
+    assert field_storage({"type": "numeric", "storage": "plain"}, policy) is None
@@ -0,0 +1,24 @@
+import threading
+
+import pytest
+
+from pipeline.io_executor import barrier, running, submit
+
+
+def test_submit_blocks_when_full_and_barrier_raises():
+    release = threading.Event()
+    with running(workers=1, max_pending=2) as io:
+        submit(io, release.wait)
+        submit(io, lambda: 1)
+        # both slots are taken: a third submit waits until the first finishes
+        third = threading.Thread(target=submit, args=(io, lambda: 2))
+        third.start()
+        third.join(0.2)
+        assert third.is_alive()
+        release.set()
+        third.join(5)
+        assert barrier(io) == [True, 1, 2]
+
+        submit(io, lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            barrier(io)
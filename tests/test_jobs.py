@@ -0,0 +1,64 @@
+import sys
+
+from pipeline import jobs
+
+
+def test_queue_runs_jobs_with_bounded_log_and_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "LOG_LINES", 5)
+    queue = jobs.new_queue(max_workers=1)
+    submitted = [
+        jobs.submit_job(queue, None, str(tmp_path / run)) for run in ("a", "b")
+    ]
+    for job in submitted:
+        assert job["done"].wait(120)
+    # one pool worker: the second run waited for the first
+    assert submitted[1]["started_at"] >= submitted[0]["finished_at"]
+
+    status = jobs.job_status(submitted[0])
+    assert status["status"] == "done" and status["returncode"] == 0
+    assert status["stages"] > 5 and status["stage"] == "archive_artifacts"
+    assert len(submitted[0]["lines"]) == 5
+    # the file has the full log, including the stage lines
+    full = open(status["log_file"], encoding="utf-8").read().splitlines()
+    assert len(full) > 5 and full[-5:] == status["log"].splitlines()
+    assert [j["id"] for j in jobs.list_jobs(queue)] == [1, 2]
+    queue["pool"].shutdown()
+
+
+def test_cancel_queued_and_running_jobs(tmp_path, monkeypatch):
+    # a run that prints a line and then hangs
+    monkeypatch.setattr(
+        jobs,
+        "cli_command",
+        lambda job: [sys.executable, "-c", "import time; print('up'); time.sleep(60)"],
+    )
+    queue = jobs.new_queue(max_workers=1)
+    running = jobs.submit_job(queue, None, str(tmp_path / "a"))
+    queued = jobs.submit_job(queue, None, str(tmp_path / "b"))
+
+    jobs.cancel_job(queued)
+    assert queued["status"] == "cancelled" and queued["done"].is_set()
+
+    while running["proc"] is None:
+        running["done"].wait(0.05)
+    jobs.cancel_job(running)
+    assert running["done"].wait(10)
+    assert running["status"] == "cancelled"
+    queue["pool"].shutdown()
+
+
+def test_jobs_sharing_a_work_dir_get_their_own_run_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "cli_command", lambda job: [sys.executable, "-c", ""])
+    queue = jobs.new_queue(max_workers=2)
+    submitted = [
+        jobs.submit_job(queue, None, str(tmp_path), own_dir=True) for _ in range(2)
+    ]
+    for job in submitted:
+        assert job["done"].wait(30) and job["status"] == "done"
+    dirs = [job["work_dir"] for job in submitted]
+    assert len(set(dirs)) == 2
+    for job in submitted:
+        assert job["work_dir"].startswith(str(tmp_path / "run_"))
+        assert job["work_dir"].endswith(f"_{job['id']}")
+        assert str(job["log_file"]).startswith(job["work_dir"])
+    queue["pool"].shutdown()
@@ -0,0 +1,180 @@
+import joblib
+import numpy as np
+import pandas as pd
+
+from pipeline.normalize import (
+    apply_unit_conversions,
+    clear_transformer_cache,
+    convert_units,
+    fit_transformers,
+    load_fitted_transformer,
+    load_transformer,
+)
+
+
+def test_constant_unit_fahrenheit_to_celsius():
+    df = pd.DataFrame({"temperature": [98.6, 212.0, None]})
+    mapping = {
+        "mappings": {"vitals": {"temperature": {"column": "Temp_F", "unit": "F"}}}
+    }
+    out = apply_unit_conversions(
+        df, mapping, schema_section={"temperature": {"unit": "C"}}
+    )
+    np.testing.assert_allclose(out["temperature"], [37.0, 100.0, np.nan])
+
+
+def test_per_row_lab_units():
+    df = pd.DataFrame(
+        {
+            "test_name": ["Glucose", "glucose", "WBC", "Creatinine", "Glucose"],
+            "value": [90.0, 5.0, 7.2, 1.0, 100.0],
+            "unit": ["mg/dL", "mmol/L", "10^9/L", "mg/dL", "furlongs"],
+        }
+    )
+    mapping = {
+        "mappings": {
+            "labs": {
+                "value": {
+                    "column": "Result",
+                    "unit_column": "unit",
+                    "test_column": "test_name",
+                }
+            }
+        }
+    }
+    out = apply_unit_conversions(df, mapping, table="labs", schema_section={})
+    np.testing.assert_allclose(out["value"], [90.0 / 18.016, 5.0, 7.2, 88.42, 100.0])
+    # unknown units are left unconverted
+    assert list(out["unit"]) == ["mmol/L", "mmol/L", "10^9/L", "umol/L", "furlongs"]
+
+
+def test_mapping_declared_conversion():
+    mapping = {"unit_conversions": [{"from": "st", "to": "kg", "factor": 6.35029318}]}
+    values, units = convert_units(
+        pd.Series([10.0, 70.0]), pd.Series(["st", "kg"]), "kg", mapping=mapping
+    )
+    np.testing.assert_allclose(values, [63.5029318, 70.0])
+    assert list(units) == ["kg", "kg"]
+
+
+def test_transformer_cache_and_reuse(tmp_path):
+    df = pd.DataFrame({"hr": [60.0, 80.0, 100.0], "sex": ["M", "F", "M"]})
+    fit_transformers(df, ["hr"], ["sex"], tmp_path, artifact_prefix="ct")
+    path = tmp_path / "ct.joblib"
+
+    clear_transformer_cache()
+    first = load_transformer(path)
+    assert load_transformer(path) is first
+
+    assert load_fitted_transformer(tmp_path, "ct", ["hr"], ["sex"]) is first
+    assert load_fitted_transformer(tmp_path, "ct", ["hr"], []) is None
+
+    # rewriting the artifact changes its hash: no stale cache hit, no reuse
+    joblib.dump({"not": "a transformer"}, path)
+    assert load_transformer(path) is not first
+    assert load_fitted_transformer(tmp_path, "ct", ["hr"], ["sex"]) is None
+
+
+def test_sparse_and_codes_outputs_with_category_caps(tmp_path):
+    from pipeline.ingest import read_sparse, save_standardized
+    from pipeline.normalize import frequent_levels, transform_frame
+
+    df = pd.DataFrame(
+        {
+            "hr": [60.0, 80.0, 100.0, 70.0, 90.0],
+            "ward": pd.Categorical(["a", "a", "b", "c", "a"]),
+        }
+    )
+    assert frequent_levels(df["ward"].value_counts(), max_categories=2) == ["a", "b"]
+    ct = fit_transformers(
+        df, ["hr"], ["ward"], tmp_path, "ct", sparse=True, min_frequency=2
+    )
+    dense = transform_frame(df, ct)
+    # "b" and "c" are below min_frequency and encode as all zeros
+    assert list(dense.columns) == ["hr", "ward_a"]
+    assert list(dense["ward_a"]) == [1.0, 1.0, 0.0, 0.0, 1.0]
+
+    sparse = transform_frame(df, ct, "sparse")
+    assert sparse.sparse.density < 1
+    save_standardized({"features": sparse}, tmp_path)
+    back = read_sparse(tmp_path / "features.parquet")
+    assert list(back.columns) == ["hr", "ward_a"]
+    pd.testing.assert_frame_equal(back.sparse.to_dense(), dense)
+
+    codes = transform_frame(df, ct, "codes")
+    assert list(codes["ward"].cat.categories) == ["a"]
+    assert codes["ward"].isna().tolist() == [False, False, True, True, False]
+
+
+def test_parse_datetimes_to_utc():
+    from pipeline.normalize import parse_datetimes, standardize_types
+
+    zulu = pd.Series(["2023-01-01T08:00:00Z", None, "2023-01-01T08:00:00Z", "bad"])
+    parsed = parse_datetimes(zulu)
+    assert str(parsed.dtype) == "datetime64[ns, UTC]"
+    assert parsed[0] == parsed[2] == pd.Timestamp("2023-01-01 08:00", tz="UTC")
+    assert parsed[[1, 3]].isna().all()
+
+    # mixed formats fall back to per-value parsing; offsets are honoured
+    mixed = parse_datetimes(pd.Series(["01/02/2023 08:00", "2023-01-03T09:00+02:00"]))
+    assert list(mixed.dt.hour) == [8, 7]
+
+    # naive values are localized to the declared timezone, then converted
+    df = pd.DataFrame({"timestamp": ["07/01/2023 12:00", "07/02/2023 12:00"]})
+    df = standardize_types(
+        df,
+        {"timestamp": {"type": "datetime"}},
+        formats={
+            "timestamp": {"format": "%m/%d/%Y %H:%M", "timezone": "America/New_York"}
+        },
+    )
+    assert list(df["timestamp"].dt.hour) == [16, 16]
+
+
+def test_fitted_imputer_policies(tmp_path):
+    import pytest
+
+    from pipeline.normalize import (
+        apply_imputer,
+        fit_imputer,
+        imputation_strategies,
+        load_imputer,
+        save_imputer,
+    )
+
+    df = pd.DataFrame(
+        {
+            "patient_id": ["a", "b", "a", "b", "a", "b"],
+            "timestamp": pd.date_range("2023-01-01", periods=6, freq="h", tz="UTC"),
+            "heart_rate": [60.0, np.nan, np.nan, 80.0, np.nan, np.nan],
+            "temperature": [36.0, np.nan, 37.0, 39.0, 38.0, np.nan],
+            "birth_date": ["x", "y", None, "y", "x", "y"],
+        }
+    )
+    policy = {"default": "median", "heart_rate": "ffill", "birth_date": "drop"}
+    strategies = imputation_strategies(
+        policy, df.columns, ["heart_rate", "temperature"]
+    )
+    assert strategies["temperature"] == {"strategy": "median"}
+    with pytest.raises(ValueError):
+        imputation_strategies({"default": "mode"}, df.columns, ["heart_rate"])
+
+    # fitting over batches gives the statistics of the whole frame
+    imputer = fit_imputer([df.iloc[:4], df.iloc[4:]], strategies)
+    assert imputer["statistics"] == {"temperature": df["temperature"].median()}
+    path = tmp_path / "imputer.json"
+    save_imputer(imputer, path)
+    assert load_imputer(path, strategies)["statistics"] == imputer["statistics"]
+    assert load_imputer(path, {"heart_rate": {"strategy": "mean"}}) is None
+
+    whole = apply_imputer(df.copy(), imputer)
+    assert list(whole.index) == [0, 1, 3, 4, 5]  # row 2 has no birth_date
+    np.testing.assert_array_equal(whole["heart_rate"], [60, np.nan, 80, 60, 80])
+    assert list(whole["temperature"]) == [36.0, 37.5, 39.0, 38.0, 37.5]
+
+    # batches in time order carry each patient's last values forward
+    state = {}
+    batches = [
+        apply_imputer(df.iloc[i : i + 2].copy(), imputer, state) for i in (0, 2, 4)
+    ]
+    pd.testing.assert_frame_equal(pd.concat(batches), whole)
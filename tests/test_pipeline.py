@@ -1,6 +1,11 @@
+import json
 import shutil
 from pathlib import Path
 
+import pandas as pd
+import pytest
+
+from pipeline.ingest import read_sparse
 from pipeline.run_demo import run_demo
 from pipeline.validate import validate_vitals
 
@@ -23,3 +28,334 @@ def test_full_flow(tmp_path):
     validate_vitals(std / "vitals.parquet", std, report_prefix="test_validation")
     assert (std / "test_validation.json").exists()
     assert (std / "test_validation_valid.parquet").exists()
+
+    # the run validated its frame in memory; reading the file back agrees
+    names = json.loads((std / "artifacts_index.json").read_text())["tables"]["vitals"]
+    ran = json.loads((std / names["validation_report"]).read_text())
+    again = json.loads((std / "test_validation.json").read_text())
+    skip = ("errors_file",)
+    assert {k: v for k, v in ran.items() if k not in skip} == {
+        k: v for k, v in again.items() if k not in skip
+    }
+    for name, suffix in (
+        ("validation_cleaned", "valid"),
+        ("validation_errors", "errors"),
+    ):
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(std / names[name]),
+            pd.read_parquet(std / f"test_validation_{suffix}.parquet"),
+        )
+
+
+def test_validation_workers_apply_to_in_memory_runs(tmp_path, monkeypatch):
+    import pipeline.validate as validate
+
+    calls = []
+    validate_table = validate.validate_table
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs.get("frame"))
+        return validate_table(*args, **kwargs)
+
+    monkeypatch.setattr(validate, "validate_table", spy)
+    run_demo(work_dir=str(tmp_path / "serial"))
+    monkeypatch.setenv("PIPELINE_VALIDATE_WORKERS", "2")
+    run_demo(work_dir=str(tmp_path / "parallel"))
+    # the frame is validated in memory unless workers are asked for; then the
+    # saved file goes to the pool
+    assert calls and all(f is not None for f in calls[: len(calls) // 2])
+    assert all(f is None for f in calls[len(calls) // 2 :])
+    serial, parallel = (tmp_path / d / "standardized" for d in ("serial", "parallel"))
+    for path in serial.glob("validation_*.parquet"):
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(path), pd.read_parquet(parallel / path.name)
+        )
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"transform": {"output": "sparse", "max_categories": 10}},
+        {
+            "missing_policy": {
+                "default": "median",
+                "heart_rate": "ffill",
+                "systolic_bp": "drop",
+                "respiratory_rate": {"constant": 16.0},
+            }
+        },
+    ],
+)
+def test_chunked_run_matches_in_memory(tmp_path, options):
+    import json
+
+    import numpy as np
+    import pandas as pd
+    import yaml
+
+    n = 250
+    rng = np.random.default_rng(1)
+    src = pd.DataFrame(
+        {
+            "PAT_ID": [f"p{i % 17}" for i in range(n)],
+            "MeasuredAt": pd.date_range("2023-01-01", periods=n, freq="min").astype(
+                str
+            ),
+            "HR": rng.normal(75, 10, n).round(),
+            "SBP": rng.normal(120, 10, n).round(),
+            "DBP": rng.normal(80, 5, n).round(),
+            "RR": rng.normal(16, 2, n).round(),
+            "Temp_F": rng.normal(98.6, 1, n),
+        }
+    )
+    src.loc[::9, "HR"] = np.nan
+    src.loc[5::25, "SBP"] = np.nan
+    src.to_csv(tmp_path / "source.csv", index=False)
+    mapping = {
+        "source": {"format": "csv", "table": str(tmp_path / "source.csv")},
+        "mappings": {
+            "vitals": {
+                "patient_id": "PAT_ID",
+                "timestamp": "MeasuredAt",
+                "heart_rate": "HR",
+                "systolic_bp": "SBP",
+                "diastolic_bp": "DBP",
+                "respiratory_rate": "RR",
+                "temperature": {"column": "Temp_F", "unit": "F"},
+            }
+        },
+        "missing_policy": {"default": "impute"},
+    }
+    mapping.update(options)
+    mapping_path = tmp_path / "mapping.yaml"
+    mapping_path.write_text(yaml.safe_dump(mapping))
+
+    run_demo(mapping_path=str(mapping_path), work_dir=str(tmp_path / "mem"))
+    run_demo(
+        mapping_path=str(mapping_path), work_dir=str(tmp_path / "chunk"), chunk_rows=40
+    )
+
+    mem = tmp_path / "mem" / "standardized"
+    chunk = tmp_path / "chunk" / "standardized"
+    index = json.loads((mem / "artifacts_index.json").read_text())
+    for name in (
+        "vitals.parquet",
+        "vitals_transformed.parquet",
+        index["validation_cleaned"],
+    ):
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(chunk / name), pd.read_parquet(mem / name)
+        )
+    if "transform" in options:
+        features = read_sparse(mem / "vitals_transformed.parquet")
+        # 5 scaled numerics plus the 10 most frequent patients
+        assert features.shape == (n, 15)
+        assert (features.sparse.to_dense().iloc[:, 5:].sum(axis=1) <= 1).all()
+    report_mem = json.loads((mem / index["validation_report"]).read_text())
+    report_chunk = json.loads((chunk / index["validation_report"]).read_text())
+    kept = n - 10 if "missing_policy" in options else n
+    assert report_chunk["valid"] == report_mem["valid"] == kept
+    imputers = [
+        json.loads((d / index["tables"]["vitals"]["imputer"]).read_text())
+        for d in (mem, chunk)
+    ]
+    assert imputers[0]["statistics"] == imputers[1]["statistics"]
+
+
+def test_chunked_ffill_rejects_unsorted_source(tmp_path):
+    import yaml
+
+    # p1's rows in the second batch of 2 are earlier than its first-batch row
+    pd.DataFrame(
+        {
+            "PAT_ID": ["p1", "p2", "p2", "p1"],
+            "MeasuredAt": ["2023-01-03", "2023-01-01", "2023-01-02", "2023-01-02"],
+            "HR": [70.0, None, 72.0, None],
+        }
+    ).to_csv(tmp_path / "source.csv", index=False)
+    mapping = {
+        "source": {"format": "csv", "table": str(tmp_path / "source.csv")},
+        "mappings": {
+            "vitals": {
+                "patient_id": "PAT_ID",
+                "timestamp": "MeasuredAt",
+                "heart_rate": "HR",
+            }
+        },
+        "missing_policy": {"heart_rate": "ffill"},
+    }
+    mapping_path = tmp_path / "mapping.yaml"
+    mapping_path.write_text(yaml.safe_dump(mapping))
+
+    # in memory the rows are sorted before filling, so any order works
+    run_demo(mapping_path=str(mapping_path), work_dir=str(tmp_path / "mem"))
+    with pytest.raises(ValueError, match="timestamp order"):
+        run_demo(
+            mapping_path=str(mapping_path),
+            work_dir=str(tmp_path / "chunk"),
+            chunk_rows=2,
+        )
+    assert not (tmp_path / "chunk" / "standardized" / "vitals.parquet").exists()
+
+
+def test_all_tables_processed_in_pool(tmp_path):
+    import json
+
+    base = Path.cwd()
+    mapping_src = base / "pipeline" / "mappings" / "example_source_a.yaml"
+    run_demo(mapping_path=str(mapping_src), work_dir=str(tmp_path), workers=3)
+
+    std = tmp_path / "standardized"
+    index = json.loads((std / "artifacts_index.json").read_text())
+    assert set(index["tables"]) == {"demographics", "vitals", "labs"}
+    for names in index["tables"].values():
+        for name in names.values():
+            assert (std / name).exists()
+    report = json.loads(
+        (std / index["tables"]["demographics"]["validation_report"]).read_text()
+    )
+    assert report["total_rows"] == 2
+
+
+def test_tables_run_inline_by_default(tmp_path, monkeypatch):
+    import concurrent.futures
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("started a process pool")
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", no_pool)
+    assert run_demo(work_dir=str(tmp_path)) is not None
+
+
+def test_incremental_run_appends_only_new_rows(tmp_path, capsys):
+    import json
+
+    import pandas as pd
+    import yaml
+
+    def rows(start, stop):
+        return pd.DataFrame(
+            {
+                "PAT_ID": [f"p{i % 5}" for i in range(start, stop)],
+                "MeasuredAt": [
+                    f"2023-01-01T00:{i % 60:02d}:00Z" for i in range(start, stop)
+                ],
+                "HR": [60 + i for i in range(start, stop)],
+                "Temp_F": [98.6] * (stop - start),
+            }
+        )
+
+    source = tmp_path / "source.csv"
+    rows(0, 30).to_csv(source, index=False)
+    mapping = {
+        "source": {"format": "csv", "table": str(source)},
+        "mappings": {
+            "vitals": {
+                "patient_id": "PAT_ID",
+                "timestamp": "MeasuredAt",
+                "heart_rate": "HR",
+                "temperature": {"column": "Temp_F", "unit": "F"},
+            }
+        },
+    }
+    mapping_path = tmp_path / "mapping.yaml"
+    mapping_path.write_text(yaml.safe_dump(mapping))
+    work = tmp_path / "inc"
+
+    run_demo(mapping_path=str(mapping_path), work_dir=str(work), incremental=True)
+    rows(30, 50).to_csv(source, mode="a", header=False, index=False)
+    run_demo(mapping_path=str(mapping_path), work_dir=str(work), incremental=True)
+    capsys.readouterr()
+    run_demo(mapping_path=str(mapping_path), work_dir=str(work), incremental=True)
+    assert "nothing to do" in capsys.readouterr().out
+
+    run_demo(mapping_path=str(mapping_path), work_dir=str(tmp_path / "full"))
+    std = work / "standardized"
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(std / "vitals.parquet"),
+        pd.read_parquet(tmp_path / "full" / "standardized" / "vitals.parquet"),
+    )
+    index = json.loads((std / "artifacts_index.json").read_text())
+    report = json.loads((std / index["validation_report"]).read_text())
+    assert report["total_rows"] == report["invalid"] == 50
+    assert [e["index"] for e in report["errors"]] == list(range(50))
+
+    checkpoints = list((std / ".checkpoints").glob("*.json"))
+    state = json.loads(checkpoints[0].read_text())
+    assert state["rows"] == 50
+    assert state["max_timestamp"]["vitals"] == "2023-01-01T00:49:00+00:00"
+
+
+def test_run_metrics_written_and_sent_to_hooks(tmp_path):
+    import json
+
+    from pipeline.metrics import register_hook, unregister_hook
+
+    received = []
+    hook = register_hook(received.append)
+    try:
+        run_demo(work_dir=str(tmp_path), workers=1)
+    finally:
+        unregister_hook(hook)
+
+    std = tmp_path / "standardized"
+    index = json.loads((std / "artifacts_index.json").read_text())
+    metrics = json.loads((std / index["run_metrics"]).read_text())
+    assert metrics["stages"] == received
+    reads = [e for e in received if e["stage"] == "read_source"]
+    assert {e["table"] for e in reads} == {"demographics", "vitals", "labs"}
+    assert all(e["rows_out"] == 2 and e["bytes_read"] > 0 for e in reads)
+    archive = tmp_path / "artifacts" / index["mapping_checksum"]
+    manifest = json.loads((archive / "manifest.json").read_text())
+    assert index["run_metrics"] in manifest["files"]
+
+
+def test_validate_stage_reports_its_outputs_before_closing(tmp_path, monkeypatch):
+    from contextlib import contextmanager
+
+    import pipeline.run_demo as run_demo_module
+
+    stage = run_demo_module.stage
+    closed = []
+
+    # snapshot each event as its stage closes; later changes must not count
+    @contextmanager
+    def spy(events, name, *args, **kwargs):
+        with stage(events, name, *args, **kwargs) as ev:
+            yield ev
+        closed.append(dict(ev))
+
+    monkeypatch.setattr(run_demo_module, "stage", spy)
+    run_demo(work_dir=str(tmp_path), workers=1)
+    checks = [e for e in closed if e["stage"] == "validate"]
+    assert len(checks) == 3
+    assert all(e["bytes_written"] > 0 for e in checks)
+
+
+@pytest.mark.skipif(
+    not Path("/proc/self/clear_refs").exists(), reason="needs a resettable peak RSS"
+)
+def test_enclosing_stage_peak_covers_inner_stages(monkeypatch):
+    import pipeline.metrics as metrics
+    from pipeline.metrics import stage
+
+    # by default the process's peak mark is left alone
+    resets = []
+    monkeypatch.setattr(metrics, "_reset_peak_rss", lambda: resets.append(1))
+    with stage([], "plain"):
+        pass
+    assert resets == []
+    monkeypatch.undo()
+
+    monkeypatch.setenv("PIPELINE_STAGE_PEAK_RSS", "1")
+    events = []
+    with stage(events, "outer"):
+        with stage(events, "big"):
+            block = b"\1" * (100 * 1024 * 1024)
+            del block
+        # resets the process's mark; the enclosing stage keeps its peak
+        with stage(events, "small"):
+            pass
+    peak = {e["stage"]: e["peak_rss_mb"] for e in events}
+    assert peak["outer"] >= peak["big"] > peak["small"] + 50
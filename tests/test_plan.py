@@ -0,0 +1,53 @@
+import hashlib
+from pathlib import Path
+
+import yaml
+
+from pipeline.ingest import load_mapping, load_schema
+from pipeline.plan import clear_plan_cache, get_plan, mapping_checksum, table_plan
+
+MAPPING = Path("pipeline/mappings/example_source_a.yaml")
+
+
+def test_plan_resolves_mapping_once():
+    clear_plan_cache()
+    mapping, schema = load_mapping(MAPPING), load_schema()
+    plan = get_plan(mapping, schema)
+
+    assert plan["schema_tables"] == ["demographics", "vitals", "labs"]
+    vitals = plan["tables"]["vitals"]
+    assert vitals["select"]["temperature"] == "Temp_F"
+    assert vitals["conversions"] == [
+        {
+            "field": "temperature",
+            "column": "Temp_F",
+            "unit": "F",
+            "unit_column": None,
+            "test_column": None,
+            "to_unit": "C",
+        }
+    ]
+    assert "heart_rate" in vitals["numeric"]
+    assert "timestamp" in vitals["casts"]["datetime"]
+    assert table_plan(plan, "labs")["columns"] == [
+        "PAT_ID",
+        "LabTime",
+        "Test",
+        "Result",
+        "Unit",
+    ]
+    # same checksum as hashing the YAML dump directly (artifact names unchanged)
+    expected = hashlib.sha256(yaml.safe_dump(mapping).encode("utf-8")).hexdigest()
+    assert plan["checksum"] == mapping_checksum(mapping) == expected[:8]
+
+    # another source file reuses the compiled tables but gets its own checksum
+    other = {**mapping, "source": {**mapping["source"], "table": "other.csv"}}
+    other_plan = get_plan(other, schema)
+    assert other_plan["tables"] is plan["tables"]
+    assert other_plan["checksum"] != plan["checksum"]
+
+
+def test_load_mapping_is_cached_but_returns_copies():
+    first = load_mapping(MAPPING)
+    first["mappings"].clear()
+    assert load_mapping(MAPPING)["mappings"]
@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pipeline.ingest import patient_bucket, write_dataset
+from pipeline.query import query
+from pipeline.run_demo import run_demo
+
+
+def vitals(n=600):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame(
+        {
+            "patient_id": pd.Categorical([f"p{i}" for i in rng.integers(0, 40, n)]),
+            "timestamp": pd.Timestamp("2024-01-01", tz="UTC")
+            + pd.to_timedelta(rng.integers(0, 30 * 86400, n), unit="s"),
+            "heart_rate": rng.normal(75, 10, n).astype("float32"),
+        }
+    )
+
+
+def test_query_prunes_to_matching_rows(tmp_path):
+    df = vitals()
+    start, end = pd.Timestamp("2024-01-05", tz="UTC"), pd.Timestamp("2024-01-12")
+    expected = df[
+        df["patient_id"].isin(["p3", "p7"])
+        & (df["timestamp"] >= start)
+        & (df["timestamp"] < end.tz_localize("UTC"))
+    ]
+    for keys in (["date"], ["patient_bucket"], ["date", "patient_bucket"]):
+        root = tmp_path / "_".join(keys)
+        assert write_dataset(df, root, keys) == len(df)
+        got = query(root, patient_id=["p3", "p7"], start=start, end=end)
+        assert list(got.columns) == list(df.columns)
+        assert len(got) == len(expected)
+        assert set(got["patient_id"]) == {"p3", "p7"}
+        assert len(query(root, patient_id="p3")) == (df["patient_id"] == "p3").sum()
+        assert len(query(root)) == len(df)
+
+    # files are sorted by patient and time, so row groups can be skipped
+    part = next((tmp_path / "date").rglob("*.parquet"))
+    data = pd.read_parquet(part)
+    assert data.equals(data.sort_values(["patient_id", "timestamp"]))
+    # buckets are stable and nulls get their own bucket
+    buckets = patient_bucket(pd.Series(["p1", None, "p1"]), 8)
+    assert buckets[0] == buckets[2] and buckets[1] == -1
+
+
+def test_run_demo_writes_and_archives_partitioned_dataset(tmp_path):
+    mapping = Path.cwd() / "pipeline" / "mappings" / "example_source_a.yaml"
+    for mode, options in (("mem", {}), ("chunk", {"chunk_rows": 1})):
+        run_demo(
+            mapping_path=str(mapping),
+            work_dir=str(tmp_path / mode),
+            workers=1,
+            partition_by=["date"],
+            **options,
+        )
+    mem = tmp_path / "mem" / "standardized"
+    index = json.loads((mem / "artifacts_index.json").read_text())
+    assert index["tables"]["vitals"]["dataset"] == "vitals_dataset"
+    assert "dataset" not in index["tables"]["demographics"]
+
+    flat = pd.read_parquet(mem / "vitals.parquet")
+    for mode in ("mem", "chunk"):
+        got = query(tmp_path / mode / "standardized" / "vitals_dataset")
+        got = got.sort_values(["patient_id", "timestamp"], ignore_index=True)
+        want = flat.sort_values(["patient_id", "timestamp"], ignore_index=True)
+        pd.testing.assert_frame_equal(
+            got, want, check_dtype=False, check_categorical=False
+        )
+
+    manifest = json.loads(
+        (
+            tmp_path / "mem" / "artifacts" / index["mapping_checksum"] / "manifest.json"
+        ).read_text()
+    )
+    assert any(name.startswith("vitals_dataset/date=") for name in manifest["files"])
+
+    # without partition_by a later run drops the stale dataset
+    run_demo(mapping_path=str(mapping), work_dir=str(tmp_path / "mem"), workers=1)
+    assert not (mem / "vitals_dataset").exists()
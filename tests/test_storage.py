@@ -0,0 +1,81 @@
+import pytest
+
+from pipeline.storage import MB, sync_dir_to_s3, upload_dir_to_s3
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="bucket")
+        yield client
+
+
+def test_sync_skips_unchanged_objects(tmp_path, s3):
+    (tmp_path / "small.json").write_text("{}")
+    # large enough to go multipart with a 5 MB chunk size
+    (tmp_path / "big.parquet").write_bytes(b"\0" * (11 * MB))
+    kwargs = {
+        "multipart_chunksize": 5 * MB,
+        "multipart_threshold": 5 * MB,
+        "client": s3,
+    }
+
+    first = sync_dir_to_s3(tmp_path, "bucket", "runs/abc", **kwargs)
+    assert {r["status"] for r in first.values()} == {"uploaded"}
+    assert sum(r["bytes"] for r in first.values()) == 11 * MB + 2
+
+    (tmp_path / "small.json").write_text('{"changed": true}')
+    second = sync_dir_to_s3(tmp_path, "bucket", "runs/abc", **kwargs)
+    status = {k.rsplit("/", 1)[-1]: r["status"] for k, r in second.items()}
+    assert status == {"big.parquet": "skipped", "small.json": "uploaded"}
+
+    body = s3.get_object(Bucket="bucket", Key="runs/abc/small.json")["Body"].read()
+    assert body == b'{"changed": true}'
+
+
+def test_sync_of_named_files_does_not_list_the_prefix(tmp_path, s3, monkeypatch):
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text(name)
+    sync_dir_to_s3(tmp_path, "bucket", "p", client=s3, names=["a.txt"])
+
+    def no_listing(*args, **kwargs):
+        raise AssertionError("listed the prefix")
+
+    monkeypatch.setattr(s3, "get_paginator", no_listing)
+    out = sync_dir_to_s3(tmp_path, "bucket", "p", client=s3, names=["a.txt", "b.txt"])
+    status = {k.rsplit("/", 1)[-1]: r["status"] for k, r in out.items()}
+    assert status == {"a.txt": "skipped", "b.txt": "uploaded"}
+
+
+def test_upload_dir_returns_uris(tmp_path, s3):
+    (tmp_path / "a.txt").write_text("a")
+    out = upload_dir_to_s3(tmp_path, "bucket", "p")
+    assert out == {str(tmp_path / "a.txt"): "s3://bucket/p/a.txt"}
+
+
+def test_run_uploads_tables_as_they_finish(tmp_path, s3):
+    import json
+
+    from pipeline.run_demo import run_demo
+
+    archive = run_demo(work_dir=str(tmp_path), workers=1, s3_bucket="bucket")
+    keys = {
+        o["Key"] for o in s3.list_objects_v2(Bucket="bucket", Prefix="")["Contents"]
+    }
+    files = {p.relative_to(archive).as_posix() for p in archive.rglob("*")}
+    assert keys == {f for f in files if (archive / f).is_file()}
+
+    std = tmp_path / "standardized"
+    index = json.loads((std / "artifacts_index.json").read_text())
+    metrics = json.loads((std / index["run_metrics"]).read_text())
+    shipped = [e for e in metrics["stages"] if e["stage"] == "upload_to_s3"]
+    assert {e["table"] for e in shipped} == set(index["tables"])
+    assert all(e["background"] for e in shipped)
+    assert "io_barrier" in {e["stage"] for e in metrics["stages"]}
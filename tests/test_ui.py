@@ -71,3 +71,49 @@ def test_ui_import_and_mapping_helper(tmp_path):
         return False
 
     assert contains_replaced_path(mm)
+
+
+def test_stage_timings_reads_run_metrics(tmp_path):
+    sys.modules["streamlit"] = make_dummy_streamlit()
+    import importlib
+
+    from pipeline.run_demo import run_demo
+
+    ui = importlib.import_module("pipeline.ui")
+    run_demo(work_dir=str(tmp_path), workers=1)
+    rows = ui.stage_timings(tmp_path / "standardized")
+    stages = {r["stage"] for r in rows}
+    assert {"read_source", "validate", "archive_artifacts"} <= stages
+    assert all(r["wall_s"] >= 0 for r in rows)
+
+
+def test_warm_worker_reused_between_runs(tmp_path):
+    sys.modules["streamlit"] = make_dummy_streamlit()
+    import importlib
+
+    ui = importlib.import_module("pipeline.ui")
+
+    class Placeholder:
+        value = ""
+
+        def text_area(self, label, value="", **k):
+            self.value = value
+
+        def text(self, value):
+            self.value = value
+
+    status = Placeholder()
+    try:
+        pids = []
+        for run in ("a", "b"):
+            control = {"proc": None, "cancel": False}
+            ui.run_pipeline_warm(None, str(tmp_path / run), None, "", status, control)
+            assert "finished" in status.value
+            pids.append(ui._warm_worker["proc"].pid)
+        assert pids[0] == pids[1]
+    finally:
+        proc = ui._warm_worker["proc"]
+        if proc is not None:
+            proc.kill()
+            proc.wait()
+        ui._warm_worker["proc"] = None
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from pipeline.models import Vitals
+from pipeline.validate import validate_frame, validate_table, validate_vitals
+
+
+def make_vitals(n=200):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "patient_id": [f"p{i}" for i in range(n)],
+            "timestamp": pd.date_range("2023-01-01", periods=n, freq="h", tz="UTC"),
+            "heart_rate": rng.normal(75, 10, n),
+            "systolic_bp": rng.normal(120, 10, n),
+            "diastolic_bp": rng.normal(80, 5, n),
+            "respiratory_rate": rng.normal(16, 2, n),
+            "temperature": rng.normal(37, 0.5, n),
+        }
+    )
+    df.loc[::7, "heart_rate"] = np.nan
+    df["patient_id"] = df["patient_id"].astype(object)
+    df.loc[::11, "patient_id"] = None
+    df.loc[::13, "timestamp"] = pd.NaT
+    return df
+
+
+def test_columnar_matches_pydantic_reference():
+    df = make_vitals()
+    valid_c, errors_c = validate_frame(df, Vitals, engine="columnar")
+    valid_p, errors_p = validate_frame(df, Vitals, engine="pydantic")
+
+    assert [e["index"] for e in errors_c] == [e["index"] for e in errors_p]
+    assert len(errors_c) > 0
+    pd.testing.assert_frame_equal(valid_c, valid_p, check_dtype=False)
+
+
+def test_columnar_schema_rules_match_reference():
+    df = make_vitals(50)
+    section = {"heart_rate": {"min": 60, "max": 90}}
+    _, errors_c = validate_frame(df, Vitals, section, engine="columnar")
+    _, errors_p = validate_frame(df, Vitals, section, engine="pydantic")
+    assert [e["index"] for e in errors_c] == [e["index"] for e in errors_p]
+
+
+def test_missing_required_column_fails_every_row(tmp_path):
+    df = make_vitals(10).drop(columns=["respiratory_rate"])
+    path = tmp_path / "vitals.parquet"
+    df.to_parquet(path, index=False)
+    validate_vitals(path, tmp_path, report_prefix="r")
+    valid = pd.read_parquet(tmp_path / "r_valid.parquet")
+    assert len(valid) == 0
+
+
+def test_report_is_bounded_and_errors_are_streamed(tmp_path, monkeypatch):
+    import json
+
+    import pyarrow.parquet as pq
+
+    import pipeline.validate as validate
+
+    # in-memory runs build and write the cells 60 rows at a time
+    monkeypatch.setattr(validate, "CELL_SLICE_ROWS", 60)
+    df = make_vitals(500)
+    df["heart_rate"] = "broken"  # every row fails
+    path = tmp_path / "vitals.parquet"
+    df.to_parquet(path, index=False)
+
+    counts = {}
+    for name, chunk_rows in (("mem", None), ("chunk", 64)):
+        counts[name] = validate_table(
+            path, tmp_path, "vitals", report_prefix=name, chunk_rows=chunk_rows
+        )
+        report = json.loads((tmp_path / f"{name}.json").read_text())
+        assert report["invalid"] == 500 and report["errors_truncated"]
+        assert [e["index"] for e in report["errors"]] == list(range(100))
+        assert report["errors_by_field"]["heart_rate"] == {"float_parsing": 500}
+        assert report["errors_by_code"]["float_parsing"] == 500
+    counts["chunk"]["errors_file"] = "mem_errors.parquet"
+    assert counts["mem"] == counts["chunk"]
+
+    cells = pd.read_parquet(tmp_path / "mem_errors.parquet")
+    pd.testing.assert_frame_equal(
+        cells, pd.read_parquet(tmp_path / "chunk_errors.parquet")
+    )
+    assert list(cells.columns) == ["index", "field", "code"]
+    assert (
+        len(cells) == 500 + df["patient_id"].isna().sum() + df["timestamp"].isna().sum()
+    )
+    assert cells["index"].is_monotonic_increasing
+    assert pq.ParquetFile(tmp_path / "mem_errors.parquet").num_row_groups == 9
+
+    # the pydantic reference engine reports the same failing rows
+    validate_vitals(path, tmp_path, report_prefix="ref", engine="pydantic")
+    ref = pd.read_parquet(tmp_path / "ref_errors.parquet")
+    assert set(ref["index"]) == set(cells["index"])
+
+
+def test_parallel_validation_matches_serial(tmp_path, monkeypatch):
+    import json
+
+    df = make_vitals(1000)
+    df.loc[::5, "heart_rate"] = 500.0  # out of range
+    path = tmp_path / "vitals.parquet"
+    df.to_parquet(path, index=False, row_group_size=90)
+
+    for name, workers, chunk_rows in (
+        ("serial", 1, None),
+        ("pool", 3, None),
+        ("pool_chunk", 4, 40),
+    ):
+        validate_table(
+            path,
+            tmp_path,
+            "vitals",
+            report_prefix=name,
+            chunk_rows=chunk_rows,
+            sample_errors=30,
+            workers=workers,
+        )
+    want = json.loads((tmp_path / "serial.json").read_text())
+    for name in ("pool", "pool_chunk"):
+        got = json.loads((tmp_path / f"{name}.json").read_text())
+        assert {**got, "errors_file": want["errors_file"]} == want
+        for suffix in ("valid", "errors"):
+            pd.testing.assert_frame_equal(
+                pd.read_parquet(tmp_path / f"{name}_{suffix}.parquet"),
+                pd.read_parquet(tmp_path / f"serial_{suffix}.parquet"),
+            )
+    assert not list(tmp_path.glob("tmp*"))
+
+    # the environment variable sets the default
+    monkeypatch.setenv("PIPELINE_VALIDATE_WORKERS", "2")
+    report = validate_table(path, tmp_path, "vitals", report_prefix="env")
+    assert report["valid"] == want["valid"]
+
+
+def test_engines_report_every_failing_field(tmp_path):
+    df = pd.DataFrame(
+        {
+            "patient_id": ["p1", "p2", None, "p4"],
+            "birth_date": ["1980-01-01", "not a date", "1990-02-03", "2000-13-40"],
+            "sex": ["M", "X", "F", "Unknown"],
+        }
+    )
+    path = tmp_path / "demographics.parquet"
+    df.to_parquet(path, index=False)
+    cells, per_field = {}, {}
+    for engine in ("columnar", "pydantic"):
+        report = validate_table(
+            path, tmp_path, "demographics", report_prefix=engine, engine=engine
+        )
+        found = pd.read_parquet(tmp_path / f"{engine}_errors.parquet")
+        # error codes follow each engine's naming; the failing cells match
+        cells[engine] = sorted(zip(found["index"], found["field"], strict=True))
+        per_field[engine] = {
+            f: sum(codes.values()) for f, codes in report["errors_by_field"].items()
+        }
+    # row 1 fails the model on birth_date and the schema on sex
+    assert cells["pydantic"] == [
+        (1, "birth_date"),
+        (1, "sex"),
+        (2, "patient_id"),
+        (3, "birth_date"),
+    ]
+    assert cells["columnar"] == cells["pydantic"]
+    assert per_field["columnar"] == per_field["pydantic"]
@@ -0,0 +1,23 @@
+from pipeline.worker import start_worker, submit
+
+
+def test_worker_runs_jobs_in_one_process(tmp_path):
+    proc = start_worker()
+    try:
+        first = submit(proc, {"id": 1, "work_dir": str(tmp_path / "a")})
+        second = submit(proc, {"id": 2, "work_dir": str(tmp_path / "b")})
+        bad = submit(proc, {"id": 3, "mapping": str(tmp_path / "missing.yaml")})
+        ping = submit(proc, {"cmd": "ping"})
+        done = submit(proc, {"cmd": "shutdown"})
+        assert proc.wait(timeout=30) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    assert [first["status"], second["status"], bad["status"]] == ["ok", "ok", "error"]
+    assert first["id"] == 1 and second["id"] == 2
+    assert "Demo complete" in first["log"]
+    assert (tmp_path / "b" / "standardized" / "artifacts_index.json").exists()
+    assert "FileNotFoundError" in bad["error"]
+    assert ping["jobs"] == 3 and ping["pid"] == proc.pid
+    assert done["status"] == "ok"